@@ -22,9 +22,13 @@ from services.workspace.SecretManager import SecretManager
 from utils.duckdb_util import DuckdbUtil
 from utils import database_secret
 from utils.SQLDatabase import SQLDatabase
+from utils.OracleDBUtil import OracleDBUtil
 from os import getenv as env
 from utils.cache_util import DuckDBCache
 from utils.logging.log_processor import setup_logging
+from services.pipeline.WorkerPool import WorkerPool
+from utils.DBMetadataCache import DBMetadataCache
+import threading
 
 BaseUpload.upload_folder = str(Path(__file__).parent.parent)+'/dbs/files'
 BasePipeline.folder = str(Path(__file__).parent.parent)+'/destinations'
@@ -57,10 +61,13 @@ if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
     setup_logging(app)
     DuckDBCache.connect()
     DuckdbUtil.initialize_logging_tables()
+    threading.Thread(target=WorkerPool.start, daemon=True).start()
+    threading.Thread(target=DBMetadataCache.start_refresher, daemon=True).start()
 
 SecretManager.connect_to_vault()
 SecretManager.db_secrete_obj = database_secret
 SQLDatabase.secret_manager = SecretManager
+OracleDBUtil.secret_manager = SecretManager
 
 port=env('APP_SRV_ADDR').split(':')[-1]
 socketio.run(app, host="0.0.0.0", port=port, allow_unsafe_werkzeug=True)
\ No newline at end of file
@@ -34,6 +34,8 @@ class RequestContext:
         self.pipeline_lbl = None
         self.pipeline_name = None
         self.pipeline_execution_id = None
+        # cancelled or preempted when RunRegistry stopped the run
+        self.stop_reason = None
 
         #self.ppline_files_path = "/home/nakassony/dlt-project/backend/src"
         self.socket_sid = socket_sid
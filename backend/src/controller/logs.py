@@ -28,11 +28,48 @@ def get_stuck_jobs():
 
 @logs.route('/metrics/performance', methods=['GET'])
 def get_performance():
-    """Throughput and duration metrics extracted from extra_data."""
+    """Throughput, duration and resource usage metrics extracted from extra_data."""
     df = store.get_performance_metrics()
     return jsonify(df.to_dict(orient="records"))
 
 
+@logs.route('/metrics/performance/<execution_id>', methods=['GET'])
+def get_run_performance(execution_id):
+    """Peak RSS, CPU seconds, I/O bytes and wall time of a specific execution."""
+    df = store.get_run_resources(execution_id)
+    if df.empty:
+        return jsonify({"error": "Execution ID not found"}), 404
+    return jsonify(df.to_dict(orient="records"))
+
+
+@logs.route('/metrics/scheduler', methods=['GET'])
+def get_scheduler_metrics():
+    """Queue depth, dispatch lag and running jobs of the scheduled-job executor."""
+    from services.pipeline.JobExecutor import JobExecutor
+    return jsonify(JobExecutor.get_metrics())
+
+
+@logs.route('/metrics/sql-pools', methods=['GET'])
+def get_sql_pool_metrics():
+    """Open SQL engines with their pool usage and checkout wait times."""
+    from utils.db.SQLPoolManager import SQLPoolManager
+    return jsonify(SQLPoolManager.get_metrics())
+
+
+@logs.route('/metrics/secret-cache', methods=['GET'])
+def get_secret_cache_metrics():
+    """Secret cache entries and hit/miss counts (no secret value)."""
+    from services.workspace.SecretCache import SecretCache
+    return jsonify(SecretCache.get_metrics())
+
+
+@logs.route('/metrics/s3-clients', methods=['GET'])
+def get_s3_client_metrics():
+    """Reused S3 clients by connection and how many were created."""
+    from utils.S3ClientPool import S3ClientPool
+    return jsonify(S3ClientPool.get_metrics())
+
+
 @logs.route('/metrics/errors', methods=['GET'])
 def get_error_hotspots():
     """Identifies the 'noisiest' modules in the system."""
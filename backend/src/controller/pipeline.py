@@ -625,6 +625,64 @@ def preview_transformation(namespace):
         return { 'error': True, 'result': { 'result': err } }
     
 
+@pipeline.route('/pipeline/run/queue/<int:run_id>/trace', methods=['POST'])
+def relay_queued_run_trace(run_id):
+    """ Pipeline trace sent by the run queue worker nodes (queue_worker.py) """
+    from services.pipeline.RunQueue import RunQueue
+    if not RunQueue.is_worker_token(request.headers.get(RunQueue.TOKEN_HEADER)):
+        return { 'error': True, 'result': 'Invalid run queue worker token' }, 403
+    try:
+        RunQueue.relay_trace(run_id, request.get_json())
+        return { 'error': False }
+    except Exception as err:
+        traceback.print_exc()
+        return { 'error': True, 'result': str(err) }
+
+
+@pipeline.route('/pipeline/run/<execution_id>/cancel', methods=['POST'])
+def cancel_pipeline_run(execution_id):
+    """ Stops a live run (SIGTERM, then SIGKILL after PPLINE_CANCEL_GRACE_SEC) """
+    from services.pipeline.RunRegistry import RunRegistry
+    try:
+        if not RunRegistry.cancel(execution_id):
+            return { 'error': True, 'result': f'No running pipeline with execution_id {execution_id}' }
+        return { 'error': False, 'result': 'Pipeline run cancelled' }
+    except Exception as err:
+        traceback.print_exc()
+        return { 'error': True, 'result': str(err) }
+
+
+@pipeline.route('/pipeline/runs', methods=['GET'])
+@pipeline.route('/pipeline/runs/<namespace>', methods=['GET'])
+def get_pipeline_runs(namespace = None):
+    from services.pipeline.RunRegistry import RunRegistry
+    return { 'error': False, 'result': RunRegistry.list_runs(namespace) }
+
+
+@pipeline.route('/ppline/limits/<namespace>', methods=['GET'])
+def get_pipeline_limits(namespace):
+    try:
+        return { 'error': False, 'result': DltPipeline.get_pipeline_limits(namespace) }
+    except Exception as err:
+        traceback.print_exc()
+        return { 'error': True, 'result': str(err) }
+
+
+@pipeline.route('/ppline/limits/<namespace>', methods=['POST'])
+def update_pipeline_limits(namespace):
+    """ Memory (MB), CPU time and wall clock (seconds) limits, ppline_name '*' (or none) is namespace wide """
+    try:
+        payload = request.get_json()
+        DltPipeline.update_pipeline_limits(
+            namespace, payload.get('ppline_name') or '*',
+            payload.get('memory_mb'), payload.get('cpu_sec'), payload.get('wall_sec')
+        )
+        return { 'error': False, 'result': 'Pipeline limits updated' }
+    except Exception as err:
+        traceback.print_exc()
+        return { 'error': True, 'result': str(err) }
+
+
 @pipeline.route('/ppline/schedule/<namespace>/<pipeline>/<status>', methods=['POST'])
 @pipeline.route('/ppline/schedule/<namespace>/<pipeline>/<status>/', methods=['POST'])
 def update_pipeline_pause(namespace, pipeline, status):
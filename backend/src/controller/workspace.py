@@ -13,8 +13,13 @@ from flask import abort, send_file
 from utils.cache_util import DuckDBCache
 from datetime import datetime
 from utils.SQLDatabase import SQLDatabase
+from utils.DBMetadataCache import DBMetadataCache
+from utils.db.SQLPoolManager import SQLPoolManager
+from utils.db.QueryCursor import QueryCursors
+from utils.OracleDBUtil import OracleDBUtil
 from utils.BucketUtil import BucketUtil
 from utils.BucketConnector import BucketConnector
+from utils.S3ClientPool import S3ClientPool
 from utils.workspace_util import handle_conversasion_turn_limit
 from utils.pipeline.Enums import DestinationType
 from services.agents.Enums import AgentFlow
@@ -105,6 +110,13 @@ def run_sql_query():
     referenced_secrets = payload.get('referencedSecrets', None)
     destination_config = payload.get('destinationConfig', None)
     destinationDB = payload.get('destinationDB', None)
+    # Paging (pageSize, continuationToken of a previous response next_token) or streaming (ndjson/arrow)
+    page_size = payload.get('pageSize', None)
+    continuation_token = payload.get('continuationToken', None)
+    stream = payload.get('stream', None)
+
+    if continuation_token:
+        return QueryCursors.next_page(continuation_token, namespace, page_size)
     
     destination_details = {
         'dest_type': dest_type, 'referenced_secrets': referenced_secrets,
@@ -122,14 +134,20 @@ def run_sql_query():
     # Use Polars for non-DuckDB destinations or when connection info is provided
     if dest_type != 'duckdb' and (connection_name or (dest_type in other_valid_destinations)):
         from utils.DestinationQueryUtil import DestinationQueryUtil
-        result = DestinationQueryUtil.execute_query(query, namespace, connection_name, destination_details)
+        result = DestinationQueryUtil.execute_query(query, namespace, connection_name, destination_details, page_size, stream)
     else:
         # Use existing DuckDB query for backward compatibility
-        result = Workspace.run_sql_query(database, query)
+        result = Workspace.run_sql_query(database, query, namespace, page_size, stream)
     
     return result
 
 
+@workspace.route('/workcpace/sql_query/<namespace>/<token>', methods=['DELETE'])
+def close_sql_query(namespace, token):
+    """ Releases a paged query result the client won't read further """
+    return { 'error': False, 'result': QueryCursors.close(token, namespace) }
+
+
 @workspace.route('/workcpace/duckdb/disconnect', methods=['POST'])
 def disconnect_duckdb():
     payload = request.get_json()
@@ -148,32 +166,24 @@ def update_socket_id(namespace, socket_id):
 @workspace.route('/workcpace/ppline/schedule/<namespace>', methods=['POST'])
 def create_ppline_schedule(namespace):
     import json
-    from services.pipeline.DltPipeline import DltPipeline
-    import schedule
+    from services.pipeline.Scheduler import Scheduler
 
     ppline_name = None
     try:
         payload = request.get_json()
         settings = payload['settings']
         ppline_name = payload['ppline_name']
+        # type is min, hour or cron (then time is the cron expression e.g. 0 6 * * 1-5)
         type, periodicity, time = settings['type'], settings['periodicity'], settings['time']
         # socket_id = payload['socket_id']
+        Scheduler.validate(type, time)
 
+        # Higher priority scheduled runs go first and may preempt lower ones (SCHEDULER_PREEMPTION)
         Workspace.create_ppline_schedule(
-            ppline_name, json.dumps(settings), namespace, type, periodicity, time
+            ppline_name, json.dumps(settings), namespace, type, periodicity, time, settings.get('priority', 0)
         )
-        file_path = f'{namespace}/{ppline_name}'
-        tag_name = f'{namespace}_{ppline_name}'
-        Workspace.schedule_jobs[file_path] = True
-
-        if(type == 'min'):
-            schedule.every(int(time)).minutes.do(DltPipeline.run_pipeline_job, file_path, namespace).tag(tag_name)
-        if(type == 'hour'):
-            schedule.every(int(time)).hours.do(DltPipeline.run_pipeline_job, file_path, namespace).tag(tag_name)
-
-        schedule.every(20).seconds.do(lambda: print(f'Preparing to run job for {file_path} pipeline')).tag(f'{tag_name}-tracinglog')
-        print(f'Schedule a job for {file_path} to happen {periodicity} {time} {type}')
-        schedule.run_pending()
+        # The scheduler loop picks it up from ppline_schedule.next_run
+        print(f'Schedule a job for {namespace}/{ppline_name} to happen {periodicity} {time} {type}')
 
     except Exception as error:
         print(f'Error while trying to schedule {ppline_name} pipeline')
@@ -477,6 +487,12 @@ def create_seret(namespace):
         else:
             pre_path = f'main/api' if secrets_only == False else f'main/db'
             sec_management.create_secret(namespace, payload, f'{pre_path}/{path}')
+
+        # The connection may now point to another database or have new credentials
+        DBMetadataCache.invalidate(namespace, path)
+        SQLPoolManager.invalidate(namespace, path)
+        OracleDBUtil.close_pool(namespace, path)
+        S3ClientPool.invalidate(namespace, path)
         
         return { 'error': False, 'result': 'Secret created successfully' }
     except Exception as err:
@@ -523,12 +539,25 @@ def fetch_secret(namespace, type, secretname):
 @workspace.route('/<namespace>/db/connection/<connection_name>/tables', methods=['GET'])
 def get_db_connection_detailes(namespace, connection_name):
 
-    result = SQLDatabase.get_tables_list(namespace, connection_name)
+    refresh = str(request.args.get('refresh', 'false')).lower() == 'true'
+    result = SQLDatabase.get_tables_list(namespace, connection_name, refresh)
 
     if 'error' not in result:
         return { 'error': False, 'result': { 'tables': result['tables'], 'secret_details': result['details'] } }
     else:
         return { 'error': True, 'result': 'No secrete found for current namespace' }
+
+
+@workspace.route('/<namespace>/db/connection/<connection_name>/tables/cache', methods=['DELETE'])
+def invalidate_db_tables_cache(namespace, connection_name):
+
+    try:
+        DBMetadataCache.invalidate(namespace, connection_name)
+        return { 'error': False, 'result': 'Tables cache cleared' }
+    except Exception as err:
+        print(f'Error while clearing tables cache of {connection_name}: {str(err)}')
+        traceback.print_exc()
+        return { 'error': True, 'result': f'Error while clearing tables cache: {str(err)}' }
         
 
 @workspace.route('/<namespace>/db/<dbengine>/<connection_name>/<table_name>', methods=['GET'])
@@ -657,21 +686,27 @@ async def list_s3_objects(namespace = None, secret = None):
 
         if secret == None:
             payload = request.get_json()
+        else:
+            # Only the listing options (prefix, paging) when the credentials come from the secret
+            payload = request.get_json(silent=True) or {}
         
         prefix = payload.get('prefix', '')
         max_keys = payload.get('max_keys', 100)
+        continuation_token = payload.get('continuation_token', None)
+        delimiter = payload.get('delimiter', None)
+        with_schema = payload.get('with_schema', True)
         
         # Use helper function to validate config
         test_config, error_response = _validate_and_prepare_s3_config(payload, namespace, secret)
         if error_response:
             return error_response
         
-        result = await BucketUtil.list_s3_objects(test_config, prefix, max_keys)
+        result = await BucketUtil.list_s3_objects(test_config, prefix, max_keys, continuation_token, delimiter, with_schema)
         
         if result['error']:
             return {'error': True, 'result': result['message']}
         else:
-            return {'error': False, 'result': result['objects']}
+            return {'error': False, 'result': result['objects'], 'folders': result['folders'], 'next_token': result['next_token']}
         
     except Exception as err:
         print(f'Error while listing S3 objects: {str(err)}')
@@ -691,13 +726,16 @@ def list_s3_objects_with_secrets(namespace, connection_name):
         payload = request.get_json()
         prefix = payload.get('prefix', '')
         max_keys = payload.get('max_keys', 100)
+        continuation_token = payload.get('continuation_token', None)
+        delimiter = payload.get('delimiter', None)
+        with_schema = payload.get('with_schema', False)
         
-        result = BucketConnector.list_s3_objects(namespace, connection_name, prefix, max_keys)
+        result = BucketConnector.list_s3_objects(namespace, connection_name, prefix, max_keys, continuation_token, delimiter, with_schema)
         
         if result['error']:
             return {'error': True, 'result': result['message']}
         else:
-            return {'error': False, 'result': result['objects']}
+            return {'error': False, 'result': result['objects'], 'folders': result['folders'], 'next_token': result['next_token']}
         
     except Exception as err:
         print(f'Error while listing S3 objects with secrets: {str(err)}')
@@ -58,7 +58,14 @@ class Bucket(TemplateNodeType):
 
             # primary_key is mapped in /pipeline_templates/simple.txt and simple_transform_field.txt
             self.primary_key = data.get('primaryKey', 'UNDEFINED')
-            
+
+            # file_concurrency, file_prefetch and ordered_files are mapped in /pipeline_templates/simple.txt
+            # and the transform ones (see PipelinesHelper.iter_files_parallel), None means the .env default
+            self.file_concurrency = Bucket.optional_int(data.get('fileConcurrency'))
+            self.file_prefetch = Bucket.optional_int(data.get('filePrefetch'))
+            ordered_files = data.get('orderedFiles')
+            self.ordered_files = None if ordered_files in (None, '') else str(ordered_files).lower() == 'true'
+
             # S3 Authentication parameters (for Secret Manager integration)
             if self.context.use_s3_auth:
                 # Store connection name for secret retrieval (following SQLDatabase pattern)
@@ -135,3 +142,8 @@ class Bucket(TemplateNodeType):
                 self.bucket_path_prefix = backet_path_pieces[3]
 
         return self.notify_failure_to_ui('Bucket',error)
+
+
+    @staticmethod
+    def optional_int(value):
+        return None if value in (None, '') else int(value)
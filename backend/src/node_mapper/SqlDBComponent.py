@@ -2,6 +2,10 @@ from .TemplateNodeType import TemplateNodeType
 from controller.RequestContext import RequestContext
 from services.pipeline.DltPipeline import DltPipeline
 from utils.pipeline import NodeType
+from os import getenv as env
+
+# dlt sql_database/sql_table extraction backends, all but sqlalchemy yield Arrow/Pandas batches
+SQL_BACKENDS = ['pyarrow', 'connectorx', 'pandas', 'sqlalchemy']
 
 class SqlDBComponent(TemplateNodeType):
     """
@@ -16,11 +20,14 @@ class SqlDBComponent(TemplateNodeType):
         self.context = context
         self.template_type = 'sql_database'
         template = ''
+        # Only sql_db.txt and sql_server.txt have incremental loads
+        supports_incremental = False
         if data['dbengine'] == 'mssql':
             if context.transformation_type == 'SQL':
                 template = DltPipeline.get_sql_db_template('sql_server_transform.txt')
             else:
                 template = DltPipeline.get_mssql_db_template()
+                supports_incremental = True
         else:
             if 'old_template' in data:
                 if data['old_template']:
@@ -30,6 +37,7 @@ class SqlDBComponent(TemplateNodeType):
                     template = DltPipeline.get_sql_db_template('sql_db_transform.txt')
                 else:
                     template = DltPipeline.get_sql_db_template()
+                    supports_incremental = True
 
         self.template = self.parse_destination_string(template)
 
@@ -58,6 +66,35 @@ class SqlDBComponent(TemplateNodeType):
         # primary_keys fields is mapped in /pipeline_templates/sql_db.txt
         self.primary_keys = [key for key in list(data['primaryKeys'].values()) if key != None]
 
+        # incremental and cursor_columns fields are mapped in /pipeline_templates/sql_db.txt and sql_server.txt,
+        # a table without cursor column gets it detected from the reflected schema when the pipeline runs
+        incremental = data.get('incremental')
+        if incremental in (None, ''):
+            self.incremental = supports_incremental and str(env('PPLINE_SQL_INCREMENTAL', 'false')).lower() == 'true'
+        else:
+            self.incremental = str(incremental).lower() == 'true'
+            if self.incremental and not supports_incremental:
+                raise ValueError('Incremental loads are not supported by SQL pipelines with transformations or the old template')
+        cursor_columns = data.get('cursorColumns') or {}
+        self.cursor_columns = [cursor_columns.get(key) or None for key, table in data['tables'].items() if table != None]
+
+        # backend and chunk_size fields are mapped in /pipeline_templates/sql_db.txt and sql_server.txt
+        self.backend = data.get('backend') or env('PPLINE_SQL_BACKEND', 'pyarrow')
+        if self.backend not in SQL_BACKENDS:
+            raise ValueError(f'Invalid SQL extraction backend {self.backend}, it should be one of {", ".join(SQL_BACKENDS)}')
+        self.chunk_size = int(data.get('chunkSize') or env('PPLINE_SQL_CHUNK_SIZE', 50000))
+
+        # parallel_workers field is mapped in /pipeline_templates/sql_db.txt and sql_server.txt (tables extracted at the same time)
+        self.parallel_workers = max(int(data.get('parallelWorkers') or env('PPLINE_SQL_PARALLEL_WORKERS', 1)), 1)
+
+        # partitions field is mapped in /pipeline_templates/sql_db.txt and sql_server.txt, a partitioned table
+        # is extracted by key ranges at the same time ({ column, count }, the column defaults to the primary key)
+        partitions, primary_keys = data.get('partitions') or {}, data['primaryKeys']
+        self.partitions = [
+            SqlDBComponent.parse_partition(partitions.get(key), primary_keys.get(key), table)
+            for key, table in data['tables'].items() if table != None
+        ]
+
         # source_database fields is mapped in /pipeline_templates/sql_db.txt
         self.source_database = data['database']
         
@@ -89,6 +126,20 @@ class SqlDBComponent(TemplateNodeType):
         self.notify_completion_to_ui()
 
 
+    @staticmethod
+    def parse_partition(partition, primary_key = None, table = None):
+        if not partition: return None
+        if not isinstance(partition, dict): partition = { 'count': partition }
+        count = int(partition.get('count') or env('PPLINE_SQL_PARTITION_COUNT', 8))
+        if count <= 1: return None
+
+        # Key ranges are taken from the partition column, or from the primary key when not given
+        column = partition.get('column') or None
+        if column == None and not primary_key:
+            raise ValueError(f'Partitioned extraction of {table} needs a partition column, the table has no primary key')
+        return { 'column': column, 'count': count }
+
+
     def parse_tables_and_schema(self):
         
         if len(self.source_tables) > 0:
@@ -0,0 +1,20 @@
+"""
+Pipeline run queue worker node, claims and runs the scheduled pipelines enqueued by the
+application when PPLINE_RUN_QUEUE=sqlite. Worker nodes share the destinations folder
+(pipeline files, duckdb files and the queue file) with the application.
+
+    python src/queue_worker.py
+"""
+from pathlib import Path
+import sys
+from utils.env_util import set_env
+
+proj_folder = Path(__file__).parent
+set_env(proj_folder)
+sys.path.insert(0, proj_folder/'node_mapper/')
+
+from services.workspace.SecretManager import SecretManager
+from services.pipeline.RunQueue import QueueWorker
+
+SecretManager.connect_to_vault()
+QueueWorker().start()
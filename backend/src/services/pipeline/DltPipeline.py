@@ -13,11 +13,17 @@ from utils.cache_util import DuckDBCache
 from utils.SQLDatabase import SQLDatabase
 import uuid
 from datetime import datetime
-import time
 from utils.code_node_util import valid_imports, FORBIDDEN_CALLS, FORBIDDEN_CALLS_REGEX, FORBIDDEN_DUNDER_REGEX
-import schedule
 import logging
 from utils.logging.pipeline_logger_config import handle_pipeline_log
+from utils.pipeline.LogPump import LogPump, TraceBatcher
+from utils.pipeline.RunEvents import RunTimeline
+from utils.pipeline.ResourceMonitor import ResourceMonitor
+from utils.pipeline.RunLimits import RunLimits
+from utils.pipeline.SecretBundle import SecretBundle
+from services.pipeline.WorkerPool import WorkerPool
+from services.pipeline.RunQueue import RunQueue
+from services.pipeline.RunRegistry import RunRegistry
 import re
 from utils.metastore.meta_storage import MetaStore
 
@@ -132,81 +138,106 @@ class DltPipeline:
             return { 'status': True, 'message': 'Pipeline created successfully' }
 
         # Run pipeline generater above by passing the python file
-        result = subprocess.Popen(['python', ppline_file],
-                                    stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE,
-                                    text=True,
-                                    bufsize=1
-                                )
-        pipeline_exception = False
-
-        # TODO: If needed, flag can be assigned with proper logic so UI logs will only came in 
-        #  specific situation like will only print if the ppline has transformation or if it's
-        #  ppline update, otherwise flag = True will print the log in any scenario
-        #  flag = context.transformation is not None or context.action_type == 'UPDATE'
-        flag, dataset_name, short_query = True, None, ''
-
-        logger = DltPipeline.get_pipeline_logger(context)
-
-        if(flag):
-            while True:
-                line = result.stdout.readline()
-                time.sleep(0.1)
-                
-                if line == '' or line.strip() == 'import pkg_resources' or line.strip().__contains__('import pkg_resources'): 
-                    continue
-                if not line: break
-                line = line.strip()
-                
-                if(line.startswith('SHORT_QUERY=__e2e_short_query_:')):
-                    short_query = line.split(':')[1]
-                    continue
+        limits = RunLimits.for_pipeline(ppline_file)
+        secrets = DltPipeline.get_run_secrets(context.transaction_namespace, vars(context.pipeline_metadata)) if context else None
+        result = WorkerPool.start_process(ppline_file, limits=limits, secrets=secrets)
+        execution_id = context.pipeline_execution_id if context else None
+        try:
+            if execution_id: RunRegistry.register(execution_id, result, limits, namespace=context.transaction_namespace)
+            pipeline_exception = False
+
+            # TODO: If needed, flag can be assigned with proper logic so UI logs will only came in 
+            #  specific situation like will only print if the ppline has transformation or if it's
+            #  ppline update, otherwise flag = True will print the log in any scenario
+            #  flag = context.transformation is not None or context.action_type == 'UPDATE'
+            flag, dataset_name, short_query = True, None, ''
 
-                if(line.startswith('DATA=__dlt__destination__datasetname__:')):
-                    dataset_name = line.split(':')[1]
-                    break
+            logger = DltPipeline.get_pipeline_logger(context)
+            trace, timeline, monitor = TraceBatcher(context), RunTimeline(), ResourceMonitor(result.pid)
 
-                is_transformation_step = (line.endswith('Transformation')\
-                                           and line.startswith('dynamic-_cmp'))
+            def on_idle():
+                trace.tick()
+                monitor.sample()
+                limits.check_wall(result)
+
+            pump = LogPump(result, on_idle=on_idle, on_event=timeline.consume)
+
+            if(flag):
+                for line in pump.lines():
+                    if line.strip() == '' or line.strip().__contains__('import pkg_resources'): 
+                        continue
+                    line = line.strip()
                 
-                if (line == 'RUN_SUCCESSFULLY'):
-                    if context:
-                        context.emit_ppsuccess()
-                    pipeline_exception = False if pipeline_exception == False else pipeline_exception
-                    break
+                    if(line.startswith('SHORT_QUERY=__e2e_short_query_:')):
+                        short_query = line.split(':')[1]
+                        continue
 
-                else:
-                    if(is_transformation_step and pipeline_exception == False):
-                        component_ui_id = line
-                        if context:
-                            Transformation(None, context, component_ui_id).notify_completion_to_ui()
+                    if(line.startswith('DATA=__dlt__destination__datasetname__:')):
+                        dataset_name = line.split(':')[1]
+                        break
 
-                    elif(line.startswith('RUNTIME_WARNING:') or is_SAWarning(line)):
-                        warning_message = line.replace('RUNTIME_WARNING:','')
-                        handle_pipeline_log(warning_message, logger, False, True)
-                        if context:
-                            context.emit_ppline_trace(warning_message, warn=True)
-                        
-                    elif(line.startswith('RUNTIME_ERROR:') or line.startswith('ERROR:') or pipeline_exception == True):
-                        pipeline_exception = True
-                        error_message = line.replace('RUNTIME_ERROR:','')
-                        handle_pipeline_log(error_message, logger, True)
+                    is_transformation_step = (line.endswith('Transformation')\
+                                               and line.startswith('dynamic-_cmp'))
+                
+                    if (line == 'RUN_SUCCESSFULLY'):
+                        trace.flush()
                         if context:
-                            context.emit_ppline_trace(error_message, error=True)
-                        
-                        if line.startswith('ERROR:'): break
+                            context.emit_ppsuccess()
+                        pipeline_exception = False if pipeline_exception == False else pipeline_exception
+                        break
 
                     else:
-                        if context:
-                            ui_log = str(line).replace('[PIPELINE_LOG]:','').replace('[DLT]:','').replace(' |+| ','')
-                            context.emit_ppline_trace(ui_log)
-                            handle_pipeline_log(line, logger)
+                        if(is_transformation_step and pipeline_exception == False):
+                            component_ui_id = line
+                            if context:
+                                trace.flush()
+                                Transformation(None, context, component_ui_id).notify_completion_to_ui()
+
+                        elif(line.startswith('RUNTIME_WARNING:') or is_SAWarning(line)):
+                            warning_message = line.replace('RUNTIME_WARNING:','')
+                            handle_pipeline_log(warning_message, logger, False, True)
+                            if context:
+                                trace.flush()
+                                context.emit_ppline_trace(warning_message, warn=True)
+                        
+                        elif(line.startswith('RUNTIME_ERROR:') or line.startswith('ERROR:') or pipeline_exception == True):
+                            pipeline_exception = True
+                            error_message = line.replace('RUNTIME_ERROR:','')
+                            handle_pipeline_log(error_message, logger, True)
+                            if context:
+                                trace.flush()
+                                context.emit_ppline_trace(error_message, error=True)
+                        
+                            if line.startswith('ERROR:'): break
+
+                        else:
+                            if context:
+                                ui_log = str(line).replace('[PIPELINE_LOG]:','').replace('[DLT]:','').replace(' |+| ','')
+                                trace.add(ui_log)
+                                handle_pipeline_log(line, logger)
+
+            trace.flush()
+            # Remaining output (e.g. data catalog generation) is only drained to 
+            # release the child process, the UI trace ends on the markers above
+            remaining_output = pump.drain()
+            monitor.final_sample()
+            result.wait()
+            stderr_output = pump.stderr_text()
+            failure_reason = RunRegistry.stop_reason(execution_id) or limits.failure_reason(result, stderr_output, monitor.process_cpu_sec())
+        finally:
+            DltPipeline.end_run(execution_id, result, limits)
+
+        logger.info('pipeline.run.metrics', extra={ **timeline.summary(), **monitor.summary(), 'failure_reason': failure_reason })
             
         #result.kill() # Each process will be responsible to kill/exit ifself
         MetaStore.persist_pipeline_metadata(
             context.transaction_namespace, context.pipeline_name, vars(context.pipeline_metadata), dataset_name, short_query
         )
 
+        if failure_reason:
+            message = DltPipeline.report_run_failure(limits, failure_reason, logger, context)
+            return { 'status': False, 'message': message, 'failure_reason': failure_reason }
+
         if pipeline_exception == True:
             handle_pipeline_log(f'PIPELINE FAILED: Pipeline {context.pipeline_name} with execution_id {context.pipeline_execution_id} failed', logger, True)
             return { 'status': False, 'message': 'Runtime Pipeline error, check the logs for details' }
@@ -215,7 +246,7 @@ class DltPipeline:
         
         error_messages, warning_status = None, False
         if result.returncode != 0 and not (context and context.action_type == 'UPDATE' and result.returncode == 2):
-            error_messages = result.stderr.read().split('\n')
+            error_messages = stderr_output.split('\n')
             if str(error_messages).__contains__('[WARNING]'):
                 if context:
                     context.emit_ppline_trace(error_messages, warn=True)
@@ -234,14 +265,14 @@ class DltPipeline:
             handle_pipeline_log(f'pipeline.success.conclusion', logger)
         
         print("Return Code:", result.returncode)
-        print("Standard Output:", result.stdout.read())
+        print("Standard Output:", '\n'.join(remaining_output))
         print("Standard Error:", message if error_messages != None else None)
 
         if(not(message.strip() == SUCCESS_RUN_MESSAGE)):
             if (error_messages != None or result.returncode == 1) and warning_status == False:
                 status = True if message == SUCCESS_RUN_MESSAGE else False
             else:
-                status = status if len(result.stderr.read()) > 0 else True
+                status = status if len(stderr_output) > 0 else True
 
         if status == True: context.emit_ppsuccess()
 
@@ -399,7 +430,7 @@ class DltPipeline:
 
     processed_job = { 'start': {}, 'end': {} }
     @staticmethod
-    def run_pipeline_job(file_path, namespace):
+    def run_pipeline_job(file_path, namespace, priority = 0):
         ppline_file = f'{destinations_dir}/{file_path}.py'
 
         if not(os.path.exists(ppline_file)):
@@ -417,47 +448,85 @@ class DltPipeline:
         # DB Lock in the pplication level
         if not(ppline_file.endswith('withmetadata|.py')\
               and ppline_file.endswith('withmetadata|.py')):
-            DuckDBCache.set(f'{db_root_path}/{file_path}.duckdb','lock')
+            DuckDBCache.set(DltPipeline.get_job_lock_key(file_path),'lock')
 
         socket_id = DuckdbUtil.get_socket_id(namespace)
         context = RequestContext(None, socket_id)
         job_execution_id = uuid.uuid4()
+        # Registry (cancel API) and logs key of the run
+        context.pipeline_execution_id = str(job_execution_id)
 
         try:
             DuckdbUtil.check_pipline_db(f'{db_root_path}/{file_path}.duckdb')
             print('####### WILL RUN JOB FOR '+file_path)
 
-            # Run pipeline generater above by passing the python file
-            # Pass environment variables including Vault credentials
-            env_vars = DltPipeline.prepare_pipeline_env_vars()
+            if RunQueue.is_remote():
+                # Run is claimed by a worker node (queue_worker.py) which streams the trace back
+                RunQueue.run_remote(ppline_file, file_path, namespace, context, priority)
+            else:
+                DltPipeline.stream_job_run(ppline_file, context, job_execution_id, file_path, namespace, priority)
+
+            dt = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            ppline_name = str(file_path).replace(f'{namespace}/','')
+            if context.stop_reason == None:
+                DltPipeline.update_pipline_runtime(namespace,ppline_name,dt)
+
+            # DB Lock release in the pplication level
+            DuckDBCache.remove(DltPipeline.get_job_lock_key(file_path))
+        
+        except Exception as err:
+            # DB Lock release in the pplication level
+            DuckDBCache.remove(DltPipeline.get_job_lock_key(file_path))
+            message = f'Error while running job for {file_path.split('/')[1]} pipeline'
             
-            result = subprocess.Popen(['python', ppline_file],
-                                        stdout=subprocess.PIPE,
-                                        stderr=subprocess.PIPE,
-                                        text=True,
-                                        bufsize=1,
-                                        env=env_vars)
+            context.emit_ppline_job_trace(message,error=True)
+            context.emit_ppline_job_trace(err.with_traceback,error=True)
+
+
+    @staticmethod
+    def stream_job_run(ppline_file, context: RequestContext, job_execution_id, file_path = None, namespace = None, priority = 0):
+        """
+        Runs the scheduled pipeline file and streams its output to the logs and UI trace,
+        it's used by the application itself and by the run queue workers (queue_worker.py).
+        file_path is only given when the run holds the pipeline lock (see RunRegistry.release_lock)
+        """
+        # Run pipeline generater above by passing the python file
+        # Pass environment variables including Vault credentials
+        env_vars = DltPipeline.prepare_pipeline_env_vars()
+        limits = RunLimits.for_pipeline(ppline_file)
+        secrets = DltPipeline.get_job_secrets(ppline_file, namespace)
+        
+        result = WorkerPool.start_process(ppline_file, env_vars, limits, secrets)
+        try:
+            RunRegistry.register(job_execution_id, result, limits, file_path, namespace, priority)
             pipeline_exception = False
 
             logger = DltPipeline.get_pipeline_logger(context)
+            trace, timeline, monitor = TraceBatcher(context, job=True), RunTimeline(), ResourceMonitor(result.pid)
 
-            while True:
-                time.sleep(0.1)
-                line = result.stdout.readline()
+            def on_idle():
+                trace.tick()
+                monitor.sample()
+                limits.check_wall(result)
 
-                if line == '': continue
-                if not line: break
+            pump = LogPump(result, on_idle=on_idle, on_event=timeline.consume)
+            line = ''
+
+            for line in pump.lines():
                 line = line.strip()
-                
+                if line == '': continue
+            
                 if (line == 'RUN_SUCCESSFULLY'):
+                    trace.flush()
                     context.emit_ppsuccess()
                     pipeline_exception = False if pipeline_exception == False else pipeline_exception
                     break  
-                
+            
                 elif(line.startswith('RUNTIME_WARNING:') or is_SAWarning(line)):
                     warning_message = line.replace('RUNTIME_WARNING:','')
                     handle_pipeline_log(warning_message, logger, False, True)
                     if context:
+                        trace.flush()
                         context.emit_ppline_trace(warning_message, warn=True)
 
                 else: 
@@ -465,6 +534,7 @@ class DltPipeline:
                         pipeline_exception = True
                         error_message = line.replace('RUNTIME_ERROR:','').replace('ERROR:','')
                         handle_pipeline_log(error_message, logger, True)
+                        trace.flush()
                         context.emit_ppline_job_trace(error_message, error=True)
                         if line.startswith('ERROR:'): break
                     else:
@@ -473,65 +543,129 @@ class DltPipeline:
                                 if(has_ppline_job('start',job_execution_id)):
                                     pass
                         ui_log = str(line).replace('[PIPELINE_LOG]:','').replace('[DLT]:','').replace(' |+| ','')
-                        context.emit_ppline_job_trace(ui_log)
+                        trace.add(ui_log)
                         handle_pipeline_log('Scheduled-Job-log -> '+line, logger)
 
-                             
+            trace.flush()
+                         
             #if result.returncode == 0 and context is not None and pipeline_exception == False:
             #    context.emit_ppsuccess()
 
+            monitor.sample(force=True)
+            # When the output ended without a success/error marker the exit status tells if a limit stopped the run
+            failure_reason = None
+            if not (line == 'RUN_SUCCESSFULLY' or line.startswith('ERROR:')):
+                monitor.final_sample()
+                result.wait()
+                failure_reason = limits.failure_reason(result, pump.stderr_text(), monitor.process_cpu_sec())
             result.kill()
+            result.wait()
+            pump.drain()
+            failure_reason = RunRegistry.stop_reason(job_execution_id) or failure_reason
+            # run_pipeline_job doesn't record the run time of a cancelled/preempted run
+            context.stop_reason = RunRegistry.stop_reason(job_execution_id)
+        finally:
+            DltPipeline.end_run(job_execution_id, result, limits)
+
+        logger.info('pipeline.run.metrics', extra={ **timeline.summary(), **monitor.summary(), 'failure_reason': failure_reason })
+
+        if failure_reason:
+            message = DltPipeline.report_run_failure(limits, failure_reason, logger, context, job=True)
+            clear_job_transaction_id(job_execution_id)
+            return False
+        
+        if pipeline_exception == True:
+            message = f'Runtime Pipeline ({context.pipeline_name}) with execution_id {context.pipeline_execution_id} failed, check the logs for details'
+            handle_pipeline_log(f'SCHEDULE PIPELINE FAILED: Pipeline {context.pipeline_name} with execution_id {context.pipeline_execution_id} failed', logger, True)
+            context.emit_ppline_job_trace(message, error=True)
+        else:
+            if(line.__contains__(SUCCESS_RUN_MESSAGE)):
+                if(has_ppline_job('end',job_execution_id)):
+                    pass
+            context.emit_ppline_job_trace(SUCCESS_RUN_MESSAGE)
+        
+        error_messages, status = None, True
+        if result.returncode != 0:
+            err = pump.stderr_text()
             
-            if pipeline_exception == True:
-                message = f'Runtime Pipeline ({context.pipeline_name}) with execution_id {context.pipeline_execution_id} failed, check the logs for details'
-                handle_pipeline_log(f'SCHEDULE PIPELINE FAILED: Pipeline {context.pipeline_name} with execution_id {context.pipeline_execution_id} failed', logger, True)
-                context.emit_ppline_job_trace(message, error=True)
+            if(err.__contains__('Could not set lock on file')):
+                pass
+
+            error_messages = err.split('\n')
+            if(str(error_messages).__contains__('[WARNING]')):
+                context.emit_ppline_trace(error_messages, warn=True)
             else:
-                if(line.__contains__(SUCCESS_RUN_MESSAGE)):
-                    if(has_ppline_job('end',job_execution_id)):
-                        pass
-                context.emit_ppline_job_trace(SUCCESS_RUN_MESSAGE)
-            
-            error_messages, status = None, True
-            if result.returncode != 0:
-                err = str(result.stderr.read())
-                
-                if(err.__contains__('Could not set lock on file')):
-                    pass
+                message = '\n'.join(error_messages[1:])
+                if message.__contains__('import pkg_resources'):
+                    status = True
+                if status == False:
+                    context.emit_ppline_job_trace(message, error=True)
+                    status = False
 
-                error_messages = err.split('\n')
-                if(str(error_messages).__contains__('[WARNING]')):
-                    context.emit_ppline_trace(error_messages, warn=True)
-                else:
-                    message = '\n'.join(error_messages[1:])
-                    if message.__contains__('import pkg_resources'):
-                        status = True
-                    if status == False:
-                        context.emit_ppline_job_trace(message, error=True)
-                        status = False
 
+        if(status):
+            context.emit_ppline_trace('PIPELINE COMPLETED SUCCESSFULLY')
+            context.emit_ppsuccess()
+            handle_pipeline_log(f'pipeline.success.conclusion', logger)
 
-            if(status):
-                context.emit_ppline_trace('PIPELINE COMPLETED SUCCESSFULLY')
-                context.emit_ppsuccess()
-                handle_pipeline_log(f'pipeline.success.conclusion', logger)
+        clear_job_transaction_id(job_execution_id)
 
-            clear_job_transaction_id(job_execution_id)
+        return status
 
-            dt = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            ppline_name = str(file_path).replace(f'{namespace}/','')
-            DltPipeline.update_pipline_runtime(namespace,ppline_name,dt)
 
-            # DB Lock release in the pplication level
-            DuckDBCache.remove(f'{db_root_path}/{file_path}.duckdb')
-        
-        except Exception as err:
-            # DB Lock release in the pplication level
-            DuckDBCache.remove(f'{db_root_path}/{file_path}.duckdb')
-            message = f'Error while running job for {file_path.split('/')[1]} pipeline'
-            
-            context.emit_ppline_job_trace(message,error=True)
-            context.emit_ppline_job_trace(err.with_traceback,error=True)
+    @staticmethod
+    def get_run_secrets(namespace, metadata: dict) -> SecretBundle:
+        """ Secrets bundle of a run from its source, destination and referenced secret names """
+        referenced = metadata.get('referenced_secrets')
+        names = [metadata.get('source_secret'), metadata.get('destination_secret')]
+        names.extend(referenced if isinstance(referenced, list) else [])
+        return SecretBundle.create(namespace, names)
+
+
+    @staticmethod
+    def get_job_secrets(ppline_file, namespace) -> SecretBundle:
+        """ Secrets bundle of a scheduled run, the names come from the pipeline metadata """
+        if not SecretBundle.enabled or namespace == None: return None
+        ppline_name = Path(ppline_file).stem
+        for suffix in ('__toschedule__', '__withmetadata__', '_toschedule_', '_withmetadata_'):
+            ppline_name = ppline_name.removesuffix(suffix)
+
+        return SecretBundle.create(namespace, MetaStore.get_pipeline_secret_names(namespace, ppline_name))
+
+
+    @staticmethod
+    def end_run(execution_id, process, limits: RunLimits):
+        """
+        Called once the run process was started, also when reading its output failed: the process is
+        stopped and waited, then the run leaves RunRegistry (a stopped one gives its pipeline lock back)
+        """
+        if process.poll() == None:
+            limits.kill(process)
+            process.wait()
+        entry = RunRegistry.unregister(execution_id) if execution_id else None
+        if entry and entry.stop_reason: RunRegistry.release_lock(entry)
+        limits.release()
+
+
+    @staticmethod
+    def report_run_failure(limits: RunLimits, failure_reason, logger: logging.Logger, context: RequestContext, job = False):
+        """
+        Run stopped by a memory/CPU/wall clock limit or cancelled/preempted (RunRegistry),
+        it's a distinct failure in the trace and logs
+        """
+        message = RunRegistry.STOP_MESSAGES.get(failure_reason) or limits.failure_message(failure_reason)
+        logger.error(f'PIPELINE FAILED: {message}', extra={ 'failure_reason': failure_reason, **limits.to_dict() })
+        if context:
+            if job: context.emit_ppline_job_trace(message, error=True)
+            else: context.emit_ppline_trace(message, error=True)
+        return message
+
+
+    @staticmethod
+    def get_job_lock_key(file_path):
+        """ Application level lock key (DuckDBCache) of a scheduled pipeline run """
+        db_root_path = destinations_dir.replace('pipeline','duckdb')
+        return f'{db_root_path}/{file_path}.duckdb'
 
 
     @staticmethod
@@ -555,17 +689,31 @@ class DltPipeline:
                         and ppline_name='{ppline}'"
         cnx.execute(query)
 
+        # Paused schedules are left out by the scheduler due jobs query
         if is_paused != 'paused':
             from services.workspace.Workspace import Workspace
             Workspace.schedule_pipeline_job(namespace, ppline, unpause=True)
-        else:
-            tag_name = f'{namespace}_{ppline}'
-            if schedule.get_jobs(tag_name):
-                schedule.clear(tag_name)
 
-            if schedule.get_jobs(f'{tag_name}-tracinglog'):
-                schedule.clear(f'{tag_name}-tracinglog')
-                        
+
+    @staticmethod
+    def update_pipeline_limits(namespace, ppline, memory_mb, cpu_sec, wall_sec):
+        """ ppline as '*' sets the namespace wide limits, 0 means no limit and None falls back to .env """
+        DuckdbUtil.create_ppline_limits_table()
+        cnx = DuckdbUtil.get_workspace_db_instance().cursor()
+        query = "INSERT INTO ppline_limits (namespace, ppline_name, memory_mb, cpu_sec, wall_sec)\
+                 VALUES (?, ?, ?, ?, ?)\
+                 ON CONFLICT (namespace, ppline_name) DO UPDATE SET\
+                    memory_mb = EXCLUDED.memory_mb, cpu_sec = EXCLUDED.cpu_sec, wall_sec = EXCLUDED.wall_sec"
+        cnx.execute(query, [namespace, ppline, memory_mb, cpu_sec, wall_sec])
+
+
+    @staticmethod
+    def get_pipeline_limits(namespace):
+        DuckdbUtil.create_ppline_limits_table()
+        cnx = DuckdbUtil.get_workspace_db_instance().cursor()
+        field_names = ['ppline_name', 'memory_mb', 'cpu_sec', 'wall_sec']
+        rows = cnx.execute(f"SELECT {','.join(field_names)} FROM ppline_limits WHERE namespace = ?", [namespace]).fetchall()
+        return { row[0]: dict(zip(field_names, row)) for row in rows }
 
 
     @staticmethod
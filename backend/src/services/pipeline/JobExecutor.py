@@ -0,0 +1,196 @@
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from os import getenv as env
+from utils.cache_util import DuckDBCache
+
+
+class JobExecutor:
+    """
+    Bounded worker pool for scheduled pipeline jobs, schedule ticks only enqueue the job
+    so that a long running pipeline no longer blocks the scheduler loop (see Scheduler).
+    Higher priority jobs are dispatched first and, with SCHEDULER_PREEMPTION, a queued job
+    that can't start preempts a lower priority running one (which is queued again)
+    """
+
+    max_workers = int(env('SCHEDULER_MAX_WORKERS', 4))
+    max_per_namespace = int(env('SCHEDULER_MAX_PER_NAMESPACE', 2))
+    preemption = str(env('SCHEDULER_PREEMPTION', 'false')).lower() in ('1', 'true', 'yes')
+
+    pool: ThreadPoolExecutor = None
+    lock = threading.Lock()
+    # Each queued job is (file_path, namespace, due_at, priority)
+    queue = deque()
+    queued_jobs = set()
+    running_jobs = dict()
+    running_priority = dict()
+    running_by_namespace = dict()
+    preempting = set()
+    metrics = {
+        'submitted': 0, 'dispatched': 0, 'completed': 0, 'failed': 0, 'preempted': 0,
+        'skipped_running': 0, 'skipped_queued': 0, 'last_lag_sec': 0.0, 'max_lag_sec': 0.0,
+    }
+
+
+    @staticmethod
+    def start():
+        """ Creates the worker pool and releases pipeline locks left by a previous process """
+        with JobExecutor.lock:
+            if JobExecutor.pool != None: return
+            JobExecutor.pool = ThreadPoolExecutor(max_workers=JobExecutor.max_workers,
+                                                  thread_name_prefix='ppline-job')
+        from services.pipeline.DltPipeline import destinations_dir
+        DuckDBCache.remove_by_prefix(destinations_dir.replace('pipeline','duckdb'), 'lock')
+
+
+    @staticmethod
+    def submit(file_path, namespace, priority = 0):
+        """
+        Called by the schedule tick, the job is skipped if the same pipeline is
+        still queued/running or if its DB lock (DuckDBCache) is still active.
+        Returns whether the job was accepted
+        """
+        from services.pipeline.DltPipeline import DltPipeline
+        JobExecutor.start()
+
+        with JobExecutor.lock:
+            JobExecutor.metrics['submitted'] += 1
+            if file_path in JobExecutor.queued_jobs:
+                JobExecutor.metrics['skipped_queued'] += 1
+                print(f'Skipping tick for {file_path}, previous tick is still queued')
+                return False
+
+            if file_path in JobExecutor.running_jobs\
+                or DuckDBCache.get(DltPipeline.get_job_lock_key(file_path)) != None:
+                JobExecutor.metrics['skipped_running'] += 1
+                print(f'Skipping tick for {file_path}, previous run is still active')
+                return False
+
+            JobExecutor.queue.append((file_path, namespace, datetime.now(), int(priority or 0)))
+            JobExecutor.queued_jobs.add(file_path)
+
+        JobExecutor.dispatch()
+        return True
+
+
+    @staticmethod
+    def is_active(file_path):
+        """ Whether the pipeline is queued or running, a new tick would be skipped """
+        from services.pipeline.DltPipeline import DltPipeline
+        with JobExecutor.lock:
+            return file_path in JobExecutor.queued_jobs or file_path in JobExecutor.running_jobs\
+                or DuckDBCache.get(DltPipeline.get_job_lock_key(file_path)) != None
+
+
+    @staticmethod
+    def dispatch():
+        """ Moves queued jobs (by priority) to the pool while the global and per namespace caps allow it """
+        with JobExecutor.lock:
+            waiting = deque()
+
+            # sorted is stable, same priority jobs keep their due order
+            for job in sorted(JobExecutor.queue, key=lambda job: -job[3]):
+                file_path, namespace, due_at, priority = job
+                namespace_total = JobExecutor.running_by_namespace.get(namespace, 0)
+
+                if len(JobExecutor.running_jobs) >= JobExecutor.max_workers\
+                    or namespace_total >= JobExecutor.max_per_namespace:
+                    waiting.append(job)
+                    continue
+
+                lag = (datetime.now() - due_at).total_seconds()
+                JobExecutor.metrics['dispatched'] += 1
+                JobExecutor.metrics['last_lag_sec'] = lag
+                JobExecutor.metrics['max_lag_sec'] = max(lag, JobExecutor.metrics['max_lag_sec'])
+
+                JobExecutor.queued_jobs.discard(file_path)
+                JobExecutor.running_jobs[file_path] = datetime.now()
+                JobExecutor.running_priority[file_path] = priority
+                JobExecutor.running_by_namespace[namespace] = namespace_total + 1
+                JobExecutor.pool.submit(JobExecutor.run_job, file_path, namespace, priority)
+
+            JobExecutor.queue = waiting
+            victims = JobExecutor.select_preemptions() if JobExecutor.preemption else []
+
+        from services.pipeline.RunRegistry import RunRegistry
+        for file_path in victims:
+            run = RunRegistry.find(file_path)
+            if run == None or not RunRegistry.cancel(run.execution_id, 'preempted'):
+                with JobExecutor.lock: JobExecutor.preempting.discard(file_path)
+
+
+    @staticmethod
+    def select_preemptions():
+        """ Lower priority running jobs to stop so that the blocked higher priority ones can start (lock held) """
+        victims, pending = [], len(JobExecutor.preempting)
+        for file_path, namespace, _, priority in JobExecutor.queue:
+            # The highest priority queued jobs already have a run being preempted for them
+            if pending > 0:
+                pending -= 1
+                continue
+
+            # The namespace cap only lets a job of the same namespace make room
+            namespace_full = JobExecutor.running_by_namespace.get(namespace, 0) >= JobExecutor.max_per_namespace
+            candidates = [
+                running for running, running_priority in JobExecutor.running_priority.items()
+                if running_priority < priority and running not in JobExecutor.preempting
+                    and (not namespace_full or running.split('/')[0] == namespace)
+            ]
+            if not candidates: continue
+
+            # Lowest priority first, then the most recent run (it loses less work)
+            victim = min(candidates, key=lambda running: (JobExecutor.running_priority[running],
+                                                            -JobExecutor.running_jobs[running].timestamp()))
+            JobExecutor.preempting.add(victim)
+            victims.append(victim)
+        return victims
+
+
+    @staticmethod
+    def run_job(file_path, namespace, priority = 0):
+        from services.pipeline.DltPipeline import DltPipeline
+        try:
+            DltPipeline.run_pipeline_job(file_path, namespace, priority)
+            JobExecutor.metrics['completed'] += 1
+        except Exception as err:
+            JobExecutor.metrics['failed'] += 1
+            print(f'Error while running scheduled job for {file_path}: {str(err)}')
+            traceback.print_exc()
+        finally:
+            with JobExecutor.lock:
+                JobExecutor.running_jobs.pop(file_path, None)
+                JobExecutor.running_priority.pop(file_path, None)
+                total = JobExecutor.running_by_namespace.get(namespace, 1) - 1
+                if total <= 0: JobExecutor.running_by_namespace.pop(namespace, None)
+                else: JobExecutor.running_by_namespace[namespace] = total
+
+                # Preempted jobs go back to the queue, they run again once there's room
+                if file_path in JobExecutor.preempting:
+                    JobExecutor.preempting.discard(file_path)
+                    JobExecutor.metrics['preempted'] += 1
+                    JobExecutor.queue.append((file_path, namespace, datetime.now(), priority))
+                    JobExecutor.queued_jobs.add(file_path)
+            JobExecutor.dispatch()
+
+
+    @staticmethod
+    def get_metrics():
+        """ Queue depth, lag and running jobs for the scheduler """
+        with JobExecutor.lock:
+            now = datetime.now()
+            oldest = min([due_at for _, _, due_at, _ in JobExecutor.queue], default=None)
+            return {
+                **JobExecutor.metrics,
+                'max_workers': JobExecutor.max_workers,
+                'max_per_namespace': JobExecutor.max_per_namespace,
+                'preemption': JobExecutor.preemption,
+                'queue_depth': len(JobExecutor.queue),
+                'oldest_queued_lag_sec': (now - oldest).total_seconds() if oldest else 0.0,
+                'running': len(JobExecutor.running_jobs),
+                'running_by_namespace': dict(JobExecutor.running_by_namespace),
+                'running_jobs': {
+                    k: (now - started).total_seconds() for k, started in JobExecutor.running_jobs.items()
+                },
+            }
@@ -0,0 +1,271 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from contextlib import closing
+from os import getenv as env
+from pathlib import Path
+from controller.RequestContext import RequestContext
+
+destinations_dir = f'{str(Path(__file__).parent.parent.parent.parent)}/destinations/pipeline'
+
+
+class SQLiteRunQueue:
+    """
+    File backed run queue, SQLite is used (instead of DuckDB) because the file is shared by
+    the application and the worker nodes processes at the same time
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+
+    def connect(self):
+        cnx = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        cnx.row_factory = sqlite3.Row
+        cnx.execute('PRAGMA journal_mode=WAL')
+        cnx.execute("CREATE TABLE IF NOT EXISTS run_queue (\
+            id INTEGER PRIMARY KEY AUTOINCREMENT,\
+            namespace TEXT,\
+            file_path TEXT,\
+            ppline_file TEXT,\
+            status TEXT DEFAULT 'queued',\
+            worker TEXT,\
+            succeeded INTEGER,\
+            enqueued_at REAL,\
+            started_at REAL,\
+            heartbeat_at REAL,\
+            finished_at REAL)")
+        return cnx
+
+
+    def enqueue(self, namespace, file_path, ppline_file):
+        with closing(self.connect()) as cnx:
+            cursor = cnx.execute('INSERT INTO run_queue (namespace, file_path, ppline_file, enqueued_at)\
+                                  VALUES (?, ?, ?, ?)', [namespace, file_path, ppline_file, time.time()])
+            return cursor.lastrowid
+
+
+    def claim(self, worker):
+        """ Takes the oldest queued run, the write lock (BEGIN IMMEDIATE) prevents double claims """
+        cnx = self.connect()
+        try:
+            cnx.execute('BEGIN IMMEDIATE')
+            row = cnx.execute("SELECT * FROM run_queue WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row != None:
+                cnx.execute("UPDATE run_queue SET status = 'running', worker = ?, started_at = ?, heartbeat_at = ?\
+                             WHERE id = ?", [worker, time.time(), time.time(), row['id']])
+            cnx.execute('COMMIT')
+            return dict(row) if row != None else None
+        except Exception:
+            cnx.execute('ROLLBACK')
+            raise
+        finally:
+            cnx.close()
+
+
+    def heartbeat(self, run_id):
+        with closing(self.connect()) as cnx:
+            cnx.execute('UPDATE run_queue SET heartbeat_at = ? WHERE id = ?', [time.time(), run_id])
+
+
+    def finish(self, run_id, succeeded, status = None):
+        with closing(self.connect()) as cnx:
+            cnx.execute("UPDATE run_queue SET status = ?, succeeded = ?, finished_at = ? WHERE id = ?",
+                        [status or ('done' if succeeded else 'failed'), int(bool(succeeded)), time.time(), run_id])
+
+
+    def expire_queued(self, run_id):
+        """ Fails a run no worker node claimed, False when one claimed it in the meantime """
+        with closing(self.connect()) as cnx:
+            cursor = cnx.execute("UPDATE run_queue SET status = 'failed', succeeded = 0, finished_at = ?\
+                                  WHERE id = ? AND status = 'queued'", [time.time(), run_id])
+            return cursor.rowcount == 1
+
+
+    def request_cancel(self, run_id):
+        """ A queued run is cancelled right away, a running one is stopped by its worker node """
+        with closing(self.connect()) as cnx:
+            cnx.execute("UPDATE run_queue SET status = CASE WHEN status = 'queued' THEN 'cancelled' ELSE 'cancelling' END\
+                         WHERE id = ? AND status IN ('queued', 'running')", [run_id])
+
+
+    def get(self, run_id):
+        with closing(self.connect()) as cnx:
+            row = cnx.execute('SELECT * FROM run_queue WHERE id = ?', [run_id]).fetchone()
+            return dict(row) if row != None else None
+
+
+class RunQueue:
+    """
+    Pluggable run queue for the scheduled pipelines (PPLINE_RUN_QUEUE):
+        - inprocess (default): the run happens as a child of the application process
+        - sqlite: the run is claimed and executed by worker nodes (queue_worker.py)
+    """
+
+    backend = str(env('PPLINE_RUN_QUEUE', 'inprocess')).lower()
+    queue = SQLiteRunQueue(env('PPLINE_RUN_QUEUE_PATH') or f'{destinations_dir}/run_queue.sqlite')
+    poll_interval = float(env('PPLINE_RUN_QUEUE_POLL_SEC', 1))
+    stale_after = int(env('PPLINE_RUN_QUEUE_STALE_SEC', 120))
+    claim_timeout = int(env('PPLINE_RUN_QUEUE_CLAIM_TIMEOUT_SEC', 300))
+    # Shared by the application and the worker nodes, the trace relay endpoint requires it
+    worker_token = env('PPLINE_RUN_QUEUE_TOKEN') or None
+    TOKEN_HEADER = 'X-Run-Queue-Token'
+    # run id -> (socket id, namespace, file path), so worker traces are relayed to the right UI session
+    running = {}
+
+
+    @staticmethod
+    def is_remote():
+        return RunQueue.backend == 'sqlite'
+
+
+    @staticmethod
+    def run_remote(ppline_file, file_path, namespace, context: RequestContext, priority = 0):
+        """ Enqueues the run and waits for a worker node to finish it (it keeps JobExecutor caps valid) """
+        from services.pipeline.RunRegistry import RunRegistry
+        run_id = RunQueue.queue.enqueue(namespace, file_path, os.path.relpath(ppline_file, destinations_dir))
+        RunQueue.running[run_id] = (context.socket_sid, namespace, file_path)
+        RunRegistry.register_remote(context.pipeline_execution_id, run_id, file_path, namespace, priority)
+        try:
+            while True:
+                time.sleep(RunQueue.poll_interval)
+                run = RunQueue.queue.get(run_id)
+                if run['status'] in ('done', 'failed'):
+                    return run['status'] == 'done'
+
+                if run['status'] == 'cancelled':
+                    # Cancelled before a worker node claimed it, otherwise the worker reports it
+                    if run['worker'] == None:
+                        reason = RunRegistry.stop_reason(context.pipeline_execution_id) or 'cancelled'
+                        context.emit_ppline_job_trace(RunRegistry.STOP_MESSAGES[reason], error=True)
+                    return False
+
+                # No worker node alive, the JobExecutor slot and the pipeline lock are given back (see run_pipeline_job)
+                if run['status'] == 'queued' and time.time() - run['enqueued_at'] > RunQueue.claim_timeout:
+                    if RunQueue.queue.expire_queued(run_id):
+                        context.emit_ppline_job_trace(
+                            f'No worker node claimed {file_path} within {RunQueue.claim_timeout} seconds', error=True
+                        )
+                        return False
+
+                if run['status'] in ('running', 'cancelling') and time.time() - run['heartbeat_at'] > RunQueue.stale_after:
+                    RunQueue.queue.finish(run_id, False)
+                    context.emit_ppline_job_trace(f'Worker {run["worker"]} stopped responding while running {file_path}', error=True)
+                    return False
+        finally:
+            RunQueue.running.pop(run_id, None)
+            context.stop_reason = RunRegistry.stop_reason(context.pipeline_execution_id)
+            RunRegistry.unregister(context.pipeline_execution_id)
+
+
+    @staticmethod
+    def is_worker_token(token):
+        """ Requests from worker nodes carry PPLINE_RUN_QUEUE_TOKEN, none is accepted when it's not set """
+        import hmac
+        if RunQueue.worker_token == None or token == None: return False
+        return hmac.compare_digest(str(token), RunQueue.worker_token)
+
+
+    @staticmethod
+    def relay_trace(run_id, payload):
+        """ Trace sent by the worker node through the application API, emitted to the UI socket """
+        from utils.logging.pipeline_logger_config import handle_pipeline_log
+        if run_id not in RunQueue.running: return
+
+        socket_id, namespace, file_path = RunQueue.running[run_id]
+        context = RequestContext(None, socket_id)
+        if payload.get('success'):
+            return context.emit_ppsuccess()
+
+        data, error, warn = payload.get('data'), payload.get('error', False), payload.get('warn', False)
+        context.emit_ppline_trace(data, error, payload.get('job', True), warn)
+
+        # Worker node logs are persisted by the application (pipeline_logs)
+        logger = logging.getLogger(f'pipeline.{file_path.replace("/", ".")}.run_{run_id}')
+        handle_pipeline_log(f'Scheduled-Job-log -> {data}', logger, error, warn)
+
+
+class RemoteRequestContext(RequestContext):
+    """ Worker node side context, the trace goes to the application which owns the UI socket """
+
+    def __init__(self, run_id):
+        super().__init__(None, None)
+        self.run_id = run_id
+        self.url = f'{env("APP_SRV_ADDR")}/pipeline/run/queue/{run_id}/trace'
+
+
+    def post(self, payload):
+        import requests
+        try:
+            requests.post(self.url, data=json.dumps(payload, default=str), timeout=10, headers={
+                'Content-Type': 'application/json', RunQueue.TOKEN_HEADER: RunQueue.worker_token or ''
+            })
+        except Exception as err:
+            print(f'Could not send trace of run {self.run_id}: {str(err)}')
+
+
+    def emit_ppsuccess(self, data=True, socked_sid=None):
+        if not self.success_emitted:
+            self.post({ 'success': data })
+        self.success_emitted = True
+
+
+    def emit_ppline_trace(self, data, error = False, job = False, warn = False):
+        self.post({ 'data': data, 'error': error, 'job': job, 'warn': warn })
+
+
+class QueueWorker:
+    """ Worker node loop, claims the queued runs and executes them like the application does """
+
+    def __init__(self):
+        self.name = f'{socket.gethostname()}-{os.getpid()}'
+
+
+    def start(self):
+        from services.pipeline.DltPipeline import DltPipeline
+        print(f'Pipeline queue worker {self.name} waiting for runs on {RunQueue.queue.path}')
+        if RunQueue.worker_token == None:
+            print('PPLINE_RUN_QUEUE_TOKEN is not set, the application will refuse this worker traces')
+
+        while True:
+            run = RunQueue.queue.claim(self.name)
+            if run == None:
+                time.sleep(RunQueue.poll_interval)
+                continue
+
+            stop_heartbeat, execution_id = threading.Event(), uuid.uuid4()
+            threading.Thread(target=self.heartbeat, args=(run['id'], execution_id, stop_heartbeat), daemon=True).start()
+            succeeded = False
+            try:
+                print(f'Worker {self.name} running {run["file_path"]}')
+                context = RemoteRequestContext(run['id'])
+                # No file_path, the pipeline lock belongs to the application (see RunRegistry.release_lock)
+                succeeded = DltPipeline.stream_job_run(
+                    f'{destinations_dir}/{run["ppline_file"]}', context, execution_id, namespace=run['namespace']
+                )
+            except Exception as err:
+                print(f'Error while running {run["file_path"]} on worker {self.name}: {str(err)}')
+                traceback.print_exc()
+            finally:
+                stop_heartbeat.set()
+                cancelled = RunQueue.queue.get(run['id'])['status'] == 'cancelling'
+                RunQueue.queue.finish(run['id'], succeeded, 'cancelled' if cancelled else None)
+
+
+    def heartbeat(self, run_id, execution_id, stop: threading.Event):
+        """ Keeps the run alive in the queue and stops it when the application asks to cancel it """
+        from services.pipeline.RunRegistry import RunRegistry
+        last_heartbeat = time.monotonic()
+        while not stop.wait(RunQueue.poll_interval):
+            if RunQueue.queue.get(run_id)['status'] == 'cancelling':
+                RunRegistry.cancel(execution_id)
+
+            if time.monotonic() - last_heartbeat >= RunQueue.stale_after / 4:
+                RunQueue.queue.heartbeat(run_id)
+                last_heartbeat = time.monotonic()
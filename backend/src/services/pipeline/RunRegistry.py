@@ -0,0 +1,136 @@
+import signal
+import threading
+import time
+from datetime import datetime
+from os import getenv as env
+from utils.cache_util import DuckDBCache
+
+
+class RunEntry:
+
+    def __init__(self, execution_id, process, limits = None, file_path = None, namespace = None, priority = 0):
+        self.execution_id = execution_id
+        self.process = process
+        self.limits = limits
+        self.file_path = file_path
+        self.namespace = namespace
+        self.priority = priority
+        self.started_at = datetime.now()
+        # Run queue id when the run happens in a worker node (see RunQueue)
+        self.remote_run_id = None
+        # cancelled or preempted, None while the run goes on by itself
+        self.stop_reason = None
+
+
+class RunRegistry:
+    """
+    Live pipeline runs keyed by execution_id, it holds the process handles so that a run
+    can be cancelled (SIGTERM, then SIGKILL after PPLINE_CANCEL_GRACE_SEC) or preempted
+    """
+
+    grace_period = int(env('PPLINE_CANCEL_GRACE_SEC', 10))
+
+    STOP_MESSAGES = {
+        'cancelled': 'Pipeline run cancelled',
+        'preempted': 'Pipeline run stopped to give room to a higher priority one, it will run again',
+    }
+
+    runs: dict[str, RunEntry] = {}
+    lock = threading.Lock()
+
+
+    @staticmethod
+    def register(execution_id, process, limits = None, file_path = None, namespace = None, priority = 0):
+        entry = RunEntry(str(execution_id), process, limits, file_path, namespace, priority)
+        with RunRegistry.lock:
+            RunRegistry.runs[entry.execution_id] = entry
+        return entry
+
+
+    @staticmethod
+    def register_remote(execution_id, remote_run_id, file_path, namespace, priority = 0):
+        entry = RunRegistry.register(execution_id, None, None, file_path, namespace, priority)
+        entry.remote_run_id = remote_run_id
+        return entry
+
+
+    @staticmethod
+    def unregister(execution_id):
+        with RunRegistry.lock:
+            return RunRegistry.runs.pop(str(execution_id), None)
+
+
+    @staticmethod
+    def get(execution_id) -> RunEntry:
+        return RunRegistry.runs.get(str(execution_id))
+
+
+    @staticmethod
+    def find(file_path) -> RunEntry:
+        with RunRegistry.lock:
+            return next((entry for entry in RunRegistry.runs.values() if entry.file_path == file_path), None)
+
+
+    @staticmethod
+    def stop_reason(execution_id):
+        entry = RunRegistry.get(execution_id)
+        return entry.stop_reason if entry else None
+
+
+    @staticmethod
+    def list_runs(namespace = None):
+        now = datetime.now()
+        with RunRegistry.lock:
+            return [
+                {
+                    'execution_id': entry.execution_id, 'file_path': entry.file_path, 'namespace': entry.namespace,
+                    'priority': entry.priority, 'started_at': str(entry.started_at),
+                    'running_sec': (now - entry.started_at).total_seconds(),
+                    'remote': entry.remote_run_id != None, 'stop_reason': entry.stop_reason,
+                }
+                for entry in RunRegistry.runs.values() if namespace == None or entry.namespace == namespace
+            ]
+
+
+    @staticmethod
+    def cancel(execution_id, reason = 'cancelled'):
+        """ Returns False when there's no such live run """
+        entry = RunRegistry.get(execution_id)
+        if entry == None: return False
+        if entry.stop_reason != None: return True
+        entry.stop_reason = reason
+        print(f'Pipeline run {execution_id} ({entry.file_path}) {reason}')
+
+        if entry.remote_run_id != None:
+            # The worker node running it stops it (see QueueWorker)
+            from services.pipeline.RunQueue import RunQueue
+            RunQueue.queue.request_cancel(entry.remote_run_id)
+        else:
+            try:
+                entry.process.send_signal(signal.SIGTERM)
+            except ProcessLookupError: ...
+            threading.Thread(target=RunRegistry.kill_after_grace, args=(entry,), daemon=True).start()
+
+        # The pipeline lock is given back by the run owner once the process exited (DltPipeline.end_run)
+        return True
+
+
+    @staticmethod
+    def kill_after_grace(entry: RunEntry):
+        deadline = time.monotonic() + RunRegistry.grace_period
+        while time.monotonic() < deadline:
+            # The run owner waits on the process (returncode) and then unregisters it
+            if entry.process.returncode != None or RunRegistry.get(entry.execution_id) is not entry: return
+            time.sleep(0.2)
+
+        print(f'Pipeline run {entry.execution_id} did not stop after SIGTERM, killing it')
+        if entry.limits: entry.limits.kill(entry.process)
+        else: entry.process.kill()
+
+
+    @staticmethod
+    def release_lock(entry: RunEntry):
+        """ Scheduled runs hold the pipeline DB lock (DuckDBCache) until their process exited """
+        if entry.file_path == None: return
+        from services.pipeline.DltPipeline import DltPipeline
+        DuckDBCache.remove(DltPipeline.get_job_lock_key(entry.file_path))
@@ -0,0 +1,151 @@
+import threading
+import time as timelib
+import traceback
+from datetime import datetime, timedelta
+from os import getenv as env
+from utils.cron_util import CronExpression
+from utils.duckdb_util import DuckdbUtil
+from services.pipeline.JobExecutor import JobExecutor
+
+
+class Scheduler:
+    """
+    Persistent pipeline scheduler, the next fire time of each pipeline is kept in
+    ppline_schedule.next_run so that runs missed while the app was down are handled
+    according to SCHEDULER_CATCHUP_POLICY:
+        - skip: missed runs are dropped, the pipeline waits for the next fire time
+        - run-once (default): a single run replaces all the missed ones
+        - run-all: every missed run happens (up to SCHEDULER_CATCHUP_MAX_RUNS)
+    """
+
+    tick_interval = float(env('SCHEDULER_TICK_SEC', 1))
+    catchup_policy = str(env('SCHEDULER_CATCHUP_POLICY', 'run-once')).lower()
+    # A due job is only considered missed when it's late for more than this
+    catchup_grace = int(env('SCHEDULER_CATCHUP_GRACE_SEC', 60))
+    catchup_max_runs = int(env('SCHEDULER_CATCHUP_MAX_RUNS', 24))
+
+    running = False
+    lock = threading.Lock()
+
+
+    @staticmethod
+    def next_fire_time(type, time, after: datetime) -> datetime:
+        """ type is min/hour (every <time> minutes/hours) or cron (time holds the expression) """
+        if type == 'min':
+            return after + timedelta(minutes=int(time))
+        if type == 'hour':
+            return after + timedelta(hours=int(time))
+        if type == 'cron':
+            return CronExpression(time).next_after(after)
+        raise ValueError(f'Unknown schedule type {type}')
+
+
+    @staticmethod
+    def validate(type, time):
+        Scheduler.next_fire_time(type, time, datetime.now())
+
+
+    @staticmethod
+    def start():
+        """ Scheduler loop, one due jobs query per tick (it runs in its own thread) """
+        with Scheduler.lock:
+            if Scheduler.running: return
+            Scheduler.running = True
+
+        JobExecutor.start()
+        Scheduler.init_next_runs()
+        while True:
+            try:
+                Scheduler.tick()
+            except Exception as err:
+                print(f'Error while checking the scheduled pipelines: {str(err)}')
+                traceback.print_exc()
+            timelib.sleep(Scheduler.tick_interval)
+
+
+    @staticmethod
+    def init_next_runs():
+        """ Schedules created before next_run existed get theirs from the last run (or now) """
+        cnx = Scheduler.get_cursor()
+        rows = cnx.execute("SELECT id, type, time, last_run FROM ppline_schedule WHERE next_run IS NULL").fetchall()
+        for id, type, time, last_run in rows:
+            try:
+                next_run = Scheduler.next_fire_time(type, time, last_run or datetime.now())
+                cnx.execute('UPDATE ppline_schedule SET next_run = ? WHERE id = ?', [next_run, id])
+            except Exception as err:
+                print(f'Invalid schedule (id {id}) will not run: {str(err)}')
+
+
+    @staticmethod
+    def tick(now: datetime = None):
+        now = now or datetime.now()
+        cnx = Scheduler.get_cursor()
+        due_jobs = cnx.execute("SELECT id, namespace, ppline_name, type, time, next_run, priority\
+                                FROM ppline_schedule\
+                                WHERE next_run <= ? AND is_paused IS DISTINCT FROM 'paused'\
+                                ORDER BY next_run", [now]).fetchall()
+
+        for id, namespace, ppline_name, type, time, next_run, priority in due_jobs:
+            try:
+                Scheduler.fire(cnx, id, f'{namespace}/{ppline_name}', namespace, type, time, next_run, now, priority)
+            except Exception as err:
+                print(f'Error while scheduling {namespace}/{ppline_name}: {str(err)}')
+                traceback.print_exc()
+
+
+    @staticmethod
+    def fire(cnx, id, file_path, namespace, type, time, next_run: datetime, now: datetime, priority = 0):
+        missed = (now - next_run).total_seconds() > Scheduler.catchup_grace
+
+        if missed and Scheduler.catchup_policy == 'skip':
+            print(f'Skipping missed runs of {file_path} (last due at {next_run})')
+            return Scheduler.advance(cnx, id, next_run, Scheduler.next_fire_time(type, time, now))
+
+        if missed and Scheduler.catchup_policy == 'run-all':
+            fire_times = Scheduler.missed_fire_times(type, time, next_run, now)
+            # Only the most recent missed runs are replayed
+            due_at = fire_times[-Scheduler.catchup_max_runs:][0]
+            if JobExecutor.is_active(file_path): return
+            # The next missed run becomes due right away, it's enqueued once this one is accepted
+            if not Scheduler.advance(cnx, id, next_run, due_at): return
+            if not JobExecutor.submit(file_path, namespace, priority): return
+            print(f'Catching up {file_path} run due at {due_at}')
+            return Scheduler.advance(cnx, id, due_at, Scheduler.next_fire_time(type, time, due_at))
+
+        # Claims the fire time before submitting, so that a job is never enqueued twice for it
+        if Scheduler.advance(cnx, id, next_run, Scheduler.next_fire_time(type, time, now)):
+            JobExecutor.submit(file_path, namespace, priority)
+
+
+    @staticmethod
+    def missed_fire_times(type, time, next_run: datetime, now: datetime):
+        fire_times, due_at = [], next_run
+        while due_at <= now:
+            fire_times.append(due_at)
+            due_at = Scheduler.next_fire_time(type, time, due_at)
+        return fire_times
+
+
+    @staticmethod
+    def advance(cnx, id, current_run, next_run):
+        """ Conditional update, returns False when the fire time was already handled """
+        result = cnx.execute('UPDATE ppline_schedule SET next_run = ?\
+                              WHERE id = ? AND next_run = ? RETURNING id', [next_run, id, current_run])
+        return len(result.fetchall()) > 0
+
+
+    @staticmethod
+    def reset_next_run(namespace, ppline):
+        """ Used when (re)activating a schedule, time spent paused is not caught up """
+        cnx = Scheduler.get_cursor()
+        rows = cnx.execute('SELECT id, type, time FROM ppline_schedule WHERE namespace = ? AND ppline_name = ?',
+                           [namespace, ppline]).fetchall()
+        for id, type, time in rows:
+            next_run = Scheduler.next_fire_time(type, time, datetime.now())
+            cnx.execute('UPDATE ppline_schedule SET next_run = ? WHERE id = ?', [next_run, id])
+
+
+    @staticmethod
+    def get_cursor():
+        DuckdbUtil.migrate_ppline_schedule_table()
+        return DuckdbUtil.get_workspace_db_instance().cursor()
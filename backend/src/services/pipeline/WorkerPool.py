@@ -0,0 +1,247 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from os import getenv as env
+from pathlib import Path
+from utils.pipeline.RunLimits import RunLimits
+from utils.pipeline.SecretBundle import SecretBundle
+
+worker_script = f'{str(Path(__file__).parent.parent.parent)}/utils/pipeline/pipeline_worker.py'
+
+
+class WarmProcess:
+    """
+    Popen like handle of a pipeline run forked by a warm worker, it exposes what
+    DltPipeline needs (stdout, stderr, kill, poll, wait and returncode)
+    """
+
+    def __init__(self, conn: socket.socket, stdout, stderr):
+        self.conn = conn
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = None
+        self.pid = json.loads(conn.recv(1024))['pid']
+
+
+    def _set_returncode(self, msg):
+        self.returncode = json.loads(msg)['exit'] if msg else -1
+        self.conn.close()
+        return self.returncode
+
+
+    def poll(self):
+        if self.returncode != None: return self.returncode
+        try:
+            self.conn.setblocking(False)
+            return self._set_returncode(self.conn.recv(1024))
+        except BlockingIOError:
+            return None
+        finally:
+            if self.conn.fileno() != -1: self.conn.setblocking(True)
+
+
+    def wait(self, timeout = None):
+        if self.returncode != None: return self.returncode
+        self.conn.settimeout(timeout)
+        try:
+            return self._set_returncode(self.conn.recv(1024))
+        except socket.timeout:
+            raise subprocess.TimeoutExpired(str(self.pid), timeout)
+
+
+    def send_signal(self, sig):
+        if self.returncode != None: return
+        try:
+            os.kill(self.pid, sig)
+        except ProcessLookupError: ...
+
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+
+class WarmWorker:
+    """ Long lived process (utils/pipeline/pipeline_worker.py) with the pipeline stack already imported """
+
+    def __init__(self):
+        self.runs = 0
+        self.socket_path = f'{tempfile.gettempdir()}/dlt-ppline-worker-{uuid.uuid4().hex[:12]}.sock'
+        self.process = subprocess.Popen(['python', worker_script, self.socket_path], env=os.environ.copy())
+
+        timeout = time.monotonic() + int(env('PPLINE_WORKER_START_TIMEOUT', 60))
+        while not os.path.exists(self.socket_path):
+            if self.process.poll() != None or time.monotonic() > timeout:
+                self.process.kill()
+                raise RuntimeError('Pipeline worker could not be started')
+            time.sleep(0.05)
+
+
+    def memory_mb(self):
+        """ Resident memory of the worker (Linux only, 0 when not available) """
+        try:
+            with open(f'/proc/{self.process.pid}/status') as status:
+                for line in status:
+                    if line.startswith('VmRSS:'): return int(line.split()[1]) / 1024
+        except OSError: ...
+        return 0
+
+
+    def is_usable(self):
+        return self.process.poll() == None\
+            and self.runs < WorkerPool.max_runs\
+            and self.memory_mb() < WorkerPool.max_memory_mb
+
+
+    def run(self, ppline_file, env_vars = None, limits = None, secrets: SecretBundle = None):
+        out_read, out_write = os.pipe()
+        err_read, err_write = os.pipe()
+        events_read, events_write = os.pipe()
+        child_fds = [out_write, err_write, events_write]
+        try:
+            job_env = env_vars or os.environ.copy()
+            if secrets:
+                # The worker sets the descriptor number it got in the run env (see pipeline_worker.py)
+                child_fds.append(secrets.open_fd())
+                job_env = { **job_env, SecretBundle.KEY_VAR: secrets.key }
+
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+            conn.connect(self.socket_path)
+            job = { 'file': ppline_file, 'env': job_env, 'cwd': os.getcwd(),
+                    'limits': limits.to_dict() if limits else None }
+            socket.send_fds(conn, [json.dumps(job).encode()], child_fds)
+        except Exception:
+            for fd in (out_read, err_read, events_read): os.close(fd)
+            raise
+        finally:
+            for fd in child_fds: os.close(fd)
+
+        self.runs += 1
+        process = WarmProcess(
+            conn,
+            os.fdopen(out_read, 'r', encoding='utf-8', errors='replace'),
+            os.fdopen(err_read, 'r', encoding='utf-8', errors='replace'),
+        )
+        process.events = os.fdopen(events_read, 'rb', buffering=0)
+        return process
+
+
+    def retire(self):
+        """ The worker stops accepting runs and exits once the ones in progress finish """
+        try:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+            conn.connect(self.socket_path)
+            conn.send(json.dumps({ 'action': 'retire' }).encode())
+            conn.close()
+        except OSError:
+            self.process.kill()
+
+
+class WorkerPool:
+    """
+    Optional pool of warm pipeline workers (PPLINE_WORKER_POOL), it saves the import cost
+    of the pipeline stack (dlt, sqlalchemy, pyarrow, etc.) on every run. Workers are
+    recycled after PPLINE_WORKER_MAX_RUNS runs or PPLINE_WORKER_MAX_MEMORY_MB resident memory
+    """
+
+    enabled = str(env('PPLINE_WORKER_POOL', 'false')).lower() in ('1', 'true', 'yes')
+    size = int(env('PPLINE_WORKER_POOL_SIZE', 2))
+    max_runs = int(env('PPLINE_WORKER_MAX_RUNS', 50))
+    max_memory_mb = int(env('PPLINE_WORKER_MAX_MEMORY_MB', 1024))
+
+    workers: list[WarmWorker] = []
+    retired: list[WarmWorker] = []
+    next_worker = 0
+    lock = threading.Lock()
+
+
+    @staticmethod
+    def start():
+        """ Pre-forks the workers, called on app start so the first run is already warm """
+        if not WorkerPool.enabled: return
+        with WorkerPool.lock:
+            try:
+                while len(WorkerPool.workers) < WorkerPool.size:
+                    WorkerPool.workers.append(WarmWorker())
+            except Exception as err:
+                print(f'Error while starting pipeline workers: {str(err)}')
+                traceback.print_exc()
+
+
+    @staticmethod
+    def get_worker() -> WarmWorker:
+        with WorkerPool.lock:
+            WorkerPool.retired = [w for w in WorkerPool.retired if w.process.poll() == None]
+
+            for idx, worker in enumerate(WorkerPool.workers):
+                if not worker.is_usable():
+                    worker.retire()
+                    WorkerPool.retired.append(worker)
+                    WorkerPool.workers[idx] = WarmWorker()
+
+            while len(WorkerPool.workers) < WorkerPool.size:
+                WorkerPool.workers.append(WarmWorker())
+
+            WorkerPool.next_worker = (WorkerPool.next_worker + 1) % len(WorkerPool.workers)
+            return WorkerPool.workers[WorkerPool.next_worker]
+
+
+    @staticmethod
+    def start_process(ppline_file, env_vars = None, limits: RunLimits = None, secrets: SecretBundle = None):
+        """
+        Starts the pipeline run in a warm worker when the pool is enabled, otherwise (or in
+        case the worker fails) it falls back to a fresh python process as usual.
+        The run limits (if any) are applied in the child right before the pipeline starts,
+        and the secrets bundle (if any) is inherited through its own descriptor
+        """
+        if limits: limits.prepare()
+        if WorkerPool.enabled:
+            try:
+                return WorkerPool.get_worker().run(ppline_file, env_vars, limits, secrets)
+            except Exception as err:
+                print(f'Pipeline worker unavailable, running {ppline_file} in a new process: {str(err)}')
+                traceback.print_exc()
+
+        events_read, events_write = os.pipe()
+        env_vars = { **(env_vars or os.environ), 'PPLINE_EVENT_FD': str(events_write) }
+        child_fds = [events_write]
+        try:
+            if secrets:
+                secrets_fd = secrets.open_fd()
+                child_fds.append(secrets_fd)
+                env_vars.update(secrets.env_vars(secrets_fd))
+
+            process = subprocess.Popen(['python', ppline_file],
+                                    stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE,
+                                    text=True,
+                                    bufsize=1,
+                                    env=env_vars,
+                                    pass_fds=tuple(child_fds),
+                                    preexec_fn=limits.apply if limits and limits.is_set() else None)
+        except Exception:
+            os.close(events_read)
+            raise
+        finally:
+            for fd in child_fds: os.close(fd)
+
+        process.events = os.fdopen(events_read, 'rb', buffering=0)
+        return process
+
+
+    @staticmethod
+    def shutdown():
+        with WorkerPool.lock:
+            for worker in WorkerPool.workers: worker.retire()
+            WorkerPool.retired.extend(WorkerPool.workers)
+            WorkerPool.workers = []
@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from os import getenv as env
+
+
+class SecretCache:
+    """
+    In-process cache of the Vault KV v2 reads (secrets and listings) done by SecretManager. Values are
+    kept Fernet encrypted with a key that only lives in this process, entries expire after
+    SECRET_CACHE_TTL_SEC (or the secret lease when shorter) and are dropped when SecretManager writes
+    the path. A read older than a version written by this process (e.g. from a standby) is not cached
+    """
+
+    enabled = str(env('SECRET_CACHE_ENABLED', 'true')).lower() == 'true'
+    ttl = int(env('SECRET_CACHE_TTL_SEC', 60))
+    max_entries = int(env('SECRET_CACHE_MAX_ENTRIES', 1024))
+
+    # (namespace, kind, path) -> { 'value': encrypted, 'version': int, 'expires_at': float }, most recently used last
+    entries: OrderedDict = OrderedDict()
+    # (namespace, path) -> last version written through SecretManager
+    min_versions: dict[tuple, int] = {}
+    hits = 0
+    misses = 0
+    fernet = None
+    lock = threading.Lock()
+
+
+    @staticmethod
+    def get(namespace, path, kind = 'secret'):
+        """ Cached value or None when missing/expired """
+        if not SecretCache.is_active(): return None
+
+        key = (namespace, kind, path)
+        with SecretCache.lock:
+            entry = SecretCache.entries.get(key)
+            if entry == None or entry['expires_at'] <= time.monotonic():
+                if entry != None: SecretCache.entries.pop(key)
+                SecretCache.misses += 1
+                return None
+            SecretCache.entries.move_to_end(key)
+            SecretCache.hits += 1
+
+        # A new object is decrypted on each get, callers can change it freely
+        return json.loads(SecretCache.fernet.decrypt(entry['value']))
+
+
+    @staticmethod
+    def set(namespace, path, value, kind = 'secret', version = None, lease_duration = 0):
+        if not SecretCache.is_active(): return
+
+        ttl = min(SecretCache.ttl, lease_duration) if lease_duration else SecretCache.ttl
+        encrypted = SecretCache.fernet.encrypt(json.dumps(value).encode())
+        with SecretCache.lock:
+            if version != None and version < SecretCache.min_versions.get((namespace, path), 0): return
+            SecretCache.entries[(namespace, kind, path)] = {
+                'value': encrypted, 'version': version, 'expires_at': time.monotonic() + ttl
+            }
+            SecretCache.entries.move_to_end((namespace, kind, path))
+            while len(SecretCache.entries) > SecretCache.max_entries:
+                SecretCache.entries.popitem(last=False)
+
+
+    @staticmethod
+    def invalidate(namespace, path = None, version = None):
+        """ Drops the path (and the ones under it) plus the namespace listings, or all the namespace entries """
+        with SecretCache.lock:
+            if path != None and version != None:
+                SecretCache.min_versions[(namespace, path)] = version
+            keys = [
+                key for key in SecretCache.entries.keys()
+                if key[0] == namespace and (
+                    path == None or key[1] == 'list' or key[2] == path or str(key[2]).startswith(f'{path}/')
+                )
+            ]
+            for key in keys: SecretCache.entries.pop(key)
+
+
+    @staticmethod
+    def is_active():
+        if not SecretCache.enabled: return False
+        if SecretCache.fernet == None:
+            with SecretCache.lock:
+                if SecretCache.fernet == None:
+                    try:
+                        from cryptography.fernet import Fernet
+                        SecretCache.fernet = Fernet(Fernet.generate_key())
+                    except ImportError:
+                        print('Secret cache disabled, cryptography package is not installed')
+                        SecretCache.enabled = False
+                        return False
+        return True
+
+
+    @staticmethod
+    def get_metrics():
+        with SecretCache.lock:
+            return {
+                'enabled': SecretCache.enabled, 'entries': len(SecretCache.entries),
+                'hits': SecretCache.hits, 'misses': SecretCache.misses,
+            }
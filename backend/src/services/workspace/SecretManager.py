@@ -1,8 +1,11 @@
 import hvac
 from os import getenv as env
 from hvac import Client
-from hvac.exceptions import InvalidPath, InvalidRequest
+from hvac.exceptions import InvalidPath, InvalidRequest, Forbidden, Unauthorized
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from services.workspace.SecretCache import SecretCache
+from utils.pipeline.SecretBundle import SecretBundle
 from services.workspace.supper.SecretManagerType import SecretManagerType
 import utils.database_secret as DBSecret
 from utils.SQLDatabase import SQLConnection
@@ -29,6 +32,8 @@ class SecretManager(SecretManagerType):
         else env('HASHICORP_CERTIF_PATH')
     
     db_secrete_obj: DBSecret = None
+    # Max Vault reads at the same time when many paths are read at once (e.g. referenced secrets)
+    read_workers = int(env('SECRET_READ_WORKERS', 8))
 
     def __init__():
         pass
@@ -37,7 +42,8 @@ class SecretManager(SecretManagerType):
         return referencedSecrets(namespace, secret_names)
 
     
-    def ppline_connect_to_vault() -> hvac.Client:
+    def ppline_connect_to_vault(reconnect = False) -> hvac.Client:
+        """ The client already connected with the same address and token is reused unless reconnect """
 
         vault_host, vault_pass = env('VAULT_ADDR'), env('VAULT_TOKEN')
         vault_url = vault_host if vault_host != None else env('HASHICORP_HOST')
@@ -47,6 +53,10 @@ class SecretManager(SecretManagerType):
             if str(env('HASHICORP_CERTIF_PATH','false')).lower() == 'false'\
             else env('HASHICORP_CERTIF_PATH')
 
+        if not reconnect and SecretManager.vault_instance != None\
+            and SecretManager.vault_url == vault_url and SecretManager.vault_token == vault_token:
+            return SecretManager.vault_instance
+
         params = { 
             'vault_url': vault_url, 
             'vault_token': vault_token,
@@ -110,11 +120,7 @@ class SecretManager(SecretManagerType):
                     }
 
                     SecretManager.save_secrets_metadata(namespace, { secrets['connectionName'] : secrets['bucketUrl'] })
-                    return SecretManager.vault_instance.secrets.kv.v2.create_or_update_secret(
-                        mount_point=namespace,
-                        path=path,
-                        secret=secret_values
-                    )
+                    return SecretManager.write_secret(namespace, path, secret_values)
  
 
             for item in params['dbConfig']['secrets']:
@@ -122,22 +128,31 @@ class SecretManager(SecretManagerType):
                 k = key_value[0]
                 v = key_value[1]
 
-                SecretManager.vault_instance.secrets.kv.v2.create_or_update_secret(
-                    mount_point=namespace,
-                    path=path+'/'+k,
-                    secret={ k: v }
-                )
+                SecretManager.write_secret(namespace, path+'/'+k, { k: v })
         else:
             if 'dbConfig' in params:
                 params = { **params, 'dbConfig': {} }
 
-            SecretManager.vault_instance.secrets.kv.v2.create_or_update_secret(
+            SecretManager.write_secret(namespace, path, params)
+
+        SecretManager.save_api_secret_metadata(namespace, path, params)
+
+
+    def write_secret(namespace, path, secret: dict):
+        """ Vault write, the cached path is dropped so that next reads get the new version """
+        try:
+            result = SecretManager.vault_instance.secrets.kv.v2.create_or_update_secret(
                 mount_point=namespace,
                 path=path,
-                secret=params
+                secret=secret
             )
+        except Exception:
+            SecretCache.invalidate(namespace, path)
+            raise
 
-        SecretManager.save_api_secret_metadata(namespace, path, params)
+        version = ((result or {}).get('data') or {}).get('version') if isinstance(result, dict) else None
+        SecretCache.invalidate(namespace, path, version)
+        return result
 
     
     def save_api_secret_metadata(namespace, path, params):
@@ -177,19 +192,57 @@ class SecretManager(SecretManagerType):
         elif not edit and not str(path).startswith('main/db/'):
             path = 'metadata' if path == 'metadata' else 'main/api/'+path
         try:
-            if not SecretManager.vault_instance.is_authenticated():
-                SecretManager.ppline_connect_to_vault()
-                
-            secrets = SecretManager.vault_instance.secrets.kv.v2.read_secret_version(
+            data = SecretManager.read_secret(namespace, path)
+        except Exception as err:
+            print('Error on getting the secrets: ', str(err))
+            ...
+        return data
+
+
+    def read_secret(namespace, path, cached = True) -> dict:
+        """
+        Secret data from the run secrets bundle (pipeline process), the cache, or from Vault
+        (connecting again once if the token was refused). cached=False always reads Vault
+        """
+        if cached:
+            data = SecretBundle.get(namespace, path)
+            if data != None: return data
+
+            data = SecretCache.get(namespace, path)
+            if data != None: return data
+
+        def read():
+            return SecretManager.vault_instance.secrets.kv.v2.read_secret_version(
                 path=path,
                 mount_point=namespace,
                 raise_on_deleted_version=True
             )
-            data = secrets['data']['data']
-        except Exception as err:
-            print('Error on getting the secrets: ', str(err))
-            ...
+
+        try:
+            secrets = read()
+        except (Forbidden, Unauthorized):
+            SecretManager.ppline_connect_to_vault(reconnect=True)
+            secrets = read()
+
+        data = secrets['data']['data']
+        SecretCache.set(
+            namespace, path, data,
+            version=(secrets['data'].get('metadata') or {}).get('version'),
+            lease_duration=secrets.get('lease_duration') or 0
+        )
         return data
+
+
+    def read_secrets(namespace, paths: list) -> dict:
+        """ { path: data } of many paths, the ones not cached are read from Vault at the same time """
+        paths = list(dict.fromkeys(paths))
+        if len(paths) <= 1:
+            return { path: SecretManager.get_secret(namespace, path, edit=True) for path in paths }
+
+        workers = max(1, min(SecretManager.read_workers, len(paths)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(lambda path: SecretManager.get_secret(namespace, path, edit=True), paths)
+            return dict(zip(paths, results))
     
     
     def get_pipeline_secret(namespace, path):
@@ -197,12 +250,16 @@ class SecretManager(SecretManagerType):
 
 
     def list_secrets_by_path(namespace, path):
+        keys = SecretCache.get(namespace, path, kind='list')
+        if keys != None: return keys
+
         secrets = SecretManager.vault_instance.secrets.kv.v2.list_secrets(
             path=path,
             mount_point=namespace
         )
-        print(secrets)
-        return secrets['data']['keys']
+        keys = secrets['data']['keys']
+        SecretCache.set(namespace, path, keys, kind='list')
+        return keys
         
 
     def list_secret_names(namespace):
@@ -212,28 +269,22 @@ class SecretManager(SecretManagerType):
 
         secret_paths = []
         try:
-            secret_paths = SecretManager.vault_instance.secrets.kv.v2.list_secrets(path='main', mount_point=namespace)
+            secret_paths = SecretManager.list_secrets_by_path(namespace, 'main')
         except InvalidPath as err:
             print('Error while reading secrets list: ')
             print(err)
             return None
-        
-        secret_paths = secret_paths['data']['keys']
 
-        db_secrets = []
-        if secret_paths.__contains__('db/'):
-            db_secrets = SecretManager.vault_instance\
-                .secrets.kv.v2.list_secrets( path='main/db/', mount_point=namespace)['data']['keys']
-        
-        api_secrets = []
-        if secret_paths.__contains__('api/'):
-            api_secrets = SecretManager.vault_instance\
-                .secrets.kv.v2.list_secrets( path='main/api/', mount_point=namespace)['data']['keys']
+        # db and api listings and the metadata don't depend on each other, they're read at the same time
+        has_db, has_api = secret_paths.__contains__('db/'), secret_paths.__contains__('api/')
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            db_secrets = executor.submit(SecretManager.list_secrets_by_path, namespace, 'main/db/') if has_db else None
+            api_secrets = executor.submit(SecretManager.list_secrets_by_path, namespace, 'main/api/') if has_api else None
+            metadata = executor.submit(SecretManager.get_secret, namespace, 'metadata') if has_db or has_api else None
 
-        metadata = {}
-        db_secrets
-        if(len(db_secrets) or len(api_secrets)):
-            metadata = SecretManager.get_secret(namespace, path='metadata')
+            db_secrets = db_secrets.result() if db_secrets else []
+            api_secrets = api_secrets.result() if api_secrets else []
+            metadata = (metadata.result() if metadata else {}) if len(db_secrets) or len(api_secrets) else {}
 
         return {
             'db_secrets': db_secrets,
@@ -244,7 +295,8 @@ class SecretManager(SecretManagerType):
 
     def save_secrets_metadata(namespace, new_data):
         try:
-            metadata = SecretManager.get_secret(namespace, path='metadata')
+            # Read-modify-write, a cached (older) metadata would drop entries written since
+            metadata = SecretManager.read_secret(namespace, 'metadata', cached=False)
             metadata = { **metadata, **new_data, 'dbConfig': {} }
             SecretManager.create_secret(namespace, metadata, path='metadata')
         except InvalidPath:
@@ -257,7 +309,19 @@ class SecretManager(SecretManagerType):
             
         path = f'main/db/{connection_name}'
         secret = SecretManager.get_secret(namespace, path=path)
+        return SecretManager.with_driver(secret)
+
+
+    def get_db_secrets(namespace, connection_names: list, from_pipeline = False) -> dict:
+        """ { connection_name: secret } read in one batch """
+        if from_pipeline:
+            SecretManager.ppline_connect_to_vault()
+
+        secrets = SecretManager.read_secrets(namespace, [f'main/db/{name}' for name in connection_names])
+        return { name: SecretManager.with_driver(secrets[f'main/db/{name}']) for name in connection_names }
+
 
+    def with_driver(secret: dict):
         if 'dbengine' in secret:
             if secret['dbengine'] == 'mssql':
                 secret['connection_url'] = secret['connection_url']+f'{SQLConnection.get_mssql_driver()}'
@@ -281,9 +345,10 @@ class SecretManager(SecretManagerType):
 
         # Filter out empty strings from references
         references = [ref for ref in references if ref and ref.strip()]
+        db_secrets = SecretManager.get_db_secrets(namespace, references)
         
         secrets = {
-            secret: clean_private_key(SecretManager.get_db_secret(namespace,secret)[secret]) 
+            secret: clean_private_key(db_secrets[secret][secret]) 
             for secret in references
         }
         
@@ -6,9 +6,8 @@ import duckdb
 import re
 from utils.duckdb_util import DuckdbUtil
 from tabulate import tabulate
-from services.pipeline.DltPipeline import DltPipeline
-import schedule
-import time as timelib
+from services.pipeline.Scheduler import Scheduler
+from datetime import datetime
 from utils.cache_util import DuckDBCache
 
 pattern = r'^use.*$'
@@ -456,18 +455,24 @@ class Workspace:
 
 
     @staticmethod
-    def run_sql_query(database = None, query = None):
+    def run_sql_query(database = None, query = None, namespace = None, page_size = None, stream = None):
+        """ First page of the result (see QueryCursors for the next ones), or the whole result as a stream """
+        from utils.db.QueryCursor import QueryCursor, QueryCursors
+        cursor, handed_over = None, False
         try:
             cnx = DuckdbUtil.get_connection_for(f'{database}')
             cursor = cnx.cursor()
-            result = cursor.execute(query).fetchall()
+            cursor.execute(query)
             fields = query.lower().split('from')[0].split('select',1)[1]
             
             if(fields.strip() == '*'):
                 fields = [field[0] for field in cursor.description]
                 fields = ','.join(fields)
 
-            return { 'result': result, 'fields': fields }
+            result = QueryCursor(fields.split(','), cursor.fetchmany, cursor.close)
+            # From here the QueryCursor closes the DuckDB cursor
+            handed_over = True
+            return QueryCursors.respond(result, namespace, page_size, stream)
         
         except duckdb.BinderException as err:
             print(f'Error while running query: {query}')
@@ -485,6 +490,10 @@ class Workspace:
             print(f'Error while running query: {query}')
             print(str(err))
             return { 'error': True, 'result': str(err), 'code': 'err' }
+
+        finally:
+            if cursor != None and not handed_over:
+                cursor.close()
     
     
     @staticmethod
@@ -549,17 +558,17 @@ class Workspace:
     
 
     @staticmethod
-    def create_ppline_schedule(ppline_name, schedule_settings, namespace, type, periodicity, time):
+    def create_ppline_schedule(ppline_name, schedule_settings, namespace, type, periodicity, time, priority = 0):
         try:
             table = 'ppline_schedule'
-            if(DuckdbUtil.workspace_table_exists(table) == False):
-                DuckdbUtil.create_ppline_schedule_table()
+            DuckdbUtil.migrate_ppline_schedule_table()
+            next_run = Scheduler.next_fire_time(type, time, datetime.now())
 
             cnx = DuckdbUtil.get_workspace_db_instance()
             cursor = cnx.cursor()
-            query = f"INSERT INTO {table} (ppline_name,schedule_settings,namespace,type,periodicity,time)\
-                      VALUES ('{ppline_name}', '{schedule_settings}', '{namespace}','{type}','{periodicity}','{time}')"
-            cursor.execute(query)
+            query = f"INSERT INTO {table} (ppline_name,schedule_settings,namespace,type,periodicity,time,next_run,priority)\
+                      VALUES ('{ppline_name}', '{schedule_settings}', '{namespace}','{type}','{periodicity}',?,?,?)"
+            cursor.execute(query, [time, next_run, int(priority or 0)])
 
         except duckdb.IOException as err:
             print({ 'error': True, 'error_list': err })
@@ -570,13 +579,12 @@ class Workspace:
 
         field_names = [
             'id','ppline_name','schedule_settings','namespace',
-            'type','periodicity','time', 'last_run', 'is_paused'
+            'type','periodicity','time', 'last_run', 'is_paused', 'next_run', 'priority'
         ]
 
         try:
             table = 'ppline_schedule'
-            if(DuckdbUtil.workspace_table_exists(table) == False):
-                DuckdbUtil.create_ppline_schedule_table()
+            DuckdbUtil.migrate_ppline_schedule_table()
 
             where = f"WHERE namespace = '{namespace}'" if namespace != None else ''
             where = f"{where} AND ppline_name = '{ppline}'" if ppline != None else where
@@ -617,8 +625,6 @@ class Workspace:
         except duckdb.IOException as err:
             print({ 'error': True, 'error_list': err })
 
-    schedule_jobs = dict()        
-
 
     @staticmethod
     def get_oracle_dn(hostname, port):
@@ -628,39 +634,16 @@ class Workspace:
 
     @staticmethod
     def schedule_pipeline_job(namespace = None, ppline = None, unpause = False):
-        result = Workspace.get_ppline_schedule(namespace, ppline)
-        if result['error'] != True:
-            schedules = result['data'] if 'data' in result else {}
-        
-            for ppline_name, sched in schedules.items():
-                is_paused = sched['is_paused']
-                if is_paused == 'paused': continue
-
-                _namespace = sched['namespace']
-                type = sched['type']
-                periodicity = sched['periodicity']
-                time = int(sched['time'])
-                file_path = f'{_namespace}/{ppline_name}'
-                tag_name = f'{_namespace}_{ppline_name}'
-
-                if(Workspace.schedule_jobs.get(file_path,None) != True):
-                    if(type == 'min'):
-                        schedule.every(time).minutes.do(DltPipeline.run_pipeline_job, file_path, _namespace).tag(tag_name)
-                    if(type == 'hour'):
-                        schedule.every(time).hours.do(DltPipeline.run_pipeline_job, file_path, _namespace).tag(tag_name)
-
-                    print(f'Schedule a job for {file_path} to happen {periodicity} {time} {type}')
-                    Workspace.schedule_jobs[file_path] = True
-
-            # The infinit loop will be running in a separate thread
-            # which will consider all scheduled jobs, when if specified
-            # the jobe name (whithin a namespace), it'll run in the mai thread
-            if (namespace == None and ppline == None):
-                while True:
-                    schedule.run_pending()
-                    timelib.sleep(1)
-        else:
-            ...
+        """
+        With no pipeline specified it starts the scheduler loop (Scheduler), due jobs are
+        then found through ppline_schedule.next_run, so nothing is kept in memory per job.
+        On unpause the pipeline next run is worked out again from now
+        """
+        if (namespace == None and ppline == None):
+            return Scheduler.start()
+
+        if unpause:
+            Scheduler.reset_next_run(namespace, ppline)
 
         
     @staticmethod
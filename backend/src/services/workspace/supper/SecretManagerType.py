@@ -12,6 +12,9 @@ class SecretManagerType:
     @staticmethod
     def create_db_secret(namespace, params: dict): ...
 
+    @staticmethod
+    def write_secret(namespace, path, secret: dict): ...
+
     @staticmethod
     def get_secret(namespace, path): ...
 
@@ -1,13 +1,13 @@
 import boto3
-import polars as pl
 from botocore.exceptions import ClientError, NoCredentialsError, PartialCredentialsError
 from botocore.client import Config
 from botocore import UNSIGNED
 import traceback
-from io import BytesIO
-import json
 from services.workspace.supper.SecretManagerType import SecretManagerType
 from services.workspace.SecretManager import SecretManager
+from utils.BucketPreview import BucketPreview
+from utils.BucketListing import BucketListing
+from utils.S3ClientPool import S3ClientPool
 
 
 class BucketConnector:
@@ -18,7 +18,6 @@ class BucketConnector:
     """
 
     secret_manager: SecretManagerType
-    connections = {}
 
     @staticmethod
     def get_s3_connection(namespace, connection_name, secret=None):
@@ -33,24 +32,11 @@ class BucketConnector:
         Returns:
             boto3.client: Authenticated S3 client
         """
-        connection_key = f'{namespace}-{connection_name}'
-        
-        if connection_key in BucketConnector.connections:
-            return BucketConnector.connections[connection_key]
-        
         if secret is None:
             secret = BucketConnector.secret_manager.get_secret(namespace, f'main/s3/{connection_name}')
         
-        # Create S3 client with credentials from secret
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=secret['access_key_id'],
-            aws_secret_access_key=secret['secret_access_key'],
-            region_name=secret.get('region', 'us-east-1')
-        )
-        
-        BucketConnector.connections[connection_key] = s3_client
-        return s3_client
+        # Kept by namespace + connection + region, and recreated when the secret credentials change
+        return S3ClientPool.get(namespace, connection_name, secret)
 
     @staticmethod
     def test_s3_connection(namespace, connection_name):
@@ -124,7 +110,7 @@ class BucketConnector:
         return {'result': message, 'error': error}
 
     @staticmethod
-    def list_s3_objects(namespace, connection_name, prefix='', max_keys=100):
+    def list_s3_objects(namespace, connection_name, prefix='', max_keys=100, continuation_token=None, delimiter=None, with_schema=False):
         """
         List objects in S3 bucket using Secret Manager credentials
         
@@ -132,10 +118,13 @@ class BucketConnector:
             namespace (str): User namespace
             connection_name (str): S3 connection name
             prefix (str): Object key prefix filter
-            max_keys (int): Maximum number of objects to return
+            max_keys (int): Maximum number of objects (and folders) to return
+            continuation_token (str): next_token of the previous page
+            delimiter (str): Lists one level only, the sub prefixes are returned as folders
+            with_schema (bool): Adds each file schema
             
         Returns:
-            dict: {'objects': list, 'error': bool, 'message': str}
+            dict: {'objects': list, 'folders': list, 'next_token': str, 'error': bool, 'message': str}
         """
         try:
             # Get secret and S3 client
@@ -143,30 +132,14 @@ class BucketConnector:
             s3_client = BucketConnector.get_s3_connection(namespace, connection_name, secret)
             bucket_name = secret['bucket_name']
             
-            # List objects
-            kwargs = {
-                'Bucket': bucket_name,
-                'MaxKeys': max_keys
-            }
-            
-            if prefix:
-                kwargs['Prefix'] = prefix
-            
-            response = s3_client.list_objects_v2(**kwargs)
-            
-            objects = []
-            for obj in response.get('Contents', []):
-                objects.append({
-                    'key': obj['Key'],
-                    'size': obj['Size'],
-                    'last_modified': obj['LastModified'].isoformat(),
-                    'storage_class': obj.get('StorageClass', 'STANDARD')
-                })
+            page = BucketListing.list_page(s3_client, bucket_name, prefix, max_keys, continuation_token, delimiter)
+            if with_schema:
+                BucketListing.add_schemas(s3_client, bucket_name, page['objects'])
             
             return {
-                'objects': objects,
+                **page,
                 'error': False,
-                'message': f'Found {len(objects)} objects'
+                'message': f'Found {len(page["objects"])} objects'
             }
             
         except Exception as e:
@@ -197,49 +170,16 @@ class BucketConnector:
             s3_client = BucketConnector.get_s3_connection(namespace, connection_name, secret)
             bucket_name = secret['bucket_name']
             
-            # Get file object
-            response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-            file_content = response['Body'].read()
-            
-            # Determine file type and parse with Polars
+            # Only the beginning of the file (or the Parquet footer and first row group) is read
             file_extension = file_key.lower().split('.')[-1]
-            
-            if file_extension == 'csv':
-                # Use Polars to scan CSV
-                df = pl.read_csv(BytesIO(file_content))
-                data = df.head(rows).to_dicts()
-                
-            elif file_extension in ['json', 'jsonl', 'ndjson']:
-                # Parse JSON/JSONL with Polars
-                if file_extension == 'json':
-                    # Regular JSON - try to read as JSON first
-                    try:
-                        df = pl.read_json(BytesIO(file_content))
-                        data = df.head(rows).to_dicts()
-                    except:
-                        # Fallback to manual parsing for complex JSON
-                        content_str = file_content.decode('utf-8')
-                        json_data = json.loads(content_str)
-                        if isinstance(json_data, list):
-                            data = json_data[:rows]
-                        else:
-                            data = [json_data]
-                else:
-                    # JSONL/NDJSON
-                    df = pl.read_ndjson(BytesIO(file_content))
-                    data = df.head(rows).to_dicts()
-                    
-            elif file_extension == 'parquet':
-                # Use Polars to scan Parquet
-                df = pl.read_parquet(BytesIO(file_content))
-                data = df.head(rows).to_dicts()
-                
-            else:
+            if BucketPreview.file_type(file_key) == None:
                 return {
                     'data': [],
                     'error': True,
                     'message': f'Unsupported file type: {file_extension}. Supported types: csv, json, jsonl, ndjson, parquet'
                 }
+
+            data = BucketPreview.preview(s3_client, bucket_name, file_key, rows)
             
             return {
                 'data': data,
@@ -292,7 +232,10 @@ class BucketConnector:
             'access_key_id': config.get('access_key_id', ''),
             'secret_access_key': config.get('secret_access_key', ''),
             'bucket_name': config.get('bucket_name', ''),
-            'region': config.get('region', 'us-east-1')
+            'region': config.get('region', 'us-east-1'),
+            # S3 client reuse key (see S3ClientPool)
+            'namespace': namespace,
+            'connection_name': secret
         }
         
         # Validate required credentials
@@ -0,0 +1,129 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from os import getenv as env
+from utils.BucketPreview import BucketPreview
+from utils.BucketSchemaCache import BucketSchemaCache
+
+
+class BucketListing:
+    """
+    Bucket object listing in pages of max_keys (S3 continuation tokens), optionally as folders (delimiter)
+    so that only one level of a prefix is listed. File schemas are served from BucketSchemaCache and the
+    missing ones inferred by at most S3_SCHEMA_WORKERS ranged reads at a time (shared by all listings)
+    """
+
+    # list_objects_v2 max keys per call
+    MAX_KEYS_PER_CALL = 1000
+
+    schema_workers = int(env('S3_SCHEMA_WORKERS', 8))
+    max_keys = int(env('S3_LIST_MAX_KEYS', 1000))
+
+    executor: ThreadPoolExecutor = None
+    lock = threading.Lock()
+
+
+    @staticmethod
+    def list_page(s3_client, bucket_name, prefix = '', max_keys = 100, continuation_token = None, delimiter = None) -> dict:
+        """ { objects, folders, next_token }, next_token is None when there's nothing left to list """
+        max_keys = max(1, min(int(max_keys or 100), BucketListing.max_keys))
+        objects, folders, token = [], [], continuation_token
+
+        while True:
+            kwargs = BucketListing.list_kwargs(bucket_name, prefix, max_keys - len(objects) - len(folders), token, delimiter)
+
+            response = s3_client.list_objects_v2(**kwargs)
+            token = BucketListing.add_response(response, objects, folders)
+            if token == None or len(objects) + len(folders) >= max_keys: break
+
+        return { 'objects': objects, 'folders': folders, 'next_token': token }
+
+
+    @staticmethod
+    async def list_page_async(s3_client, bucket_name, prefix = '', max_keys = 100, continuation_token = None, delimiter = None) -> dict:
+        """ list_page with an aiobotocore client """
+        max_keys = max(1, min(int(max_keys or 100), BucketListing.max_keys))
+        objects, folders, token = [], [], continuation_token
+
+        while True:
+            kwargs = BucketListing.list_kwargs(bucket_name, prefix, max_keys - len(objects) - len(folders), token, delimiter)
+            response = await s3_client.list_objects_v2(**kwargs)
+            token = BucketListing.add_response(response, objects, folders)
+            if token == None or len(objects) + len(folders) >= max_keys: break
+
+        return { 'objects': objects, 'folders': folders, 'next_token': token }
+
+
+    @staticmethod
+    def list_kwargs(bucket_name, prefix, max_keys, token, delimiter) -> dict:
+        kwargs = { 'Bucket': bucket_name, 'MaxKeys': min(max_keys, BucketListing.MAX_KEYS_PER_CALL) }
+        if prefix: kwargs['Prefix'] = prefix
+        if delimiter: kwargs['Delimiter'] = delimiter
+        if token: kwargs['ContinuationToken'] = token
+        return kwargs
+
+
+    @staticmethod
+    def add_response(response, objects: list, folders: list):
+        """ Adds the list_objects_v2 response objects/folders, returns the continuation token (None at the end) """
+        for obj in response.get('Contents', []):
+            objects.append({
+                'key': obj['Key'],
+                'size': obj['Size'],
+                'last_modified': obj['LastModified'].isoformat(),
+                'storage_class': obj.get('StorageClass', 'STANDARD'),
+                'etag': str(obj.get('ETag', '')).strip('"'),
+            })
+        folders.extend(folder['Prefix'] for folder in response.get('CommonPrefixes', []))
+        return response.get('NextContinuationToken') if response.get('IsTruncated') else None
+
+
+    @staticmethod
+    def add_schemas(s3_client, bucket_name, objects: list):
+        """ Sets the schema of each object ({ column: type }, None when not a supported/readable file) """
+        files = {
+            obj['key']: obj['etag'] for obj in objects
+            if obj['size'] > 0 and BucketPreview.file_type(obj['key']) != None
+        }
+
+        try:
+            schemas = BucketSchemaCache.get_many(bucket_name, files)
+        except Exception as err:
+            print(f'Bucket schema cache could not be read: {str(err)}')
+            schemas = {}
+
+        missing = [key for key in files.keys() if key not in schemas]
+        if len(missing) > 0:
+            executor = BucketListing.get_executor()
+            futures = { key: executor.submit(BucketListing.infer_schema, s3_client, bucket_name, key) for key in missing }
+            inferred = { key: future.result() for key, future in futures.items() }
+            inferred = { key: schema for key, schema in inferred.items() if schema != None }
+            schemas.update(inferred)
+
+            try:
+                BucketSchemaCache.set_many(bucket_name, { key: (files[key], schema) for key, schema in inferred.items() })
+            except Exception as err:
+                print(f'Bucket schema cache could not be updated: {str(err)}')
+
+        for obj in objects:
+            obj['schema'] = schemas.get(obj['key'])
+        return objects
+
+
+    @staticmethod
+    def infer_schema(s3_client, bucket_name, file_key):
+        try:
+            return BucketPreview.schema(s3_client, bucket_name, file_key)
+        except Exception as err:
+            print(f'Could not infer the schema of {bucket_name}/{file_key}: {str(err)}')
+            return None
+
+
+    @staticmethod
+    def get_executor():
+        if BucketListing.executor == None:
+            with BucketListing.lock:
+                if BucketListing.executor == None:
+                    BucketListing.executor = ThreadPoolExecutor(
+                        max_workers=BucketListing.schema_workers, thread_name_prefix='s3-schema'
+                    )
+        return BucketListing.executor
@@ -0,0 +1,169 @@
+import io
+import json
+from os import getenv as env
+import polars as pl
+
+SUPPORTED_TYPES = { 'csv': 'csv', 'json': 'json', 'jsonl': 'ndjson', 'ndjson': 'ndjson', 'parquet': 'parquet' }
+
+
+class S3RangeFile(io.RawIOBase):
+    """ Seekable read only file over an S3 object, each read is a ranged GET of only the requested bytes """
+
+    def __init__(self, s3_client, bucket_name, file_key, size = None):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.file_key = file_key
+        self.size = size if size != None\
+            else s3_client.head_object(Bucket=bucket_name, Key=file_key)['ContentLength']
+        self.position = 0
+        self.bytes_read = 0
+
+
+    def readable(self): return True
+
+    def seekable(self): return True
+
+    def tell(self): return self.position
+
+
+    def seek(self, offset, whence = io.SEEK_SET):
+        if whence == io.SEEK_SET: self.position = offset
+        elif whence == io.SEEK_CUR: self.position += offset
+        elif whence == io.SEEK_END: self.position = self.size + offset
+        self.position = max(0, self.position)
+        return self.position
+
+
+    def read_range(self, start, end):
+        """ Bytes start to end (inclusive) """
+        if start >= self.size or end < start: return b''
+        response = self.s3_client.get_object(
+            Bucket=self.bucket_name, Key=self.file_key, Range=f'bytes={start}-{min(end, self.size - 1)}'
+        )
+        data = response['Body'].read()
+        self.bytes_read += len(data)
+        return data
+
+
+    def readinto(self, buffer):
+        data = self.read_range(self.position, self.position + len(buffer) - 1)
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+class BucketPreview:
+    """
+    Previews and schemas of bucket files without downloading the whole object. CSV and NDJSON are
+    read from the beginning in ranges (S3_PREVIEW_RANGE_KB, doubled until the rows are there, up to
+    S3_PREVIEW_MAX_RANGE_KB), JSON arrays are parsed element by element from the same ranges, and
+    Parquet only reads the footer (schema) plus the first row group (rows)
+    """
+
+    range_size = int(env('S3_PREVIEW_RANGE_KB', 256)) * 1024
+    max_range_size = int(env('S3_PREVIEW_MAX_RANGE_KB', 8192)) * 1024
+    # Rows read from the sample to infer the CSV/NDJSON schema
+    schema_rows = int(env('S3_PREVIEW_SCHEMA_ROWS', 100))
+
+
+    @staticmethod
+    def file_type(file_key):
+        return SUPPORTED_TYPES.get(str(file_key).lower().split('.')[-1])
+
+
+    @staticmethod
+    def preview(s3_client, bucket_name, file_key, rows = 10) -> list:
+        """ First rows of the file as dicts """
+        file = S3RangeFile(s3_client, bucket_name, file_key)
+        file_type = BucketPreview.file_type(file_key)
+
+        if file_type == 'parquet':
+            return BucketPreview.parquet_rows(file, rows)
+        if file_type == 'json':
+            return BucketPreview.json_rows(file, rows)
+
+        head = BucketPreview.head(file, rows + 1)
+        if file_type == 'csv':
+            return pl.read_csv(io.BytesIO(head), n_rows=rows).to_dicts()
+        return pl.read_ndjson(io.BytesIO(head)).head(rows).to_dicts()
+
+
+    @staticmethod
+    def schema(s3_client, bucket_name, file_key) -> dict:
+        """ { column: type } """
+        file = S3RangeFile(s3_client, bucket_name, file_key)
+        file_type = BucketPreview.file_type(file_key)
+
+        if file_type == 'parquet':
+            import pyarrow.parquet as pq
+            # Polars type names, as the CSV/JSON ones
+            df = pl.from_arrow(pq.ParquetFile(file).schema_arrow.empty_table())
+            return { name: str(dtype) for name, dtype in df.schema.items() }
+
+        if file_type == 'json':
+            df = pl.DataFrame(BucketPreview.json_rows(file, BucketPreview.schema_rows))
+        else:
+            head = BucketPreview.head(file, BucketPreview.schema_rows + 1)
+            df = pl.read_csv(io.BytesIO(head), n_rows=BucketPreview.schema_rows) if file_type == 'csv'\
+                else pl.read_ndjson(io.BytesIO(head)).head(BucketPreview.schema_rows)
+        return { name: str(dtype) for name, dtype in df.schema.items() }
+
+
+    @staticmethod
+    def head(file: S3RangeFile, lines) -> bytes:
+        """ Beginning of the file with at least lines complete lines (or all of it), cut at a line end """
+        data, size = b'', BucketPreview.range_size
+        while True:
+            data += file.read_range(len(data), size - 1)
+            if len(data) >= file.size: return data
+            if data.count(b'\n') >= lines or size >= BucketPreview.max_range_size: break
+            size = min(size * 2, BucketPreview.max_range_size)
+
+        # The last line is most likely cut by the range
+        last_line_end = data.rfind(b'\n')
+        if last_line_end == -1:
+            raise ValueError(f'No complete line within the first {BucketPreview.max_range_size // 1024} KB of the file')
+        return data[:last_line_end + 1]
+
+
+    @staticmethod
+    def json_rows(file: S3RangeFile, rows) -> list:
+        """ First elements of a JSON array, other JSON documents need to fit in S3_PREVIEW_MAX_RANGE_KB """
+        decoder, data, size = json.JSONDecoder(), b'', BucketPreview.range_size
+        while True:
+            data += file.read_range(len(data), size - 1)
+            complete = len(data) >= file.size
+            text = data.decode('utf-8', errors='ignore').lstrip()
+
+            if not text.startswith('['):
+                if complete: return [json.loads(text)]
+            else:
+                items, position = [], 1
+                try:
+                    while len(items) < rows:
+                        while position < len(text) and text[position] in ' \t\r\n,': position += 1
+                        # Values reaching the range end (e.g. a number) might continue after it
+                        if position >= len(text) and not complete: raise json.JSONDecodeError('Cut value', text, position)
+                        if position >= len(text) or text[position] == ']': break
+                        item, position = decoder.raw_decode(text, position)
+                        if position >= len(text) and not complete: raise json.JSONDecodeError('Cut value', text, position)
+                        items.append(item)
+                    return items
+                except json.JSONDecodeError:
+                    # Element cut by the range, read further
+                    if complete: raise
+
+            if size >= BucketPreview.max_range_size:
+                raise ValueError(f'The JSON file is too large to preview (over {BucketPreview.max_range_size // 1024} KB)')
+            size = min(size * 2, BucketPreview.max_range_size)
+
+
+    @staticmethod
+    def parquet_rows(file: S3RangeFile, rows) -> list:
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(file)
+        if parquet_file.num_row_groups == 0: return []
+        # Only the first row group columns are read
+        for batch in parquet_file.iter_batches(batch_size=rows, row_groups=[0]):
+            return pl.from_arrow(batch).to_dicts()
+        return []
@@ -0,0 +1,59 @@
+import json
+from datetime import datetime, timedelta
+from os import getenv as env
+from utils.duckdb_util import DuckdbUtil
+
+
+class BucketSchemaCache:
+    """
+    Inferred schemas of bucket files kept in the workspace DB by bucket + key, valid as long as the
+    object ETag is the same one, so listing an unchanged prefix again doesn't read any file. Entries
+    not used for BUCKET_SCHEMA_CACHE_KEEP_DAYS are dropped (e.g. deleted files)
+    """
+
+    keep_days = int(env('BUCKET_SCHEMA_CACHE_KEEP_DAYS', 30))
+
+    table_created = False
+
+
+    @staticmethod
+    def get_many(bucket_name, files: dict) -> dict:
+        """ { key: schema } of the { key: etag } files which have a schema for that ETag """
+        if len(files) == 0: return {}
+        cnx = BucketSchemaCache.get_cursor()
+        placeholders = ', '.join(['?'] * len(files))
+        rows = cnx.execute(f'SELECT file_key, etag, file_schema FROM bucket_schema_cache\
+                             WHERE bucket_name = ? AND file_key IN ({placeholders})',
+                             [bucket_name, *files.keys()]).fetchall()
+
+        schemas = { key: json.loads(schema) for key, etag, schema in rows if etag == files[key] }
+        if len(schemas) > 0:
+            found = list(schemas.keys())
+            cnx.execute(f'UPDATE bucket_schema_cache SET last_access = ?\
+                          WHERE bucket_name = ? AND file_key IN ({", ".join(["?"] * len(found))})',
+                          [datetime.now(), bucket_name, *found])
+        return schemas
+
+
+    @staticmethod
+    def set_many(bucket_name, schemas: dict):
+        """ schemas is { key: (etag, schema) }, a new ETag replaces the key previous schema """
+        if len(schemas) == 0: return
+        now = datetime.now()
+        cnx = BucketSchemaCache.get_cursor()
+        cnx.executemany(
+            'INSERT INTO bucket_schema_cache (bucket_name, file_key, etag, file_schema, fetched_at, last_access)\
+             VALUES (?, ?, ?, ?, ?, ?)\
+             ON CONFLICT (bucket_name, file_key)\
+             DO UPDATE SET etag = EXCLUDED.etag, file_schema = EXCLUDED.file_schema, fetched_at = EXCLUDED.fetched_at',
+            [[bucket_name, key, etag, json.dumps(schema), now, now] for key, (etag, schema) in schemas.items()]
+        )
+        cnx.execute('DELETE FROM bucket_schema_cache WHERE last_access < ?', [now - timedelta(days=BucketSchemaCache.keep_days)])
+
+
+    @staticmethod
+    def get_cursor():
+        if not BucketSchemaCache.table_created:
+            DuckdbUtil.create_bucket_schema_cache_table()
+            BucketSchemaCache.table_created = True
+        return DuckdbUtil.get_workspace_db_instance().cursor()
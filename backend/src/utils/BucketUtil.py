@@ -1,14 +1,10 @@
 import boto3
-import pandas as pd
-import polars as pl
-import json
 from botocore.exceptions import ClientError, NoCredentialsError, PartialCredentialsError
-from botocore.client import Config
-from botocore import UNSIGNED
 import traceback
-from io import BytesIO
-import polars as pl
 import asyncio
+from utils.BucketPreview import BucketPreview
+from utils.BucketListing import BucketListing
+from utils.S3ClientPool import S3ClientPool
 
 class BucketUtil:
     """
@@ -115,6 +111,13 @@ class BucketUtil:
             region_name=region
         )
 
+    @staticmethod
+    def get_client_for(config):
+        """ Authenticated client when the config has keys, anonymous one (public buckets) otherwise, both reused """
+        if config.get('access_key_id') and config.get('secret_access_key'):
+            return S3ClientPool.get(config.get('namespace'), config.get('connection_name'), config)
+        return S3ClientPool.get_anonymous()
+
     @staticmethod
     def preview_s3_file(config, file_key, rows=10):
         """
@@ -129,57 +132,18 @@ class BucketUtil:
             dict: {'data': list, 'error': bool, 'message': str}
         """
         try:
-            # Extract configuration
-            access_key_id = config.get('access_key_id')
-            secret_access_key = config.get('secret_access_key')
             bucket_name = config.get('bucket_name')
-            region = config.get('region', 'us-east-1')
-            
-            # Create S3 client
-            s3_client = BucketUtil.get_s3_client(access_key_id, secret_access_key, region)
-            
-            # Get file object
-            response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-            file_content = response['Body'].read()
             
-            # Determine file type and parse accordingly
+            # Only the beginning of the file (or the Parquet footer and first row group) is read
             file_extension = file_key.lower().split('.')[-1]
-            
-            if file_extension == 'csv':
-                # Parse CSV
-                df = pd.read_csv(BytesIO(file_content), nrows=rows)
-                data = df.to_dict('records')
-                
-            elif file_extension in ['json', 'jsonl', 'ndjson']:
-                # Parse JSON/JSONL
-                content_str = file_content.decode('utf-8')
-                
-                if file_extension == 'json':
-                    # Regular JSON
-                    json_data = json.loads(content_str)
-                    if isinstance(json_data, list):
-                        data = json_data[:rows]
-                    else:
-                        data = [json_data]
-                else:
-                    # JSONL/NDJSON
-                    lines = content_str.strip().split('\n')
-                    data = []
-                    for i, line in enumerate(lines[:rows]):
-                        if line.strip():
-                            data.append(json.loads(line))
-                            
-            elif file_extension == 'parquet':
-                # Parse Parquet
-                df = pd.read_parquet(BytesIO(file_content))
-                data = df.head(rows).to_dict('records')
-                
-            else:
+            if BucketPreview.file_type(file_key) == None:
                 return {
                     'data': [],
                     'error': True,
                     'message': f'Unsupported file type: {file_extension}. Supported types: csv, json, jsonl, ndjson, parquet'
                 }
+
+            data = BucketPreview.preview(BucketUtil.get_client_for(config), bucket_name, file_key, rows)
             
             return {
                 'data': data,
@@ -219,58 +183,18 @@ class BucketUtil:
             dict: {'data': list, 'error': bool, 'message': str}
         """
         try:
-            # Extract configuration
-            access_key_id = config.get('access_key_id')
-            secret_access_key = config.get('secret_access_key')
             bucket_name = config.get('bucket_name')
-            region = config.get('region', 'us-east-1')
             
-            # Create S3 client
-            s3_client = BucketUtil.get_s3_client(access_key_id, secret_access_key, region)
-            
-            # Get file object
-            response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-            file_content = response['Body'].read()
-            
-            # Determine file type and parse with Polars
+            # Only the beginning of the file (or the Parquet footer and first row group) is read
             file_extension = file_key.lower().split('.')[-1]
-            
-            if file_extension == 'csv':
-                # Use Polars to scan CSV
-                df = pl.read_csv(BytesIO(file_content))
-                data = df.head(rows).to_dicts()
-                
-            elif file_extension in ['json', 'jsonl', 'ndjson']:
-                # Parse JSON/JSONL with Polars
-                if file_extension == 'json':
-                    # Regular JSON - try to read as JSON first
-                    try:
-                        df = pl.read_json(BytesIO(file_content))
-                        data = df.head(rows).to_dicts()
-                    except:
-                        # Fallback to manual parsing for complex JSON
-                        content_str = file_content.decode('utf-8')
-                        json_data = json.loads(content_str)
-                        if isinstance(json_data, list):
-                            data = json_data[:rows]
-                        else:
-                            data = [json_data]
-                else:
-                    # JSONL/NDJSON
-                    df = pl.read_ndjson(BytesIO(file_content))
-                    data = df.head(rows).to_dicts()
-                    
-            elif file_extension == 'parquet':
-                # Use Polars to scan Parquet
-                df = pl.read_parquet(BytesIO(file_content))
-                data = df.head(rows).to_dicts()
-                
-            else:
+            if BucketPreview.file_type(file_key) == None:
                 return {
                     'data': [],
                     'error': True,
                     'message': f'Unsupported file type: {file_extension}. Supported types: csv, json, jsonl, ndjson, parquet'
                 }
+
+            data = BucketPreview.preview(BucketUtil.get_client_for(config), bucket_name, file_key, rows)
             
             return {
                 'data': data,
@@ -308,42 +232,21 @@ class BucketUtil:
             dict: {'data': list, 'error': bool, 'message': str}
         """
         try:
-            # Extract configuration
-            access_key_id = config.get('access_key_id')
-            secret_access_key = config.get('secret_access_key')
             bucket_name = config.get('bucket_name')
-            region = config.get('region', 'us-east-1')
-            
-            s3_client = BucketUtil.get_s3_client(access_key_id, secret_access_key, region)
-            
-            response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-            file_content = response['Body'].read()
             
+            # Parquet footer only, or a sample from the beginning of the file
             file_extension = file_key.lower().split('.')[-1]
-            
-            if file_extension == 'csv':
-                df = pl.read_csv(BytesIO(file_content))
-                
-            elif file_extension in ['json', 'jsonl', 'ndjson']:
-                if file_extension == 'json':
-                    try:
-                        df = pl.read_json(BytesIO(file_content))
-                    except: ...
-                else:
-                    df = pl.read_ndjson(BytesIO(file_content))
-                    
-            elif file_extension == 'parquet':
-                df = pl.read_parquet(BytesIO(file_content))
-                
-            else:
+            if BucketPreview.file_type(file_key) == None:
                 return {
                     'data': [],
                     'error': True,
                     'message': f'Unsupported file type: {file_extension}. Supported types: csv, json, jsonl, ndjson, parquet'
                 }
+
+            schema = BucketPreview.schema(BucketUtil.get_client_for(config), bucket_name, file_key)
             
             return {
-                'data': list(df.schema),
+                'data': list(schema),
                 'error': False,
                 'message': f'Successfully fetched schema using Polars'
             }
@@ -368,66 +271,36 @@ class BucketUtil:
 
 
     @staticmethod
-    async def list_s3_objects(config, prefix='', max_keys=100):
+    async def list_s3_objects(config, prefix='', max_keys=100, continuation_token=None, delimiter=None, with_schema=True):
         """
-        List objects in S3 bucket with optional prefix filter and schema extraction
+        List objects in S3 bucket with optional prefix filter and schema extraction, one page of
+        max_keys at a time (next_token continues it) and as folders when a delimiter (e.g. /) is given
         """
         try:
-            # Extract configuration
-            access_key_id = config.get('access_key_id')
-            secret_access_key = config.get('secret_access_key')
             bucket_name = config.get('bucket_name')
-            region = config.get('region', 'us-east-1')
-            
-            # Create S3 client
-            s3_client = BucketUtil.get_s3_client(access_key_id, secret_access_key, region)
-            
-            # List objects (blocking call offloaded to thread)
-            kwargs = {'Bucket': bucket_name, 'MaxKeys': max_keys}
-            if prefix:
-                kwargs['Prefix'] = prefix
-                
-            response = await asyncio.to_thread(s3_client.list_objects_v2, **kwargs)
-            
-            storage_opts = {
-                "aws_access_key_id": access_key_id,
-                "aws_secret_access_key": secret_access_key,
-                "aws_region": region,
-            }
+            s3_client = BucketUtil.get_client_for(config)
 
-            # Helper to extract schema for a single key
-            def _get_schema(key):
-                s3_path = f"s3://{bucket_name}/{key}"
-                try:
-                    if key.endswith(".parquet"):
-                        return pl.scan_parquet(s3_path, storage_options=storage_opts).schema
-                    elif key.endswith(".csv"):
-                        return pl.scan_csv(s3_path, storage_options=storage_opts).schema
-                    elif key.endswith((".jsonl", ".ndjson")):
-                        return pl.read_ndjson(s3_path, storage_options=storage_opts, n_rows=1).schema
-                    return None
-                except:
-                    return None
+            async_client = None
+            if config.get('access_key_id') and config.get('secret_access_key'):
+                async_client = S3ClientPool.create_async_client(config.get('namespace'), config.get('connection_name'), config)
 
-            # Prepare tasks for all objects to run concurrently
-            contents = response.get('Contents', [])
-            schema_tasks = [asyncio.to_thread(_get_schema, obj['Key']) for obj in contents]
-            schemas = await asyncio.gather(*schema_tasks)
+            if async_client != None:
+                async with async_client as client:
+                    page = await BucketListing.list_page_async(client, bucket_name, prefix, max_keys, continuation_token, delimiter)
+            else:
+                # Without aiobotocore the blocking listing is offloaded to a thread
+                page = await asyncio.to_thread(
+                    BucketListing.list_page, s3_client, bucket_name, prefix, max_keys, continuation_token, delimiter
+                )
+
+            # Schema reads are ranged reads of the sync client (in the bounded schema pool)
+            if with_schema:
+                await asyncio.to_thread(BucketListing.add_schemas, s3_client, bucket_name, page['objects'])
 
-            objects = []
-            for obj, schema in zip(contents, schemas):
-                objects.append({
-                    'key': obj['Key'],
-                    'size': obj['Size'],
-                    'last_modified': obj['LastModified'].isoformat(),
-                    'storage_class': obj.get('StorageClass', 'STANDARD'),
-                    'schema': {k: str(v) for k, v in schema.items()} if schema else None
-                })
-            
             return {
-                'objects': objects,
+                **page,
                 'error': False,
-                'message': f'Found {len(objects)} objects'
+                'message': f'Found {len(page["objects"])} objects'
             }
             
         except Exception as e:
@@ -441,9 +314,9 @@ class BucketUtil:
     @staticmethod
     def get_anonymous_s3_client():
         """
-        Create anonymous S3 client (for public buckets)
+        Anonymous S3 client (for public buckets), reused across calls
         
         Returns:
             boto3.client: Anonymous S3 client
         """
-        return boto3.client('s3', config=Config(signature_version=UNSIGNED))
+        return S3ClientPool.get_anonymous()
@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from os import getenv as env
+from utils.duckdb_util import DuckdbUtil
+
+
+class DBMetadataCache:
+    """
+    Source database table listings (SQLDatabase.get_tables_list) kept in the workspace DB by
+    namespace + connection + schema, so they survive restarts. Entries expire after
+    DB_METADATA_CACHE_TTL_SEC, and the ones used within DB_METADATA_CACHE_WARM_SEC are
+    refreshed in background before they expire
+    """
+
+    ttl = int(env('DB_METADATA_CACHE_TTL_SEC', 3600))
+    refresh_interval = int(env('DB_METADATA_CACHE_REFRESH_SEC', 300))
+    warm_period = int(env('DB_METADATA_CACHE_WARM_SEC', 86400))
+
+    table_created = False
+    refreshing = False
+    lock = threading.Lock()
+
+
+    @staticmethod
+    def get(namespace, connection_name, schema = '*'):
+        """ Cached tables or None when missing/expired """
+        cnx = DBMetadataCache.get_cursor()
+        row = cnx.execute('SELECT tables, fetched_at FROM db_metadata_cache\
+                           WHERE namespace = ? AND connection_name = ? AND schema_name = ?',
+                           [namespace, connection_name, schema]).fetchone()
+        if row == None: return None
+        if datetime.now() - row[1] > timedelta(seconds=DBMetadataCache.ttl): return None
+
+        cnx.execute('UPDATE db_metadata_cache SET last_access = ?, hits = hits + 1\
+                     WHERE namespace = ? AND connection_name = ? AND schema_name = ?',
+                     [datetime.now(), namespace, connection_name, schema])
+        return json.loads(row[0])
+
+
+    @staticmethod
+    def set(namespace, connection_name, schema, tables):
+        now = datetime.now()
+        DBMetadataCache.get_cursor().execute(
+            'INSERT INTO db_metadata_cache (namespace, connection_name, schema_name, tables, fetched_at, last_access)\
+             VALUES (?, ?, ?, ?, ?, ?)\
+             ON CONFLICT (namespace, connection_name, schema_name)\
+             DO UPDATE SET tables = EXCLUDED.tables, fetched_at = EXCLUDED.fetched_at',
+            [namespace, connection_name, schema, json.dumps(tables), now, now]
+        )
+
+
+    @staticmethod
+    def invalidate(namespace, connection_name = None):
+        """ Drops the connection entries (all schemas), or the whole namespace ones """
+        query, params = 'DELETE FROM db_metadata_cache WHERE namespace = ?', [namespace]
+        if connection_name != None:
+            query, params = f'{query} AND connection_name = ?', [namespace, connection_name]
+        DBMetadataCache.get_cursor().execute(query, params)
+
+
+    @staticmethod
+    def start_refresher():
+        """ Background refresh loop (it runs in its own thread) """
+        with DBMetadataCache.lock:
+            if DBMetadataCache.refreshing: return
+            DBMetadataCache.refreshing = True
+
+        from utils.SQLDatabase import SQLDatabase
+        while True:
+            time.sleep(DBMetadataCache.refresh_interval)
+            try:
+                for namespace, connection_name in DBMetadataCache.due_for_refresh():
+                    try:
+                        SQLDatabase.get_tables_list(namespace, connection_name, refresh=True)
+                    except Exception as err:
+                        print(f'Could not refresh the tables of {namespace}/{connection_name}: {str(err)}')
+            except Exception as err:
+                print(f'Error while refreshing the databases metadata cache: {str(err)}')
+                traceback.print_exc()
+
+
+    @staticmethod
+    def due_for_refresh():
+        """ Recently used connections which entries expire before the next refresh round """
+        now = datetime.now()
+        expiring = now - timedelta(seconds=max(DBMetadataCache.ttl - DBMetadataCache.refresh_interval, 0))
+        return DBMetadataCache.get_cursor().execute(
+            'SELECT DISTINCT namespace, connection_name FROM db_metadata_cache\
+             WHERE last_access >= ? AND fetched_at <= ?',
+            [now - timedelta(seconds=DBMetadataCache.warm_period), expiring]
+        ).fetchall()
+
+
+    @staticmethod
+    def get_cursor():
+        if not DBMetadataCache.table_created:
+            DuckdbUtil.create_db_metadata_cache_table()
+            DBMetadataCache.table_created = True
+        return DuckdbUtil.get_workspace_db_instance().cursor()
@@ -1,12 +1,14 @@
 """ SQL Query Utility Handles SQL query execution across multiple destination """
-import polars as pl
 from sqlalchemy import create_engine, text
 from services.workspace.SecretManager import SecretManager
+from utils.db.SQLPoolManager import SQLPoolManager
+from utils.db.QueryCursor import QueryCursor, QueryCursors
 import traceback
 import re
 from utils.pipeline.Enums import DestinationType, ProviderURL
 from flask import jsonify
 import base64
+import itertools
 
 
 def serialize_value(val):
@@ -16,36 +18,42 @@ def serialize_value(val):
 
 
 class DestinationQueryUtil:
-    """ Utility class for executing SQL queries using Polars and connectorx across different database types """
+    """ Utility class for executing SQL queries across different database types """
 
     @staticmethod
     def execute_query(
         query: str, namespace: str, 
-        connection_name: str, destination_details = {}):
+        connection_name: str, destination_details = {}, page_size = None, stream = None):
         """
-        Execute a SQL query using Polars and connectorx
+        Execute a SQL query, rows are read through a cursor (see QueryCursors)
         
         Args:
             query: SQL query string
             namespace: User namespace for secret retrieval
             connection_name: Name of the connection/secret
+            page_size: Rows of the first page (capped by SQL_QUERY_MAX_ROWS)
+            stream: ndjson or arrow to stream the result instead of paging it
             
         Returns:
-            dict: {'result': list of tuples, 'fields': comma-separated field names}
-            or {'error': True, 'result': error message, 'code': error code}
+            dict: {'result': list of tuples, 'fields': comma-separated field names, 'next_token': continuation token or None}
+            or {'error': True, 'result': error message, 'code': error code}, or the streamed Response
         """
         dest_type = destination_details.get('dest_type')
         try:
             if dest_type == 'duckdb':
-                return DestinationQueryUtil._query_duckdb(query, connection_name)
+                cursor = DestinationQueryUtil._query_duckdb(query, connection_name)
             elif dest_type == 'sql':
-                return DestinationQueryUtil._query_sql_database(query, namespace, connection_name)
+                cursor = DestinationQueryUtil._open_sql_database(query, namespace, connection_name)
             elif dest_type == 's3':
-                return DestinationQueryUtil._query_s3(query, namespace, connection_name)
+                cursor = DestinationQueryUtil._query_s3(query, namespace, connection_name)
             elif dest_type in DestinationType._value2member_map_:
-                return DestinationQueryUtil._query_cloud_warehouse(query, namespace, destination_details)
+                cursor = DestinationQueryUtil._query_cloud_warehouse(query, namespace, destination_details)
             else:
                 return { 'error': True, 'result': f'Unsupported destination type: {dest_type}', 'code': 'err' }
+
+            # Errors the destinations report as a response
+            if isinstance(cursor, dict): return cursor
+            return QueryCursors.respond(cursor, namespace, page_size, stream)
                 
         except Exception as err:
             print(f'Error executing query: {query}')
@@ -54,19 +62,23 @@ class DestinationQueryUtil:
 
 
     @staticmethod
-    def _query_duckdb(query: str, database_path: str):
+    def _query_duckdb(query: str, database_path: str) -> QueryCursor:
         """Query DuckDB database using SQLAlchemy"""
         try:
             # For DuckDB, use SQLAlchemy with duckdb-engine
             connection_uri = f'duckdb:///{database_path}'
             engine = create_engine(connection_uri)
             
-            with engine.connect() as conn:
-                result_proxy = conn.execute(text(query))
-                result = [tuple(row) for row in result_proxy.fetchall()]
-                fields = ','.join(result_proxy.keys())
-            
-            return {'result': result, 'fields': fields}
+            def close():
+                conn.close()
+                engine.dispose()
+
+            conn = engine.connect()
+            try:
+                return DestinationQueryUtil._result_cursor(conn.execute(text(query)), close)
+            except Exception:
+                close()
+                raise
             
         except Exception as err:
             print(f'Error querying DuckDB: {str(err)}')
@@ -75,22 +87,30 @@ class DestinationQueryUtil:
 
     @staticmethod
     def _query_sql_database(query: str, namespace: str, connection_name: str):
-        """Query SQL databases (MySQL, PostgreSQL, Oracle, SQL Server, MariaDB) using Polars"""
+        """Query SQL databases (MySQL, PostgreSQL, Oracle, SQL Server, MariaDB), whole result"""
+        return DestinationQueryUtil._open_sql_database(query, namespace, connection_name).read_all()
+
+
+    @staticmethod
+    def _open_sql_database(query: str, namespace: str, connection_name: str) -> QueryCursor:
+        """Query SQL databases (MySQL, PostgreSQL, Oracle, SQL Server, MariaDB) through a server side cursor"""
         try:
             # Get connection credentials from secret manager
             secret = SecretManager.get_db_secret(namespace, connection_name, from_pipeline=True)
             connection_url = secret['connection_url']
                         
             db_engine = DestinationQueryUtil._detect_database_engine(connection_url)
-            engine = create_engine(connection_url).connect()
-            
-            df = pl.read_database(query, connection=engine)
-            
-            result = [tuple(row) for row in df.iter_rows()]
-            fields = ','.join(df.columns)
-                
-            print(f'Query successful using Polars, returned {len(result)} rows')
-            return {'result': result, 'fields': fields, 'db_engine': db_engine}
+            pool_key = (namespace, connection_name, 'query')
+            engine = SQLPoolManager.engine(pool_key, connection_url)
+            
+            # The pooled connection is held until the cursor is read to the end, closed or expired
+            conn = engine.connect()
+            try:
+                result = conn.execution_options(stream_results=True, max_row_buffer=QueryCursors.chunk_size).execute(text(query))
+                return DestinationQueryUtil._result_cursor(result, conn.close, { 'db_engine': db_engine }, pool_key)
+            except Exception:
+                conn.close()
+                raise
             
         except Exception as err:
             print(f'Error querying SQL database: {str(err)}')
@@ -98,6 +118,19 @@ class DestinationQueryUtil:
             raise
 
 
+    @staticmethod
+    def _result_cursor(result, close, extra = None, pool_key = None) -> QueryCursor:
+        """QueryCursor over a SQLAlchemy result, statements without rows give an empty one"""
+        if not result.returns_rows:
+            return QueryCursor([], lambda size: [], close, extra, pool_key)
+
+        def close_result():
+            result.close()
+            close()
+
+        return QueryCursor(list(result.keys()), result.fetchmany, close_result, extra, pool_key)
+
+
     @staticmethod
     def query_sql_database(query: str, namespace: str, connection_name: str):
         """Query SQL databases (MySQL, PostgreSQL, Oracle, SQL Server, MariaDB) using Polars"""
@@ -107,7 +140,7 @@ class DestinationQueryUtil:
             connection_url = secret['connection_url']
                         
             db_engine = DestinationQueryUtil._detect_database_engine(connection_url)
-            engine = create_engine(connection_url)
+            engine = SQLPoolManager.engine((namespace, connection_name, 'query'), connection_url)
             
             rows, fields = {}, {}
             with engine.connect() as conn:
@@ -168,12 +201,14 @@ class DestinationQueryUtil:
                     s3_path = f"'s3://{bucket_name}/{table_name}'"
                     query = re.sub(r'from\s+([^\s,;]+)', f'FROM {s3_path}', query, flags=re.IGNORECASE)
             
-            result = con.execute(query).fetchall()            
-            fields_list = [desc[0] for desc in con.description]
-            con.close()
+            try:
+                con.execute(query)
+                fields_list = [desc[0] for desc in con.description] if con.description else []
+            except Exception:
+                con.close()
+                raise
             
-            print(f'S3 query successful, returned {len(result)} rows')
-            return {'result': result, 'fields': ','.join(fields_list)}
+            return QueryCursor(fields_list, con.fetchmany, con.close)
             
         except Exception as err:
             error_msg = str(err)
@@ -228,17 +263,16 @@ class DestinationQueryUtil:
             
             # Execute the query
             query_job = client.query(query)
-            results = query_job.result()  # Wait for query to complete
+            # Wait for query to complete, rows are then fetched page by page while being read
+            results = query_job.result(page_size=QueryCursors.chunk_size)
             
-            # Convert results to list of tuples
-            result_list = []
             fields_list = [field.name for field in results.schema]
-            
-            for row in results:
-                result_list.append(tuple(row.values()))
-            
-            print(f'BigQuery query successful, returned {len(result_list)} rows')
-            return {'result': result_list, 'fields': ','.join(fields_list)}
+            rows = iter(results)
+
+            def fetch(size):
+                return [tuple(row.values()) for row in itertools.islice(rows, size)]
+
+            return QueryCursor(fields_list, fetch, client.close)
             
         except Exception as err:
             error_msg = str(err)
@@ -293,16 +327,18 @@ class DestinationQueryUtil:
             if catalog: cursor.execute(f'USE CATALOG {catalog}')
             if schema: cursor.execute(f'USE SCHEMA {schema}')
             
-            cursor.execute(query)
-            
-            results = cursor.fetchall()
-            fields_list = [desc[0] for desc in cursor.description] if cursor.description else []
-            result_list = [tuple(row) for row in results]
-            
-            cursor.close()
-            connection.close()
-            
-            return {'result': result_list, 'fields': ','.join(fields_list)}
+            def close():
+                cursor.close()
+                connection.close()
+
+            try:
+                cursor.execute(query)
+                fields_list = [desc[0] for desc in cursor.description] if cursor.description else []
+            except Exception:
+                close()
+                raise
+            
+            return QueryCursor(fields_list, cursor.fetchmany, close)
             
         except Exception as err:
             error_msg = str(err)
@@ -1,51 +1,148 @@
 
+import threading
+import time
 import oracledb
+from os import getenv as env
 from oracledb import ConnectionPool
 from services.workspace.supper.SecretManagerType import SecretManagerType
+from utils.database_secret import is_oracle_dsn_descriptor
 
 class OracleDBUtil:
-
-    connection_pool: ConnectionPool = None
+    """
+    oracledb connection pools keyed by namespace and connection name, SQLAlchemy engines
+    of Oracle connections acquire from them (see SQLConnection.oracle_connect)
+    """
+
+    pools: dict[tuple, ConnectionPool] = {}
+    # (namespace, connection_name) -> { acquires, total_wait, max_wait }
+    acquire_stats: dict[tuple, dict] = {}
+    # Guards the dicts above, a pool is created holding only its connection lock (key_locks)
+    lock = threading.Lock()
+    key_locks: dict[tuple, threading.Lock] = {}
     secret_manager: SecretManagerType
 
+    min_conn = int(env('ORACLE_POOL_MIN', 1))
+    max_conn = int(env('ORACLE_POOL_MAX', 5))
+    increment = int(env('ORACLE_POOL_INCREMENT', 1))
+    # Idle connections above min are closed after this
+    idle_timeout = int(env('ORACLE_POOL_TIMEOUT_SEC', 60))
+    # Max wait for a free connection once the pool reached max
+    wait_timeout_ms = int(env('ORACLE_POOL_WAIT_TIMEOUT_MS', 30000))
+
     def create_pool(
         user,
         password,
         dsn,
-        min_conn=1,
-        max_conn=5,
-        increment=1
+        min_conn=None,
+        max_conn=None,
+        increment=None
     ) -> ConnectionPool:
         pool = oracledb.create_pool(
             user=user,
             password=password,
             dsn=dsn,
-            min=min_conn,
-            max=max_conn,
-            increment=increment,
+            min=min_conn or OracleDBUtil.min_conn,
+            max=max_conn or OracleDBUtil.max_conn,
+            increment=increment or OracleDBUtil.increment,
             homogeneous=True,
-            timeout=60,
+            timeout=OracleDBUtil.idle_timeout,
+            getmode=oracledb.POOL_GETMODE_TIMEDWAIT,
+            wait_timeout=OracleDBUtil.wait_timeout_ms,
             ping_interval=60,
         )
 
         return pool
 
 
-    def get_pool(namespace,connection_name) -> ConnectionPool:
+    def get_dsn(secret):
+        """ Same DSN as the connection_url (see database_secret.parse_connection_string) """
+        params = secret.get('dbConnectionParams') or ''
+        if is_oracle_dsn_descriptor(params):
+            return params
+        return oracledb.makedsn(secret['host'], secret['port'], service_name=secret.get('database', 'ORCL'))
 
-        if OracleDBUtil.connection_pool == None:
 
-            secret = OracleDBUtil.secret_manager.get_db_secret(namespace,connection_name)
-            dsn = secret['dbConnectionParams']
-            user = secret['username']
-            password = secret['password']
+    def get_pool(namespace, connection_name, secret = None) -> ConnectionPool:
 
-            OracleDBUtil.connection_pool = OracleDBUtil.create_pool(user=user,password=password,dsn=dsn)
+        key = (namespace, connection_name)
+        with OracleDBUtil.lock:
+            if key in OracleDBUtil.pools:
+                return OracleDBUtil.pools[key]
+            key_lock = OracleDBUtil.key_locks.setdefault(key, threading.Lock())
 
-        return OracleDBUtil.connection_pool
+        # The secret fetch and the pool creation (network round trips) don't stall other connections
+        with key_lock:
+            with OracleDBUtil.lock:
+                if key in OracleDBUtil.pools:
+                    return OracleDBUtil.pools[key]
 
-
-    def create_table_if_not_exists(table_name: str, columns: dict):
+            if secret == None:
+                secret = OracleDBUtil.secret_manager.get_db_secret(namespace,connection_name)
+            dsn = OracleDBUtil.get_dsn(secret)
+            user = secret['username']
+            password = secret['password']
+            pool = OracleDBUtil.create_pool(user=user,password=password,dsn=dsn)
+
+            with OracleDBUtil.lock:
+                OracleDBUtil.pools[key] = pool
+                OracleDBUtil.acquire_stats[key] = { 'acquires': 0, 'total_wait': 0, 'max_wait': 0 }
+            return pool
+
+
+    def get_creator(namespace, connection_name, secret = None):
+        """ SQLAlchemy creator (create_engine(creator=...)) acquiring from the connection pool """
+        pool = OracleDBUtil.get_pool(namespace, connection_name, secret)
+        stats = OracleDBUtil.acquire_stats[(namespace, connection_name)]
+
+        def acquire():
+            started = time.perf_counter()
+            connection = pool.acquire()
+            wait = time.perf_counter() - started
+            with OracleDBUtil.lock:
+                stats['acquires'] += 1
+                stats['total_wait'] += wait
+                stats['max_wait'] = max(stats['max_wait'], wait)
+            return connection
+
+        return acquire
+
+
+    def close_pool(namespace, connection_name = None):
+        """ Closes the connection pool (e.g. credentials changed), or all the namespace ones """
+        with OracleDBUtil.lock:
+            keys = [key for key in OracleDBUtil.key_locks.keys() if key[0] == namespace and connection_name in (None, key[1])]
+
+        pools = []
+        for key in keys:
+            # Waits for a pool being created with the former credentials
+            with OracleDBUtil.key_locks[key], OracleDBUtil.lock:
+                if key in OracleDBUtil.pools: pools.append(OracleDBUtil.pools.pop(key))
+                OracleDBUtil.acquire_stats.pop(key, None)
+
+        for pool in pools:
+            try:
+                pool.close(force=True)
+            except Exception as err:
+                print(f'Error while closing Oracle connection pool: {str(err)}')
+
+
+    def get_metrics():
+        with OracleDBUtil.lock:
+            metrics = []
+            for (namespace, connection_name), pool in OracleDBUtil.pools.items():
+                stats = OracleDBUtil.acquire_stats.get((namespace, connection_name), {})
+                acquires = stats.get('acquires', 0)
+                metrics.append({
+                    'namespace': namespace, 'connection_name': connection_name,
+                    'opened': pool.opened, 'busy': pool.busy, 'min': pool.min, 'max': pool.max,
+                    'acquires': acquires,
+                    'avg_wait_ms': round(stats['total_wait'] / acquires * 1000, 3) if acquires else 0,
+                    'max_wait_ms': round(stats.get('max_wait', 0) * 1000, 3),
+                })
+            return metrics
+
+
+    def create_table_if_not_exists(table_name: str, columns: dict, namespace, connection_name):
         """
         columns example:
         {
@@ -55,7 +152,8 @@ class OracleDBUtil:
         }
         """
 
-        conn = OracleDBUtil.connection_pool.acquire()
+        pool = OracleDBUtil.get_pool(namespace, connection_name)
+        conn = pool.acquire()
         cur = conn.cursor()
 
         tname = table_name.upper()
@@ -74,4 +172,4 @@ class OracleDBUtil:
             conn.commit()
 
         cur.close()
-        OracleDBUtil.connection_pool.release(conn)
\ No newline at end of file
+        pool.release(conn)
@@ -0,0 +1,165 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from os import getenv as env
+import boto3
+from botocore import UNSIGNED
+from botocore.client import Config
+
+
+class PooledClient:
+
+    def __init__(self, client, session, fingerprint):
+        self.client = client
+        self.session = session
+        # Credentials the client was created with, a change (e.g. rotated key) creates a new client
+        self.fingerprint = fingerprint
+        self.last_used = time.monotonic()
+
+
+class S3ClientPool:
+    """
+    boto3 S3 clients (each with its own session and connection pool of S3_MAX_POOL_CONNECTIONS) kept by
+    namespace + connection + region, so previews, listings and schema reads reuse the credentials and
+    the open connections. At most S3_MAX_CLIENTS are kept (least recently used first), and they're
+    dropped when the connection secret changes. The async variant (aiobotocore) reuses the session
+    """
+
+    max_pool_connections = int(env('S3_MAX_POOL_CONNECTIONS', 32))
+    max_clients = int(env('S3_MAX_CLIENTS', 64))
+
+    # Connection name of the public buckets client
+    ANONYMOUS = '(anonymous)'
+
+    # (namespace, connection_name, region) -> PooledClient, most recently used last
+    clients: OrderedDict = OrderedDict()
+    # (namespace, connection_name, region) -> (fingerprint, aiobotocore session)
+    async_sessions: dict[tuple, tuple] = {}
+    created = 0
+    lock = threading.Lock()
+
+
+    @staticmethod
+    def get(namespace, connection_name, config: dict):
+        """ Client of the connection, config has access_key_id, secret_access_key and region """
+        region = config.get('region', 'us-east-1')
+        key, fingerprint = (namespace, connection_name, region), S3ClientPool.fingerprint(config)
+
+        with S3ClientPool.lock:
+            pooled = S3ClientPool.clients.get(key)
+            if pooled != None and pooled.fingerprint == fingerprint:
+                pooled.last_used = time.monotonic()
+                S3ClientPool.clients.move_to_end(key)
+                return pooled.client
+
+            # Sessions aren't thread safe, each client has its own
+            session = boto3.session.Session(
+                aws_access_key_id=config['access_key_id'],
+                aws_secret_access_key=config['secret_access_key'],
+                region_name=region
+            )
+            client = session.client('s3', config=S3ClientPool.client_config())
+            return S3ClientPool.add(key, PooledClient(client, session, fingerprint))
+
+
+    @staticmethod
+    def get_anonymous(region = None):
+        """ Unsigned client for public buckets """
+        key = (None, S3ClientPool.ANONYMOUS, region)
+        with S3ClientPool.lock:
+            pooled = S3ClientPool.clients.get(key)
+            if pooled != None:
+                pooled.last_used = time.monotonic()
+                S3ClientPool.clients.move_to_end(key)
+                return pooled.client
+
+            session = boto3.session.Session(region_name=region)
+            client = session.client('s3', config=S3ClientPool.client_config(signature_version=UNSIGNED))
+            return S3ClientPool.add(key, PooledClient(client, session, None))
+
+
+    @staticmethod
+    def add(key, pooled: PooledClient):
+        """ Called with the lock held """
+        S3ClientPool.clients[key] = pooled
+        S3ClientPool.clients.move_to_end(key)
+        S3ClientPool.created += 1
+        while len(S3ClientPool.clients) > S3ClientPool.max_clients:
+            S3ClientPool.clients.popitem(last=False)
+        return pooled.client
+
+
+    @staticmethod
+    def create_async_client(namespace, connection_name, config: dict):
+        """
+        aiobotocore client context (async with), None when aiobotocore is not installed. Its connections
+        belong to the running event loop so only the session is kept, the client lives in the request
+        """
+        try:
+            from aiobotocore.config import AioConfig
+            from aiobotocore.session import get_session
+        except ImportError:
+            return None
+
+        region = config.get('region', 'us-east-1')
+        key, fingerprint = (namespace, connection_name, region), S3ClientPool.fingerprint(config)
+        with S3ClientPool.lock:
+            entry = S3ClientPool.async_sessions.get(key)
+            if entry == None or entry[0] != fingerprint:
+                entry = (fingerprint, get_session())
+                S3ClientPool.async_sessions[key] = entry
+
+        return entry[1].create_client(
+            's3',
+            region_name=region,
+            aws_access_key_id=config['access_key_id'],
+            aws_secret_access_key=config['secret_access_key'],
+            config=AioConfig(max_pool_connections=S3ClientPool.max_pool_connections, tcp_keepalive=True),
+        )
+
+
+    @staticmethod
+    def client_config(**kwargs):
+        return Config(
+            max_pool_connections=S3ClientPool.max_pool_connections,
+            tcp_keepalive=True,
+            retries={ 'max_attempts': 3, 'mode': 'standard' },
+            **kwargs
+        )
+
+
+    @staticmethod
+    def fingerprint(config: dict):
+        credentials = f'{config.get("access_key_id")}:{config.get("secret_access_key")}'
+        return hashlib.sha256(credentials.encode()).hexdigest()
+
+
+    @staticmethod
+    def invalidate(namespace, connection_name = None):
+        """ Drops the clients of a connection (any region), or of the whole namespace """
+        def matches(key):
+            if key[0] != namespace: return False
+            if connection_name == None: return True
+            # Connections are referenced by name or by secret path (e.g. main/s3/name)
+            return key[1] == connection_name or str(key[1]).endswith(f'/{connection_name}')
+
+        with S3ClientPool.lock:
+            for key in [key for key in S3ClientPool.clients.keys() if matches(key)]:
+                S3ClientPool.clients.pop(key)
+            for key in [key for key in S3ClientPool.async_sessions.keys() if matches(key)]:
+                S3ClientPool.async_sessions.pop(key)
+
+
+    @staticmethod
+    def get_metrics():
+        with S3ClientPool.lock:
+            now = time.monotonic()
+            return {
+                'clients': len(S3ClientPool.clients), 'max_clients': S3ClientPool.max_clients,
+                'created': S3ClientPool.created, 'max_pool_connections': S3ClientPool.max_pool_connections,
+                'connections': [
+                    { 'namespace': key[0], 'connection_name': key[1], 'region': key[2], 'idle_sec': round(now - pooled.last_used, 1) }
+                    for key, pooled in S3ClientPool.clients.items()
+                ],
+            }
@@ -1,10 +1,19 @@
-from sqlalchemy import create_engine, inspect, MetaData, Table, text
+from sqlalchemy import create_engine, inspect, MetaData, Table, text, select, func, and_
 from sqlalchemy.engine import reflection
 from sqlalchemy.exc import NoInspectionAvailable
 from services.workspace.supper.SecretManagerType import SecretManagerType
+import os
 import traceback
+import threading
+import time
+import math
+import queue
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 import platform
-from utils.SQLServerUtil import column_type_conversion
+from utils.SQLServerUtil import column_type_conversion, fetch_batches, arrow_schema
+from utils.SchemaSnapshot import SchemaSnapshot
+from utils.db.SQLPoolManager import SQLPoolManager
 
 class SQLDatabase:
 
@@ -14,12 +23,6 @@ class SQLDatabase:
     """
 
     secret_manager: SecretManagerType
-    connections = {
-        'mysql': {},
-        'postgresql': {},
-        'mssql': {},
-        'oracle': {},
-    }
 
 
     def get_mysql_tables(namespace, connection_name, secret):
@@ -27,21 +30,8 @@ class SQLDatabase:
         mysql_conection, database = SQLConnection\
                                         .mysql_connect(namespace, connection_name, secret)
         
-        query_string = f'''
-            SELECT table_name, column_name, CONCAT('"', COLUMN_TYPE, '"') AS quoted_type
-            FROM information_schema.columns
-            WHERE table_schema = :schema
-            ORDER BY table_name, ORDINAL_POSITION
-        '''
-
-        tables = {}
-        result = mysql_conection.connect().execute(text(query_string), { 'schema': database })
-        for table_name, column_name, col_type in result.fetchall():
-            if table_name not in tables:
-                tables[table_name] = []
-            tables[table_name].append({ 'column': column_name, 'type':  col_type  })
-
-        return tables
+        snapshot = SchemaSnapshot.read(mysql_conection, 'mysql', database, foreign_keys=False)
+        return SQLDatabase.snapshot_to_tables(snapshot).get(database, {})
 
 
     def get_pgsql_tables(namespace, connection_name, secret):
@@ -49,30 +39,8 @@ class SQLDatabase:
         pgsql_conection, database = SQLConnection\
                                         .pgsql_connect(namespace, connection_name, secret)
 
-        query_string = """
-            SELECT
-                table_catalog AS database_name,
-                table_schema AS schema_name,
-                table_name AS table_name,
-                column_name AS column_name,
-                '"' || data_type || '"' AS quoted_type
-            FROM information_schema.columns
-            WHERE table_catalog = :database_name
-            ORDER BY table_schema, table_name, ordinal_position;
-        """
-
-        tables = {}
-        result = pgsql_conection.connect().execute(text(query_string), { 'database_name': database })
-        for dbo, table_schema, table_name, column_name, col_type in result.fetchall():
-   
-            if table_schema not in tables:
-                tables[table_schema] = {}
-
-            if table_name not in tables[table_schema]:
-                tables[table_schema][table_name] = []
-
-            tables[table_schema][table_name].append({ 'column': column_name, 'type':  col_type  })
-
+        # information_schema only has the connected database (all its schemas are listed)
+        tables = SQLDatabase.snapshot_to_tables(SchemaSnapshot.read(pgsql_conection, 'postgresql', foreign_keys=False))
         tables['schema_based'] = True
         return tables
 
@@ -84,30 +52,7 @@ class SQLDatabase:
             mssql_conection, database = SQLConnection\
                         .mssql_connect(namespace, connection_name, secret)
 
-            query_string = """
-                SELECT 
-                    TABLE_CATALOG AS database_name,
-                    TABLE_SCHEMA AS schema_name,
-                    TABLE_NAME AS table_name,
-                    COLUMN_NAME AS column_name,
-                    '"' + DATA_TYPE + '"' AS quoted_type
-                FROM INFORMATION_SCHEMA.COLUMNS
-                WHERE TABLE_CATALOG = :database_name
-                ORDER BY TABLE_SCHEMA, TABLE_NAME, ORDINAL_POSITION;
-            """
-
-            tables = {}
-            result = mssql_conection.connect().execute(text(query_string), { 'database_name': database })
-            for dbo, table_schema, table_name, column_name, col_type in result.fetchall():
-    
-                if table_schema not in tables:
-                    tables[table_schema] = {}
-
-                if table_name not in tables[table_schema]:
-                    tables[table_schema][table_name] = []
-
-                tables[table_schema][table_name].append({ 'column': column_name, 'type':  col_type  })
-
+            tables = SQLDatabase.snapshot_to_tables(SchemaSnapshot.read(mssql_conection, 'mssql', foreign_keys=False))
             tables['schema_based'] = True
             return tables
         
@@ -120,47 +65,40 @@ class SQLDatabase:
         oracle_conection, owner = SQLConnection\
                                         .oracle_connect(namespace, connection_name, secret)
         
-        query_string = """
-            SELECT 
-                TABLE_NAME AS table_name,
-                COLUMN_NAME AS column_name,
-                '"' || DATA_TYPE || '"' AS quoted_type
-            FROM ALL_TAB_COLUMNS
-            WHERE OWNER = :schema
-            ORDER BY TABLE_NAME, COLUMN_ID
-        """
+        snapshot = SchemaSnapshot.read(oracle_conection, 'oracle', owner, foreign_keys=False)
+        return SQLDatabase.snapshot_to_tables(snapshot).get(owner, {})
 
-        tables = {}
-        result = oracle_conection.connect().execute(text(query_string), { 'schema': owner })
-        for table_name, column_name, col_type in result.fetchall():
-            if table_name not in tables:
-                tables[table_name] = []
-            tables[table_name].append({ 'column': column_name, 'type':  col_type  })
 
-        return tables
+    @staticmethod
+    def snapshot_to_tables(snapshot: SchemaSnapshot):
+        """ { schema: { table: [{ column, type }] } } as the UI expects it (types are quoted) """
+        return {
+            schema: {
+                table: [{ 'column': column['name'], 'type': f'"{column["full_type"]}"' } for column in columns]
+                for table, columns in tables.items()
+            }
+            for schema, tables in snapshot.by_schema().items()
+        }
 
 
-    def get_tables_list(namespace, connection_name):
+    def get_tables_list(namespace, connection_name, refresh = False):
+        """ The table listing comes from DBMetadataCache unless it's expired or refresh is asked """
+        from utils.DBMetadataCache import DBMetadataCache
 
         try:
             
             path = f'main/db/{connection_name}'
             secret = SQLDatabase.secret_manager.get_secret(namespace,path=path)
 
-            table_list = None
             dbengine = secret['dbengine'] if 'dbengine' in secret else None
-
-            if(dbengine == 'mysql'):
-                table_list = SQLDatabase.get_mysql_tables(namespace, connection_name, secret)
-
-            if(dbengine == 'postgresql'):
-                table_list = SQLDatabase.get_pgsql_tables(namespace, connection_name, secret)
-
-            if(dbengine == 'mssql'):
-                table_list = SQLDatabase.get_mssql_tables(namespace, connection_name, secret)
-
-            if(dbengine == 'oracle'):
-                table_list = SQLDatabase.get_oracle_tables(namespace, connection_name, secret)
+            # The listing covers the whole database but for MySQL (database) and Oracle (owner)
+            schema = { 'mysql': secret.get('database'), 'oracle': secret.get('username') }.get(dbengine) or '*'
+
+            table_list = None if refresh else DBMetadataCache.get(namespace, connection_name, schema)
+            if table_list == None:
+                table_list = SQLDatabase.read_tables_list(namespace, connection_name, secret)
+                if table_list != None:
+                    DBMetadataCache.set(namespace, connection_name, schema, table_list)
             
             return { 'tables': table_list, 'details': secret }
         
@@ -171,6 +109,26 @@ class SQLDatabase:
             return { 'error': True, 'message': str(err) }
 
 
+    def read_tables_list(namespace, connection_name, secret):
+
+        table_list = None
+        dbengine = secret['dbengine'] if 'dbengine' in secret else None
+
+        if(dbengine == 'mysql'):
+            table_list = SQLDatabase.get_mysql_tables(namespace, connection_name, secret)
+
+        if(dbengine == 'postgresql'):
+            table_list = SQLDatabase.get_pgsql_tables(namespace, connection_name, secret)
+
+        if(dbengine == 'mssql'):
+            table_list = SQLDatabase.get_mssql_tables(namespace, connection_name, secret)
+
+        if(dbengine == 'oracle'):
+            table_list = SQLDatabase.get_oracle_tables(namespace, connection_name, secret)
+        
+        return table_list
+
+
     def get_connnection(namespace, dbengine, connection_name):
         db_conection = None
         if(dbengine == 'mysql'):
@@ -234,7 +192,9 @@ class SQLDatabase:
         message, error = '', False
 
         try:
-            with create_engine(query_string).connect() as conn:
+            # A single test engine per database type, replaced when another connection is tested
+            engine = SQLPoolManager.engine(('__connection_test__', dbengine, 'test'), query_string, dbengine)
+            with engine.connect() as conn:
                 if dbengine == 'oracle':
                     conn.execute(text("SELECT 1 FROM DUAL"))
                 else:
@@ -252,28 +212,27 @@ class SQLConnection:
 
     def mysql_connect(namespace, connection_name, secret = None):
 
-        connection_key = f'{namespace}-{connection_name}'
-
-        if connection_key in SQLDatabase.connections['mysql']:
-            return SQLDatabase.connections['mysql'][connection_key]
+        connection_key = (namespace, connection_name, 'mysql')
+        pooled = SQLPoolManager.get(connection_key)
+        if pooled != None:
+            return pooled.engine, pooled.extra
         
         if secret == None:
             secret = SQLDatabase.secret_manager.get_db_secret(namespace,connection_name)
 
         connection_string = secret['connection_url']
-        connection = create_engine(connection_string)
-
         database = secret['database']
-        SQLDatabase.connections['mysql'][connection_key] = connection, database
+        connection = SQLPoolManager.engine(connection_key, connection_string, 'mysql', database)
 
         return connection, database
 
 
     def pgsql_connect(namespace, connection_name, secret = None):
 
-        connection_key = f'{namespace}-{connection_name}'
-        if connection_key in SQLDatabase.connections['postgresql']:
-            return SQLDatabase.connections['postgresql'][connection_key]
+        connection_key = (namespace, connection_name, 'postgresql')
+        pooled = SQLPoolManager.get(connection_key)
+        if pooled != None:
+            return pooled.engine, pooled.extra
         
         if secret == None:
             secret = SQLDatabase.secret_manager.get_db_secret(namespace,connection_name)
@@ -286,17 +245,17 @@ class SQLConnection:
 
         connection_string = str(connection_string).replace(postgress_prefix,psycopa2_driver_prefix)
 
-        connection = create_engine(connection_string)
-        SQLDatabase.connections['postgresql'][connection_key] = connection, database
+        connection = SQLPoolManager.engine(connection_key, connection_string, 'postgresql', database)
 
         return connection, database
 
 
     def oracle_connect(namespace, connection_name, secret = None):
 
-        connection_key = f'{namespace}-{connection_name}'
-        if connection_key in SQLDatabase.connections['oracle']:
-            return SQLDatabase.connections['oracle'][connection_key]
+        connection_key = (namespace, connection_name, 'oracle')
+        pooled = SQLPoolManager.get(connection_key)
+        if pooled != None:
+            return pooled.engine, pooled.extra
         
         if secret == None:
             secret = SQLDatabase.secret_manager.get_db_secret(namespace,connection_name)
@@ -304,8 +263,10 @@ class SQLConnection:
         connection_string = secret['connection_url']
 
         owner = secret['username']
-        connection = create_engine(connection_string)
-        SQLDatabase.connections['oracle'][connection_key] = connection, owner
+        # Connections come from the oracledb pool of this connection (reused by reflection and previews)
+        from utils.OracleDBUtil import OracleDBUtil
+        creator = OracleDBUtil.get_creator(namespace, connection_name, secret)
+        connection = SQLPoolManager.engine(connection_key, connection_string, 'oracle', owner, creator)
 
         return connection, owner
     
@@ -313,9 +274,10 @@ class SQLConnection:
 
     def mssql_connect(namespace, connection_name, secret = None):
 
-        connection_key = f'{namespace}-{connection_name}'
-        if connection_key in SQLDatabase.connections['mssql']:
-            return SQLDatabase.connections['mssql'][connection_key]
+        connection_key = (namespace, connection_name, 'mssql')
+        pooled = SQLPoolManager.get(connection_key)
+        if pooled != None:
+            return pooled.engine, pooled.extra
         
         if secret == None:
             secret = SQLDatabase.secret_manager.get_db_secret(namespace,connection_name)
@@ -325,8 +287,7 @@ class SQLConnection:
         connection_string = secret['connection_url']+driver
 
         database = secret['database']
-        connection = create_engine(connection_string)
-        SQLDatabase.connections['mssql'][connection_key] = connection, database
+        connection = SQLPoolManager.engine(connection_key, connection_string, 'mssql', database)
 
         return connection, database
     
@@ -436,10 +397,12 @@ def _normalize_table_names_backward(secrets, tables, primary_keys=None):
 
     if dbengine == 'oracle':
         engine    = create_engine(secrets['connection_url'])
-        inspector = inspect(engine)
-        available = inspector.get_table_names(schema=secrets['username'])
+        try:
+            available = SchemaSnapshot.list_tables(engine, dbengine, secrets['username'])
+        finally:
+            engine.dispose()
 
-        if available[0].islower():
+        if available and available[0].islower():
             actual_tables = [t.lower() for t in tables]
 
         if primary_keys:
@@ -462,42 +425,29 @@ def normalize_table_names(secrets, tables, primary_keys=None, db_name = {}):
     if dbengine != 'postgresql':
         return _normalize_table_names_backward(secrets, tables, primary_keys)
 
-    engine = create_engine(connection_url)
-    inspector = inspect(engine)
-    available = inspector.get_table_names(schema=schema)
-
-    if dbengine == 'oracle':
-        actual_tables = [t.lower() if any(a.islower() for a in available) else t.upper() for t in tables]
-    else:
-        actual_tables = {
-            t.lower().split('.')[1] if t.lower().__contains__('.') else t.lower(): t.lower()   for t in tables
-        }
+    actual_tables = {
+        t.lower().split('.')[1] if t.lower().__contains__('.') else t.lower(): t.lower()   for t in tables
+    }
 
     actual_pks = primary_keys if primary_keys else []
     [relationships, schema_metadata, ddls] = [{}, {}, {}]
 
-    for table in actual_tables.keys():
-        if table in available:
-            [cols, column_defs] = [inspector.get_columns(table, schema=schema), []]
-            schema_metadata[table] = { c['name']: c['type']  for c in cols }
-
-            for c in cols:
-                null_str = 'NOT NULL' if not c.get('nullable') else ''
-                column_defs.append(f"  {c['name']} {str(c['type'])} {null_str}".strip())
+    # Columns and foreign keys of all the tables come from one snapshot (not an inspector call per table)
+    engine = create_engine(connection_url)
+    try:
+        snapshot = SchemaSnapshot.read(engine, dbengine, schema, list(actual_tables.keys()))
+    finally:
+        engine.dispose()
 
-            fks = inspector.get_foreign_keys(table, schema=schema)
+    for table in actual_tables.keys():
+        entry = snapshot.table(table, schema)
+        if entry:
+            schema_metadata[table] = { c['name']: snapshot.sqlalchemy_type(c) for c in entry['columns'] }
             relationships[table] = [
                 { 'columns': fk['constrained_columns'], 'referred_table': fk['referred_table'], 'referred_columns': fk['referred_columns']  }
-                for fk in fks
+                for fk in entry['foreign_keys']
             ]
-            
-            for fk in fks:
-                l_cols = ', '.join(fk['constrained_columns'])
-                r_table = fk['referred_table']
-                r_cols = ', '.join(fk['referred_columns'])
-                column_defs.append(f'  FOREIGN KEY ({l_cols}) REFERENCES {r_table} ({r_cols})')
-
-            ddls[table] = f"CREATE TABLE {table} (\n" + ",\n".join(column_defs) + "\n);"
+            ddls[table] = snapshot.ddl(table, schema)
 
     final_big_query = generate_join_query(actual_tables, relationships, schema_metadata, db_name)
 
@@ -520,3 +470,226 @@ def converts_field_type(table, pk):
     table = table.apply_hints(additional_table_hints={"x-dlt-materialize-schema": True})
 
     return table
+
+
+# Column names (lower case) taken as "last change" cursor for incremental loads, by preference order
+CURSOR_COLUMN_CANDIDATES = [
+    'updated_at', 'modified_at', 'last_modified', 'last_updated', 'updated_on',
+    'modified_on', 'update_date', 'modified_date', 'last_update', 'changed_at',
+]
+
+
+def detect_cursor_column(columns: list[dict], pk = None):
+    """
+    Picks the incremental cursor from the reflected columns (SQLAlchemy inspector format), a date/time
+    "last change" column catches new and changed rows, otherwise an integer primary key catches new rows.
+    None means the table has no usable cursor and keeps being fully reloaded
+    """
+    from sqlalchemy import types as sqltypes
+    by_name = { str(col['name']).lower(): col for col in columns }
+
+    for candidate in CURSOR_COLUMN_CANDIDATES:
+        col = by_name.get(candidate)
+        if col and isinstance(col['type'], (sqltypes.DateTime, sqltypes.Date)):
+            return col['name']
+
+    pk_col = by_name.get(str(pk).lower()) if isinstance(pk, str) else None
+    if pk_col and isinstance(pk_col['type'], sqltypes.Integer):
+        return pk_col['name']
+
+    return None
+
+
+def resolve_cursor_columns(connection_url, tables: list[str], primary_keys: list, cursor_columns: list = None):
+    """
+    Cursor column of each table (same order as tables), the ones set in the SqlDBComponent
+    node are kept and the missing ones are detected from the schema, read for all of them at once
+    """
+    cursor_columns = list(cursor_columns or [])
+    cursor_columns += [None] * (len(tables) - len(cursor_columns))
+    missing = [idx for idx, cursor in enumerate(cursor_columns) if not cursor]
+    if not missing: return cursor_columns
+
+    engine = create_engine(connection_url)
+    try:
+        # Unqualified tables are in the connection default schema (database in MySQL, user in Oracle)
+        default_schema = inspect(engine).default_schema_name
+        names = { idx: tables[idx].split('.', 1) if '.' in tables[idx] else (default_schema, tables[idx]) for idx in missing }
+        # The catalogs keep the names in their own casing (e.g. upper case in Oracle)
+        variants = { variant for _, table in names.values() for variant in (table, table.upper(), table.lower()) }
+        snapshot = SchemaSnapshot.read(engine, engine.dialect.name, tables=list(variants), foreign_keys=False)
+    except Exception as err:
+        print(f'Could not read the schema to detect the incremental cursors, tables will be fully loaded: {str(err)}')
+        return cursor_columns
+    finally:
+        engine.dispose()
+
+    for idx, (schema, table) in names.items():
+        entry = None
+        for name in (table, table.upper(), table.lower()):
+            entry = entry or snapshot.table(name, schema) or snapshot.table(name, str(schema).upper())
+        if entry == None:
+            print(f'Could not detect the incremental cursor of {tables[idx]}, it will be fully loaded: table not found')
+            continue
+
+        # Same format as the SQLAlchemy inspector columns
+        columns = [{ 'name': column['name'], 'type': snapshot.sqlalchemy_type(column) } for column in entry['columns']]
+        pk = primary_keys[idx] if primary_keys and idx < len(primary_keys) else None
+        cursor_columns[idx] = detect_cursor_column(columns, pk or (entry['primary_key'] + [None])[0])
+
+    return cursor_columns
+
+
+def incremental_cursor(cursor_column):
+    """ dlt incremental hint for the table cursor (None keeps the full load) """
+    import dlt
+    return dlt.sources.incremental(cursor_column) if cursor_column else None
+
+
+def create_run_engine(connection_url, parallel_workers = 1):
+    """ Single pooled engine shared by all the tables extracted in a pipeline run """
+    workers = max(int(parallel_workers or 1), 1)
+    return create_engine(connection_url, pool_size=workers, max_overflow=workers, pool_pre_ping=True)
+
+
+def set_extract_workers(parallel_workers):
+    """ dlt extract step threads (EXTRACT__WORKERS) of the run, parallelized table resources use them """
+    os.environ['EXTRACT__WORKERS'] = str(max(int(parallel_workers or 1), 1))
+
+
+class ExtractionTimer:
+    """
+    Per table extraction timings of a pipeline run, a map step is attached to each table
+    resource and records when its first and last batches came out (seconds since the run started),
+    the table finishing last is the extraction critical path
+    """
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.tables = {}
+        self.lock = threading.Lock()
+
+
+    def track(self, resource, table_name):
+        def on_item(item):
+            now = round(time.monotonic() - self.started_at, 3)
+            rows = item.num_rows if hasattr(item, 'num_rows') else len(item) if hasattr(item, 'shape') or isinstance(item, list) else 1
+            with self.lock:
+                stats = self.tables.setdefault(table_name, { 'first_batch_sec': now, 'rows': 0, 'batches': 0 })
+                stats.update({ 'last_batch_sec': now, 'rows': stats['rows'] + rows, 'batches': stats['batches'] + 1 })
+            return item
+        return resource.add_map(on_item)
+
+
+    def log(self, logger):
+        for table_name, stats in sorted(self.tables.items(), key=lambda table: table[1]['last_batch_sec']):
+            logger.info("Table extraction timing", extra={
+                'stage': 'table_extraction', 'table_name': table_name,
+                'extract_sec': round(stats['last_batch_sec'] - stats['first_batch_sec'], 3), **stats
+            })
+
+
+def partition_bounds(low, high, count):
+    """
+    Inner boundaries splitting low..high into up to count key ranges, only numbers and dates/datetimes
+    can be split (other types, or count <= 1, give a single range)
+    """
+    if low is None or high is None or low == high or count <= 1: return []
+    if isinstance(low, bool) or not isinstance(low, (int, float, Decimal, date)): return []
+
+    if isinstance(low, int):
+        step = max(math.ceil((high - low + 1) / count), 1)
+    elif isinstance(low, date) and not isinstance(low, datetime):
+        step = timedelta(days=max(math.ceil((high - low).days / count), 1))
+    else:
+        step = (high - low) / count
+
+    return sorted({ low + step * idx for idx in range(1, count) if low + step * idx <= high })
+
+
+def partition_conditions(column, bounds):
+    """ Range filters covering every row, including the ones added after min/max were read and NULL keys """
+    if not bounds: return [None]
+    conditions = [column < bounds[0]]
+    conditions += [and_(column >= start, column < end) for start, end in zip(bounds, bounds[1:])]
+    return conditions + [column >= bounds[-1], column.is_(None)]
+
+
+def extract_partitions(engine, query, conditions, backend = 'pyarrow', chunk_size = 50000, schema = None):
+    """
+    Runs the range queries at the same time, each over its own pooled connection, and yields
+    their batches as they come (a bounded queue keeps memory in check when the load is slower)
+    """
+    batches, stop, finished = queue.Queue(maxsize=len(conditions) * 2), threading.Event(), object()
+
+    def offer(item):
+        # Gives up once the consumer is gone (e.g. the run failed on another range)
+        while not stop.is_set():
+            try:
+                return batches.put(item, timeout=1)
+            except queue.Full: ...
+
+    def read_range(condition):
+        try:
+            with engine.connect() as connection:
+                range_query = query if condition is None else query.where(condition)
+                result = connection.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(range_query)
+                for batch in fetch_batches(result, backend, chunk_size, schema):
+                    if stop.is_set(): return
+                    offer(batch)
+        except Exception as err:
+            offer(err)
+        finally:
+            offer(finished)
+
+    threads = [threading.Thread(target=read_range, args=(condition,), daemon=True) for condition in conditions]
+    for thread in threads: thread.start()
+
+    try:
+        pending = len(threads)
+        while pending:
+            batch = batches.get()
+            if batch is finished:
+                pending -= 1
+            elif isinstance(batch, Exception):
+                raise batch
+            else:
+                yield batch
+    finally:
+        stop.set()
+
+
+def partitioned_sql_table(engine, table_name, schema, pk, partition, backend = 'pyarrow', chunk_size = 50000, cursor = None):
+    """
+    Single dlt resource of a table extracted by key ranges at the same time, partition comes from
+    the SqlDBComponent node ({ 'column', 'count' }, the column defaults to the primary key).
+    Column hints are reflected like sql_table does, so converts_field_type and the primary key hints apply
+    """
+    import dlt
+    from dlt.sources.sql_database.schema_types import table_to_columns
+
+    table = Table(table_name, MetaData(), schema=schema, autoload_with=engine)
+    column_name = partition.get('column') or (pk[0] if isinstance(pk, list) and pk else pk)
+    if not column_name:
+        raise ValueError(f'Cannot partition {table_name}, it has no primary key and no partition column was given')
+    if column_name not in table.c:
+        raise ValueError(f'Cannot partition {table_name}, it has no {column_name} column')
+    partition_column = table.c[column_name]
+
+    # Same Arrow schema for the batches of every key range
+    schema = arrow_schema([col.name for col in table.columns], [{ 'name': col.name, 'type': col.type } for col in table.columns])
+
+    @dlt.resource(name=table_name, primary_key=pk, columns=table_to_columns(table))
+    def table_data(cursor_value = dlt.sources.incremental(cursor) if cursor else None):
+        query = select(table)
+        if cursor_value != None and cursor_value.last_value != None:
+            query = query.where(table.c[cursor] >= cursor_value.last_value)
+
+        with engine.connect() as connection:
+            low, high = connection.execute(select(func.min(partition_column), func.max(partition_column))).one()
+        conditions = partition_conditions(partition_column, partition_bounds(low, high, partition['count']))
+        print(f'Extracting {table_name} in {len(conditions)} partitions of {partition_column.name} ({low} to {high})', flush=True)
+
+        yield from extract_partitions(engine, query, conditions, backend, chunk_size, schema)
+
+    return table_data
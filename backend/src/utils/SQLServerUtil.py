@@ -1,6 +1,8 @@
 import dlt
-from sqlalchemy import create_engine, text, inspect
+from sqlalchemy import text, inspect, select, func, column
 import re
+import pyarrow as pa
+from sqlalchemy import types as sqltypes
 
 def column_type_conversion(columns, connection, table, schema):
 
@@ -38,13 +40,105 @@ def column_type_conversion(columns, connection, table, schema):
     return ", ".join(columns)
 
 
+def arrow_type(sql_type):
+    """ Arrow type of a reflected SQLAlchemy column type, the ones without a match are read as text """
+    if isinstance(sql_type, sqltypes.Boolean): return pa.bool_()
+    if isinstance(sql_type, sqltypes.Integer): return pa.int64()
+    if isinstance(sql_type, sqltypes.Float): return pa.float64()
+    if isinstance(sql_type, sqltypes.Numeric):
+        precision, scale = sql_type.precision, sql_type.scale
+        if precision and precision <= 38 and scale != None and 0 <= scale <= precision:
+            return pa.decimal128(precision, scale)
+        # Unbounded numbers (e.g. Oracle NUMBER)
+        return pa.float64()
+    if isinstance(sql_type, sqltypes.DateTime): return pa.timestamp('us', tz='UTC' if sql_type.timezone else None)
+    if isinstance(sql_type, sqltypes.Date): return pa.date32()
+    if isinstance(sql_type, sqltypes.Time): return pa.time64('us')
+    if isinstance(sql_type, sqltypes._Binary): return pa.binary()
+    return pa.string()
+
+
+def arrow_schema(names: list[str], columns: list[dict], text_columns: list[str] = None):
+    """
+    Schema of a query result from the reflected columns (inspector format), every batch is built with it
+    so that an all null chunk or a text fallback in one chunk don't change the column types between batches.
+    text_columns are the ones the query casts to text (see column_type_conversion)
+    """
+    by_name = { str(col['name']).lower(): col for col in columns }
+    text_columns = [str(name).lower() for name in (text_columns or [])]
+
+    def field(name):
+        col = by_name.get(str(name).lower())
+        if col == None or str(name).lower() in text_columns: return pa.field(name, pa.string())
+        return pa.field(name, arrow_type(col['type']))
+
+    return pa.schema([field(name) for name in names])
+
+
+def to_arrow_array(values, type = None):
+    try:
+        return pa.array(values, type=type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        # Values Arrow can't infer (e.g. uniqueidentifier as uuid.UUID) go as text
+        text_values = pa.array([None if value is None else str(value) for value in values], type=pa.string())
+        return text_values if type == None or pa.types.is_string(type) else text_values.cast(type)
+
+
+def fetch_batches(result, backend = 'pyarrow', chunk_size = 50000, schema: pa.Schema = None):
+    """
+    Streams the query result in fetchmany batches, as Arrow tables (pyarrow/connectorx),
+    pandas DataFrames or lists of dict rows (sqlalchemy). All the Arrow batches have the given
+    schema (see arrow_schema), or the one of the first batch (null columns as text) when not given
+    """
+    columns = list(result.keys())
+    if schema != None:
+        # In the result columns order, the ones not reflected (e.g. computed) as text
+        schema = pa.schema([schema.field(name) if name in schema.names else pa.field(name, pa.string()) for name in columns])
+
+    while True:
+        rows = result.fetchmany(chunk_size)
+        if not rows: break
+
+        if backend == 'sqlalchemy':
+            yield [dict(zip(columns, row)) for row in rows]
+            continue
+
+        if schema == None:
+            arrays = [to_arrow_array(values) for values in zip(*rows)]
+            schema = pa.schema([
+                pa.field(name, pa.string() if pa.types.is_null(array.type) else array.type) for name, array in zip(columns, arrays)
+            ])
+        arrays = [to_arrow_array(values, field.type) for values, field in zip(zip(*rows), schema)]
+        batch = pa.Table.from_arrays(arrays, schema=schema)
+        yield batch.to_pandas() if backend == 'pandas' else batch
+
+
 def dynamic_mssql_source(
     tables: list[str],
     primary_keys: list[str],
     connection_string: str,
+    cursor_columns: list[str] = None,
+    backend: str = 'pyarrow',
+    chunk_size: int = 50000,
+    parallel_workers: int = 1,
+    partitions: list[dict] = None,
 ):
+    """
+    cursor_columns turns the incremental load on (None cursors are detected from the reflected schema),
+    rows are fetched chunk_size at a time and yielded as Arrow tables unless backend is sqlalchemy.
+    All tables share one pooled engine, with parallel_workers > 1 they're extracted at the same time,
+    partitioned tables ({ column, count }) are extracted by key ranges at the same time
+    """
+    from utils.SQLDatabase import create_run_engine
 
     table_to_schema_map = {}
+    partitions = partitions or [None] * len(tables)
+    pool_size = max([parallel_workers] + [partition['count'] + 2 for partition in partitions if partition])
+    engine = create_run_engine(connection_string, pool_size)
+    if cursor_columns is not None:
+        cursor_columns = resolve_mssql_cursor_columns(tables, primary_keys, engine, cursor_columns)
+    else:
+        cursor_columns = [None] * len(tables)
 
     @dlt.source
     def source(
@@ -52,26 +146,80 @@ def dynamic_mssql_source(
         primary_keys: list[str],
         connection_string: str,
     ):
-        def create_table_resource(table: str, key):
+        def create_table_resource(table: str, key, cursor, partition):
             resource_name = table.replace('.','_')
             
             table_to_schema_map[resource_name] = table
-            @dlt.resource(name=resource_name, primary_key=key)
-            def table_data():
-                engine = create_engine(connection_string)
-                inspector = inspect(engine)
-
+            @dlt.resource(name=resource_name, primary_key=key, parallelized=parallel_workers > 1)
+            def table_data(cursor_value = dlt.sources.incremental(cursor) if cursor else None):
                 schema_name, table_name = table.split('.')
-                columns = inspector.get_columns(table_name, schema=schema_name)
-                parsed_columns = column_type_conversion(columns, engine.connect(), table_name, schema_name)
-
-                query = f"SELECT {parsed_columns} FROM {schema_name}.{table_name}"
-                result = engine.connect().execute(text(query))
-                
-                for row in result:
-                    yield dict(row._mapping)
+                with engine.connect() as connection:
+                    columns = inspect(connection).get_columns(table_name, schema=schema_name)
+                    parsed_columns = column_type_conversion(columns, connection, table_name, schema_name)
+
+                # TIME columns are converted to text by the query (column_type_conversion)
+                names = [col['name'] for col in columns]
+                text_columns = [col['name'] for col in columns if isinstance(col['type'], sqltypes.Time)]
+                schema = arrow_schema(names, columns, text_columns)
+
+                last_value = cursor_value.last_value if cursor_value != None else None
+                if partition:
+                    yield from partitioned_table_data(
+                        engine, table, parsed_columns, partition.get('column') or key, partition['count'],
+                        cursor, last_value, backend, chunk_size, schema
+                    )
+                    return
+
+                with engine.connect() as connection:
+                    query, params = f"SELECT {parsed_columns} FROM {schema_name}.{table_name}", {}
+                    if last_value != None:
+                        # Only new and changed rows, >= since rows sharing the last value may not all be loaded yet
+                        query, params = f"{query} WHERE [{cursor}] >= :last_value", { 'last_value': last_value }
+                    result = connection.execute(text(query), params)
+
+                    yield from fetch_batches(result, backend, chunk_size, schema)
             
             return table_data
-        return [create_table_resource(tables[index], primary_keys[index]) for index in range(len(tables))]
+        return [
+            create_table_resource(tables[index], primary_keys[index], cursor_columns[index], partitions[index])
+            for index in range(len(tables))
+        ]
     
-    return source(tables, primary_keys, connection_string), table_to_schema_map 
\ No newline at end of file
+    return source(tables, primary_keys, connection_string), table_to_schema_map 
+
+
+def partitioned_table_data(engine, table, parsed_columns, key, count, cursor, last_value, backend, chunk_size, schema = None):
+    """ Table rows extracted by key ranges at the same time, each range over its own pooled connection """
+    from utils.SQLDatabase import extract_partitions, partition_bounds, partition_conditions
+
+    schema_name, table_name = table.split('.')
+    from_clause, key_column = text(f"{schema_name}.{table_name}"), column(key)
+    query = select(text(parsed_columns)).select_from(from_clause)
+    if last_value != None:
+        query = query.where(column(cursor) >= last_value)
+
+    with engine.connect() as connection:
+        low, high = connection.execute(select(func.min(key_column), func.max(key_column)).select_from(from_clause)).one()
+
+    conditions = partition_conditions(key_column, partition_bounds(low, high, count))
+    print(f'Extracting {table} in {len(conditions)} partitions of {key} ({low} to {high})', flush=True)
+    yield from extract_partitions(engine, query, conditions, backend, chunk_size, schema)
+
+
+def resolve_mssql_cursor_columns(tables: list[str], primary_keys: list[str], engine, cursor_columns: list[str]):
+    from utils.SQLDatabase import detect_cursor_column
+    cursor_columns = list(cursor_columns) + [None] * (len(tables) - len(cursor_columns))
+    missing = [idx for idx, cursor in enumerate(cursor_columns) if not cursor]
+    if not missing: return cursor_columns
+
+    inspector = inspect(engine)
+    for idx in missing:
+        schema_name, table_name = tables[idx].split('.')
+        try:
+            columns = inspector.get_columns(table_name, schema=schema_name)
+            cursor_columns[idx] = detect_cursor_column(columns, primary_keys[idx])
+        except Exception as err:
+            print(f'Could not detect the incremental cursor of {tables[idx]}, it will be fully loaded: {str(err)}')
+
+    print(f'Incremental load cursors: {dict(zip(tables, cursor_columns))}')
+    return cursor_columns
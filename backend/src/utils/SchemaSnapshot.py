@@ -0,0 +1,206 @@
+from sqlalchemy import text, bindparam
+from sqlalchemy.types import NullType
+
+# Columns and primary key flag of many tables in a single catalog query, {table_filter} narrows it down
+# to the requested tables and {full_type} is the type shown in the UI (MySQL has the complete one)
+INFORMATION_SCHEMA_COLUMNS = """
+    SELECT c.table_schema, c.table_name, c.column_name, c.data_type, {full_type},
+           c.is_nullable, c.character_maximum_length, c.numeric_precision, c.numeric_scale,
+           CASE WHEN pk.column_name IS NULL THEN 0 ELSE 1 END AS is_pk
+    FROM information_schema.columns c
+    LEFT JOIN (
+        SELECT kcu.table_schema, kcu.table_name, kcu.column_name
+        FROM information_schema.table_constraints tc
+        JOIN information_schema.key_column_usage kcu
+          ON kcu.constraint_schema = tc.constraint_schema AND kcu.constraint_name = tc.constraint_name
+         AND kcu.table_schema = tc.table_schema AND kcu.table_name = tc.table_name
+        WHERE tc.constraint_type = 'PRIMARY KEY'
+    ) pk ON pk.table_schema = c.table_schema AND pk.table_name = c.table_name AND pk.column_name = c.column_name
+    WHERE 1 = 1 {schema_filter} {table_filter}
+    ORDER BY c.table_schema, c.table_name, c.ordinal_position
+"""
+
+ORACLE_COLUMNS = """
+    SELECT c.owner, c.table_name, c.column_name, c.data_type, c.data_type,
+           c.nullable, c.char_length, c.data_precision, c.data_scale,
+           CASE WHEN pk.column_name IS NULL THEN 0 ELSE 1 END AS is_pk
+    FROM all_tab_columns c
+    LEFT JOIN (
+        SELECT cc.owner, cc.table_name, cc.column_name
+        FROM all_constraints con
+        JOIN all_cons_columns cc ON cc.owner = con.owner AND cc.constraint_name = con.constraint_name
+        WHERE con.constraint_type = 'P'
+    ) pk ON pk.owner = c.owner AND pk.table_name = c.table_name AND pk.column_name = c.column_name
+    WHERE 1 = 1 {schema_filter} {table_filter}
+    ORDER BY c.owner, c.table_name, c.column_id
+"""
+
+# Foreign keys as (schema, table, constraint, column, referred table, referred column) rows
+FOREIGN_KEYS = {
+    'postgresql': """
+        SELECT kcu.table_schema, kcu.table_name, kcu.constraint_name, kcu.column_name, ref.table_name, ref.column_name
+        FROM information_schema.referential_constraints rc
+        JOIN information_schema.key_column_usage kcu
+          ON kcu.constraint_schema = rc.constraint_schema AND kcu.constraint_name = rc.constraint_name
+        JOIN information_schema.key_column_usage ref
+          ON ref.constraint_schema = rc.unique_constraint_schema AND ref.constraint_name = rc.unique_constraint_name
+         AND ref.ordinal_position = kcu.position_in_unique_constraint
+        WHERE 1 = 1 {schema_filter} {table_filter}
+        ORDER BY kcu.table_schema, kcu.table_name, kcu.constraint_name, kcu.ordinal_position
+    """,
+    'mysql': """
+        SELECT kcu.table_schema, kcu.table_name, kcu.constraint_name, kcu.column_name,
+               kcu.referenced_table_name, kcu.referenced_column_name
+        FROM information_schema.key_column_usage kcu
+        WHERE kcu.referenced_table_name IS NOT NULL {schema_filter} {table_filter}
+        ORDER BY kcu.table_schema, kcu.table_name, kcu.constraint_name, kcu.ordinal_position
+    """,
+    'mssql': """
+        SELECT kcu.table_schema, kcu.table_name, kcu.constraint_name, kcu.column_name, ref.name, ref_col.name
+        FROM (
+            SELECT s.name AS table_schema, t.name AS table_name, fk.name AS constraint_name,
+                   c.name AS column_name, fkc.referenced_object_id, fkc.referenced_column_id, fkc.constraint_column_id
+            FROM sys.foreign_key_columns fkc
+            JOIN sys.foreign_keys fk ON fk.object_id = fkc.constraint_object_id
+            JOIN sys.tables t ON t.object_id = fkc.parent_object_id
+            JOIN sys.schemas s ON s.schema_id = t.schema_id
+            JOIN sys.columns c ON c.object_id = fkc.parent_object_id AND c.column_id = fkc.parent_column_id
+        ) kcu
+        JOIN sys.tables ref ON ref.object_id = kcu.referenced_object_id
+        JOIN sys.columns ref_col ON ref_col.object_id = kcu.referenced_object_id AND ref_col.column_id = kcu.referenced_column_id
+        WHERE 1 = 1 {schema_filter} {table_filter}
+        ORDER BY kcu.table_schema, kcu.table_name, kcu.constraint_name, kcu.constraint_column_id
+    """,
+    'oracle': """
+        SELECT kcu.owner, kcu.table_name, kcu.constraint_name, kcu.column_name, ref.table_name, ref.column_name
+        FROM all_constraints con
+        JOIN all_cons_columns kcu ON kcu.owner = con.owner AND kcu.constraint_name = con.constraint_name
+        JOIN all_cons_columns ref ON ref.owner = con.r_owner AND ref.constraint_name = con.r_constraint_name
+         AND ref.position = kcu.position
+        WHERE con.constraint_type = 'R' {schema_filter} {table_filter}
+        ORDER BY kcu.owner, kcu.table_name, kcu.constraint_name, kcu.position
+    """,
+}
+
+
+class SchemaSnapshot:
+    """
+    Columns, primary keys and foreign keys of all the requested tables, read with one columns
+    query and one foreign keys query per database instead of inspector calls table by table.
+    It feeds normalize_table_names (relationships, DDLs, join query) and the SQLDatabase table listing
+    """
+
+    def __init__(self, dbengine, dialect):
+        self.dbengine = dbengine
+        self.dialect = dialect
+        # (schema, table) -> { 'columns': [...], 'primary_key': [...], 'foreign_keys': [...] }
+        self.tables = {}
+
+
+    @staticmethod
+    def read(engine, dbengine, schema = None, tables: list[str] = None, foreign_keys = True):
+        """ schema None reads all the schemas, tables None reads all the tables """
+        snapshot = SchemaSnapshot(dbengine, engine.dialect)
+        is_oracle = dbengine == 'oracle'
+        schema_column, table_column = ('owner', 'table_name') if is_oracle else ('table_schema', 'table_name')
+
+        with engine.connect() as connection:
+            query = ORACLE_COLUMNS if is_oracle else INFORMATION_SCHEMA_COLUMNS
+            query = query.replace('{full_type}', 'c.column_type' if dbengine == 'mysql' else 'c.data_type')
+            rows = SchemaSnapshot.execute(connection, query, f'c.{schema_column}', f'c.{table_column}', schema, tables)
+
+            for table_schema, table_name, column_name, data_type, full_type, nullable, length, precision, scale, is_pk in rows:
+                entry = snapshot.add_table(table_schema, table_name)
+                entry['columns'].append({
+                    'name': column_name, 'data_type': data_type, 'full_type': full_type,
+                    'nullable': str(nullable).upper() in ('YES', 'Y'),
+                    'length': length, 'precision': precision, 'scale': scale,
+                })
+                if is_pk: entry['primary_key'].append(column_name)
+
+            if foreign_keys and dbengine in FOREIGN_KEYS:
+                rows = SchemaSnapshot.execute(
+                    connection, FOREIGN_KEYS[dbengine], f'kcu.{schema_column}', f'kcu.{table_column}', schema, tables
+                )
+                constraints = {}
+                for table_schema, table_name, constraint, column_name, referred_table, referred_column in rows:
+                    key = (table_schema, table_name, constraint)
+                    if key not in constraints:
+                        constraints[key] = { 'constrained_columns': [], 'referred_table': referred_table, 'referred_columns': [] }
+                        snapshot.add_table(table_schema, table_name)['foreign_keys'].append(constraints[key])
+                    constraints[key]['constrained_columns'].append(column_name)
+                    constraints[key]['referred_columns'].append(referred_column)
+
+        return snapshot
+
+
+    @staticmethod
+    def execute(connection, query, schema_column, table_column, schema, tables):
+        params, schema_filter, table_filter = {}, '', ''
+        if schema != None:
+            schema_filter, params['schema'] = f'AND {schema_column} = :schema', schema
+        if tables:
+            table_filter, params['tables'] = f'AND {table_column} IN :tables', list(tables)
+
+        statement = text(query.replace('{schema_filter}', schema_filter).replace('{table_filter}', table_filter))
+        if tables:
+            statement = statement.bindparams(bindparam('tables', expanding=True))
+        return connection.execute(statement, params).fetchall()
+
+
+    @staticmethod
+    def list_tables(engine, dbengine, schema):
+        """ Table names only (e.g. to find out the names casing) """
+        query = 'SELECT table_name FROM all_tables WHERE owner = :schema' if dbengine == 'oracle'\
+            else 'SELECT table_name FROM information_schema.tables WHERE table_schema = :schema'
+        with engine.connect() as connection:
+            return [row[0] for row in connection.execute(text(query), { 'schema': schema }).fetchall()]
+
+
+    def add_table(self, schema, table):
+        return self.tables.setdefault((schema, table), { 'columns': [], 'primary_key': [], 'foreign_keys': [] })
+
+
+    def table(self, table, schema = None):
+        if schema != None: return self.tables.get((schema, table))
+        return next((entry for (_, name), entry in self.tables.items() if name == table), None)
+
+
+    def by_schema(self):
+        """ { schema: { table: [columns] } } """
+        schemas = {}
+        for (schema, table), entry in self.tables.items():
+            schemas.setdefault(schema, {})[table] = entry['columns']
+        return schemas
+
+
+    def sqlalchemy_type(self, column):
+        """ Same type objects the SQLAlchemy inspector gives (the dialect maps the catalog type names) """
+        type_class = getattr(self.dialect, 'ischema_names', {}).get(str(column['data_type']).lower())\
+            or getattr(self.dialect, 'ischema_names', {}).get(str(column['data_type']).upper())
+        if type_class == None: return NullType()
+
+        # Unbounded text lengths come as -1 (SQL Server max) or 0 (Oracle non text columns)
+        length = column['length'] if column['length'] and column['length'] > 0 else None
+        for args in ([length], [column['precision'], column['scale']], []):
+            if args and any(arg == None for arg in args): continue
+            try:
+                return type_class(*args)
+            except TypeError: ...
+        return NullType()
+
+
+    def ddl(self, table, schema = None):
+        entry = self.table(table, schema)
+        if entry == None: return None
+
+        column_defs = []
+        for column in entry['columns']:
+            null_str = 'NOT NULL' if not column['nullable'] else ''
+            column_defs.append(f"  {column['name']} {str(self.sqlalchemy_type(column))} {null_str}".strip())
+
+        for fk in entry['foreign_keys']:
+            l_cols, r_cols = ', '.join(fk['constrained_columns']), ', '.join(fk['referred_columns'])
+            column_defs.append(f"  FOREIGN KEY ({l_cols}) REFERENCES {fk['referred_table']} ({r_cols})")
+
+        return f"CREATE TABLE {table} (\n" + ",\n".join(column_defs) + "\n);"
@@ -28,6 +28,12 @@ class DuckDBCache:
         cnx.execute("DELETE FROM cache WHERE key = ?", [key])
 
 
+    def remove_by_prefix(prefix, value):
+        """Remove the entries which key starts with prefix and holds the given value"""
+        cnx = DuckdbUtil.get_workspace_db_instance()
+        cnx.execute("DELETE FROM cache WHERE starts_with(key, ?) AND value = ?", [prefix, value])
+
+
     def clear(self):
         """Clear all cache entries"""
         DuckdbUtil.get_workspace_db_instance().execute("DELETE FROM cache")
@@ -15,7 +15,11 @@ valid_imports = [
     'from dlt.sources.sql_database import sql_database, sql_table',
     'from os import getenv as env',
     'from src.utils.SQLDatabase import normalize_table_names, converts_field_type',
+    'from src.utils.SQLDatabase import normalize_table_names, converts_field_type, resolve_cursor_columns, incremental_cursor',
     'from sqlalchemy import create_engine',
+    'from src.utils.SQLDatabase import create_run_engine, ExtractionTimer, set_extract_workers',
+    'from src.utils.SQLDatabase import ExtractionTimer, set_extract_workers',
+    'from src.utils.SQLDatabase import partitioned_sql_table',
     'from kafka import KafkaConsumer',
     'from certifi import where',
     'from json import loads',
@@ -35,6 +39,7 @@ valid_imports = [
     'from botocore.client import Config',
     'import fnmatch',
     'from dlt.sources.filesystem import filesystem, FileItemDict',
+    'from dlt.sources.filesystem import filesystem',
     'from src.utils.pipeline_logger_config import setup_dlt_logging, PipelineLogger',
     'from src.utils.logging.pipeline_logger_config import PipelineLogger',
     'from os import getenv as env, environ',
@@ -46,6 +51,9 @@ valid_imports = [
     'from databricks import sql',
     'from dlt.sources.helpers.rest_client.auth import APIKeyAuth',
     'from src.utils.pipeline.PipelinesHelper import PipelineLogger, parse_aggregation',
+    'from src.utils.pipeline.PipelinesHelper import PipelineLogger, parse_aggregation, iter_arrow_batches',
+    'from src.utils.pipeline.PipelinesHelper import PipelineLogger, parse_aggregation, iter_arrow_batches, iter_files_parallel',
+    'from src.utils.pipeline.PipelinesHelper import PipelineLogger, iter_files_parallel, read_file_items',
     'import sqlalchemy.exc',
     'from src.utils.metastore.meta_storage import MetaStore',
     'from src.utils.metastore.meta_storage.MetaStore import crate_or_update_catalog_from_file',
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+MACROS = {
+    '@yearly': '0 0 1 1 *', '@annually': '0 0 1 1 *', '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0', '@daily': '0 0 * * *', '@midnight': '0 0 * * *', '@hourly': '0 * * * *',
+}
+
+MONTH_NAMES = ['jan','feb','mar','apr','may','jun','jul','aug','sep','oct','nov','dec']
+DAY_NAMES = ['sun','mon','tue','wed','thu','fri','sat']
+
+
+class CronExpression:
+    """
+    Standard 5 fields cron expression (minute hour day-of-month month day-of-week),
+    supporting *, lists, ranges, steps, month/day names and the @daily like macros
+    """
+
+    # Searching further than this means the expression never matches (e.g. 30 of February)
+    max_lookahead_days = 366 * 5
+
+    def __init__(self, expression: str):
+        self.expression = str(expression).strip()
+        fields = MACROS.get(self.expression.lower(), self.expression).split()
+        if len(fields) != 5:
+            raise ValueError(f'Invalid cron expression "{expression}", 5 fields are expected')
+
+        self.minutes = CronExpression.parse_field(fields[0], 0, 59)
+        self.hours = CronExpression.parse_field(fields[1], 0, 23)
+        self.days = CronExpression.parse_field(fields[2], 1, 31)
+        self.months = CronExpression.parse_field(fields[3], 1, 12, MONTH_NAMES, 1)
+        # 7 is also Sunday
+        self.week_days = { day % 7 for day in CronExpression.parse_field(fields[4], 0, 7, DAY_NAMES, 0) }
+        self.any_day = fields[2] == '*'
+        self.any_week_day = fields[4] == '*'
+
+
+    @staticmethod
+    def parse_field(field, low, high, names = None, names_offset = 0):
+        values = set()
+        for part in field.lower().split(','):
+            value_range, _, step = part.partition('/')
+            step = int(step) if step else 1
+
+            if value_range == '*':
+                start, end = low, high
+            else:
+                start, _, end = value_range.partition('-')
+                start = CronExpression.parse_value(start, names, names_offset)
+                end = CronExpression.parse_value(end, names, names_offset) if end else (high if step > 1 else start)
+
+            if step < 1 or start < low or end > high or start > end:
+                raise ValueError(f'Invalid cron field "{field}", values go from {low} to {high}')
+            values.update(range(start, end + 1, step))
+        return values
+
+
+    @staticmethod
+    def parse_value(value, names, names_offset):
+        if names and value in names:
+            return names.index(value) + names_offset
+        return int(value)
+
+
+    def day_matches(self, date: datetime):
+        # Cron week days start on Sunday, Python's on Monday
+        in_days, in_week_days = date.day in self.days, (date.weekday() + 1) % 7 in self.week_days
+        if self.any_day or self.any_week_day:
+            return in_days and in_week_days
+        # When both are restricted the day matches either of them (regular cron behaviour)
+        return in_days or in_week_days
+
+
+    def next_after(self, after: datetime) -> datetime:
+        """ First fire time strictly after the given datetime """
+        date = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = after + timedelta(days=CronExpression.max_lookahead_days)
+
+        while date <= limit:
+            if date.month not in self.months:
+                date = (date.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self.day_matches(date):
+                date = (date + timedelta(days=1)).replace(hour=0, minute=0)
+            elif date.hour not in self.hours:
+                date = (date + timedelta(hours=1)).replace(minute=0)
+            elif date.minute not in self.minutes:
+                date += timedelta(minutes=1)
+            else:
+                return date
+
+        raise ValueError(f'Cron expression "{self.expression}" has no upcoming fire time')
@@ -5,9 +5,11 @@ def create_sql_db_secret(namespace, config, sec_managet: SecretManagerType, dben
 
     connection_url = parse_connection_string(dbengine, config)
 
-    sec_managet.vault_instance.secrets.kv.v2.create_or_update_secret(
-        path=f'main/db/{path}',
-        secret={
+    # write_secret drops the cached path and refuses cached reads older than the written version
+    return sec_managet.write_secret(
+        namespace,
+        f'main/db/{path}',
+        {
             'connection_url': connection_url,
             'host': config['host'],
             'port': int(config['port']),
@@ -16,11 +18,19 @@ def create_sql_db_secret(namespace, config, sec_managet: SecretManagerType, dben
             'database': config['dbname'],
             'dbengine': dbengine,
             'dbConnectionParams': config['dbConnectionParams']
-        },
-        mount_point=namespace
+        }
     )
 
 
+# Edge case for OCI when using DSN Descriptor
+ORACLE_DSN_DESCRIPTOR = 'DESCRIPTION=(RETRY_COUNT=20)(RETRY_DELAY=3)(ADDRESS=(PROTOCOL=tcps)'
+
+
+def is_oracle_dsn_descriptor(connection_params):
+    """ The Oracle connection params are a whole DSN descriptor (also used by OracleDBUtil.get_dsn) """
+    return ORACLE_DSN_DESCRIPTOR in (connection_params or '')
+
+
 def parse_connection_string(dbengine, config):
 
     query_string, oracle_dsn_descrptr = '', False
@@ -29,10 +39,8 @@ def parse_connection_string(dbengine, config):
         if dbengine == 'oracle':
             query_string = f'?{config['dbConnectionParams']}'
         
-        # Edge case for OCI when using DSN Descriptor
         if dbengine == 'oracle':
-            dsn_descrptr_str = 'DESCRIPTION=(RETRY_COUNT=20)(RETRY_DELAY=3)(ADDRESS=(PROTOCOL=tcps)'
-            oracle_dsn_descrptr = True if config['dbConnectionParams'].__contains__(dsn_descrptr_str) else False
+            oracle_dsn_descrptr = is_oracle_dsn_descriptor(config['dbConnectionParams'])
 
     if dbengine == 'postgresql':
         connection_url = f'postgresql://{config['username']}:{config['password']}@{config['host']}:{config['port']}/{config['dbname']}{query_string}'
@@ -0,0 +1,286 @@
+import base64
+import json
+import secrets
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from datetime import date, datetime, time as dtime
+from decimal import Decimal
+from os import getenv as env
+
+
+def serialize_value(val):
+    if isinstance(val, memoryview):
+        return base64.b64encode(val.tobytes()).decode('utf-8')
+    if isinstance(val, (bytes, bytearray)):
+        return base64.b64encode(bytes(val)).decode('utf-8')
+    if isinstance(val, (datetime, date, dtime)):
+        return val.isoformat()
+    if isinstance(val, Decimal):
+        return str(val)
+    return val
+
+
+class QueryCursor:
+    """
+    Open result of a workspace SQL query (any destination), rows are fetched on demand through
+    fetch(size) so that only the requested page or stream chunk is in memory
+    """
+
+    def __init__(self, fields: list, fetch, close = None, extra: dict = None, pool_key = None):
+        self.fields = list(fields)
+        self.fetch = fetch
+        self.close_fn = close
+        # Extra response entries (e.g. db_engine)
+        self.extra = extra or {}
+        # Engine (see SQLPoolManager) whose pooled connection the cursor holds while open
+        self.pool_key = pool_key
+        self.rows_read = 0
+        self.exhausted = False
+        # Closed before the end because of a rows cap
+        self.truncated = False
+        self.closed = False
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+
+    def read(self, size) -> list:
+        """ Up to size rows, the cursor is closed once all rows were read """
+        with self.lock:
+            self.last_used = time.monotonic()
+            if self.exhausted: return []
+            rows = [tuple(row) for row in (self.fetch(size) or [])]
+            self.rows_read += len(rows)
+            if len(rows) < size: self.close()
+            return rows
+
+
+    def read_all(self) -> dict:
+        """ Whole result as the former (non paged) responses, for internal callers """
+        rows = []
+        while not self.exhausted:
+            rows.extend(self.read(QueryCursors.chunk_size))
+        return { 'result': rows, 'fields': ','.join(self.fields), **self.extra }
+
+
+    def close(self):
+        self.exhausted = True
+        if self.closed: return
+        self.closed = True
+        try:
+            if self.close_fn: self.close_fn()
+        except Exception as err:
+            print(f'Error while closing query cursor: {str(err)}')
+
+
+class QueryCursors:
+    """
+    Paging and streaming of the /workcpace/sql_query results. A page has at most SQL_QUERY_MAX_ROWS
+    rows, when there are more the cursor stays open server side and the response has a continuation
+    token (next_token) to read the next page. Cursors not read for SQL_QUERY_CURSOR_TTL_SEC are closed,
+    and at most SQL_QUERY_MAX_OPEN_CURSORS_PER_ENGINE are kept per pooled engine so that open results
+    don't take all the connections of the pool.
+    Streaming (ndjson or Arrow IPC) sends up to SQL_QUERY_STREAM_MAX_ROWS rows in chunks
+    """
+
+    max_rows = int(env('SQL_QUERY_MAX_ROWS', 5000))
+    chunk_size = int(env('SQL_QUERY_CHUNK_SIZE', 5000))
+    stream_max_rows = int(env('SQL_QUERY_STREAM_MAX_ROWS', 1000000))
+    ttl = int(env('SQL_QUERY_CURSOR_TTL_SEC', 300))
+    max_open = int(env('SQL_QUERY_MAX_OPEN_CURSORS', 32))
+    max_open_per_engine = int(env('SQL_QUERY_MAX_OPEN_CURSORS_PER_ENGINE', 4))
+
+    STREAM_FORMATS = { 'ndjson': 'application/x-ndjson', 'arrow': 'application/vnd.apache.arrow.stream' }
+
+    # token -> (namespace, QueryCursor), least recently used first
+    cursors: OrderedDict = OrderedDict()
+    lock = threading.Lock()
+
+
+    @staticmethod
+    def respond(cursor: QueryCursor, namespace, page_size = None, stream = None):
+        """ First page (or the stream) of a freshly opened cursor """
+        if stream != None:
+            return QueryCursors.stream(cursor, stream)
+        return QueryCursors.page(cursor, namespace, page_size)
+
+
+    @staticmethod
+    def page(cursor: QueryCursor, namespace, page_size = None, token = None):
+        size = QueryCursors.page_size(page_size)
+        try:
+            rows = cursor.read(size)
+        except Exception:
+            QueryCursors.discard(token, cursor)
+            raise
+
+        if cursor.exhausted:
+            QueryCursors.discard(token, cursor)
+            token = None
+        elif token == None:
+            token = QueryCursors.register(cursor, namespace)
+
+        return {
+            'result': rows, 'fields': ','.join(cursor.fields), **cursor.extra,
+            'next_token': token, 'truncated': token != None, 'offset': cursor.rows_read - len(rows),
+        }
+
+
+    @staticmethod
+    def next_page(token, namespace, page_size = None):
+        with QueryCursors.lock:
+            QueryCursors.close_expired()
+            entry = QueryCursors.cursors.get(token)
+            if entry == None or entry[0] != namespace:
+                return { 'error': True, 'result': 'The query result expired, please run the query again', 'code': 'expired' }
+            QueryCursors.cursors.move_to_end(token)
+
+        return QueryCursors.page(entry[1], namespace, page_size, token)
+
+
+    @staticmethod
+    def page_size(page_size = None):
+        try:
+            size = int(page_size) if page_size else QueryCursors.max_rows
+        except (TypeError, ValueError):
+            size = QueryCursors.max_rows
+        return max(1, min(size, QueryCursors.max_rows))
+
+
+    @staticmethod
+    def register(cursor: QueryCursor, namespace):
+        token = secrets.token_urlsafe(24)
+        with QueryCursors.lock:
+            QueryCursors.close_expired()
+            QueryCursors.cursors[token] = (namespace, cursor)
+            while len(QueryCursors.cursors) > QueryCursors.max_open:
+                _, (_, oldest) = QueryCursors.cursors.popitem(last=False)
+                oldest.close()
+            if cursor.pool_key != None:
+                QueryCursors.close_oldest_of_engine(cursor.pool_key)
+        return token
+
+
+    @staticmethod
+    def engine_cap():
+        """ Open cursors allowed per engine, always below its pool size (pool_size + max_overflow) """
+        from utils.db.SQLPoolManager import SQLPoolManager
+        pool_cap = SQLPoolManager.pool_size + SQLPoolManager.max_overflow - 1
+        return max(1, min(QueryCursors.max_open_per_engine, pool_cap))
+
+
+    @staticmethod
+    def close_oldest_of_engine(pool_key):
+        """ Called with the lock held """
+        of_engine = [token for token, (_, cursor) in QueryCursors.cursors.items() if cursor.pool_key == pool_key]
+        for token in of_engine[:max(0, len(of_engine) - QueryCursors.engine_cap())]:
+            QueryCursors.cursors.pop(token)[1].close()
+
+
+    @staticmethod
+    def discard(token, cursor: QueryCursor):
+        if token != None:
+            with QueryCursors.lock: QueryCursors.cursors.pop(token, None)
+        cursor.close()
+
+
+    @staticmethod
+    def close(token, namespace):
+        """ Cursor no longer needed by the client (e.g. query editor closed) """
+        with QueryCursors.lock:
+            entry = QueryCursors.cursors.get(token)
+            if entry == None or entry[0] != namespace: return False
+            QueryCursors.cursors.pop(token)
+        entry[1].close()
+        return True
+
+
+    @staticmethod
+    def close_expired():
+        """ Called with the lock held """
+        now = time.monotonic()
+        expired = [token for token, (_, cursor) in QueryCursors.cursors.items() if now - cursor.last_used > QueryCursors.ttl]
+        for token in expired:
+            QueryCursors.cursors.pop(token)[1].close()
+
+
+    @staticmethod
+    def stream(cursor: QueryCursor, stream_format):
+        from flask import Response, stream_with_context
+        if stream_format not in QueryCursors.STREAM_FORMATS:
+            cursor.close()
+            return { 'error': True, 'result': f'Unsupported stream format: {stream_format}', 'code': 'err' }
+
+        chunks = QueryCursors.ndjson_chunks(cursor) if stream_format == 'ndjson' else QueryCursors.arrow_chunks(cursor)
+        return Response(stream_with_context(chunks), mimetype=QueryCursors.STREAM_FORMATS[stream_format])
+
+
+    @staticmethod
+    def rows(cursor: QueryCursor):
+        """ Row chunks up to the stream cap, the cursor is closed also when the client goes away """
+        try:
+            remaining = QueryCursors.stream_max_rows
+            while remaining > 0 and not cursor.exhausted:
+                rows = cursor.read(min(QueryCursors.chunk_size, remaining))
+                remaining -= len(rows)
+                if rows: yield rows
+            cursor.truncated = not cursor.exhausted
+        finally:
+            cursor.close()
+
+
+    @staticmethod
+    def ndjson_chunks(cursor: QueryCursor):
+        """ First line has the fields, each next line is a row and the last one tells if the cap was hit """
+        yield json.dumps({ 'fields': cursor.fields, **cursor.extra }) + '\n'
+        try:
+            for rows in QueryCursors.rows(cursor):
+                yield ''.join(json.dumps([serialize_value(val) for val in row], default=str) + '\n' for row in rows)
+            yield json.dumps({ 'end': True, 'rows': cursor.rows_read, 'truncated': cursor.truncated }) + '\n'
+        except Exception as err:
+            traceback.print_exc()
+            yield json.dumps({ 'error': True, 'result': str(err) }) + '\n'
+
+
+    @staticmethod
+    def arrow_chunks(cursor: QueryCursor):
+        import io
+        import pyarrow as pa
+
+        def to_arrow_array(values):
+            try:
+                return pa.array(values)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                return pa.array([None if value is None else str(serialize_value(value)) for value in values])
+
+        sink, writer, schema = io.BytesIO(), None, None
+        try:
+            for rows in QueryCursors.rows(cursor):
+                columns = list(zip(*rows))
+                batch = pa.RecordBatch.from_arrays([to_arrow_array(list(values)) for values in columns], names=cursor.fields)
+                if writer == None:
+                    schema = batch.schema
+                    writer = pa.ipc.new_stream(sink, schema)
+                elif batch.schema != schema:
+                    # Types are inferred per chunk, a different one (e.g. all nulls) is cast to the stream schema
+                    batch = batch.cast(schema)
+                writer.write_batch(batch)
+                yield QueryCursors.take(sink)
+        except Exception as err:
+            # The stream ends with the rows sent so far
+            print(f'Error while streaming query result: {str(err)}')
+            traceback.print_exc()
+
+        if writer == None:
+            writer = pa.ipc.new_stream(sink, pa.schema([(field, pa.null()) for field in cursor.fields]))
+        writer.close()
+        yield QueryCursors.take(sink)
+
+
+    @staticmethod
+    def take(sink):
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
@@ -0,0 +1,191 @@
+import threading
+import time
+from collections import OrderedDict
+from os import getenv as env
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool, NullPool
+
+
+class TimedQueuePool(QueuePool):
+    """ QueuePool recording how long each checkout waited for a connection """
+
+    # Set per engine through a subclass (see SQLPoolManager.pool_class) so it survives pool recreation
+    stats = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if self.stats != None: self.stats.record_wait(time.perf_counter() - started)
+
+
+class PoolStats:
+
+    def __init__(self):
+        self.checkouts = 0
+        self.total_wait = 0
+        self.max_wait = 0
+        self.lock = threading.Lock()
+
+
+    def record_wait(self, wait):
+        with self.lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+
+class PooledEngine:
+
+    def __init__(self, engine, connection_url, dbengine, extra = None):
+        self.engine = engine
+        self.connection_url = connection_url
+        self.dbengine = dbengine
+        # Value kept along with the engine (e.g. database name or Oracle owner)
+        self.extra = extra
+        self.created_at = time.monotonic()
+        self.last_used = time.monotonic()
+
+
+class SQLPoolManager:
+    """
+    Single place where the application SQLAlchemy engines (source databases listing, SQL destinations
+    queries, connection tests) are created and kept. Pool settings depend on the engine type, engines
+    are evicted when idle for SQL_POOL_IDLE_SEC or when more than SQL_POOL_MAX_ENGINES are open
+    (least recently used first), and disposed when their secret changes
+    """
+
+    pool_size = int(env('SQL_POOL_SIZE', 5))
+    max_overflow = int(env('SQL_POOL_MAX_OVERFLOW', 10))
+    pool_timeout = int(env('SQL_POOL_TIMEOUT_SEC', 30))
+    max_engines = int(env('SQL_POOL_MAX_ENGINES', 32))
+    idle_timeout = int(env('SQL_POOL_IDLE_SEC', 1800))
+
+    # Connections are recycled before the servers usually drop idle ones (e.g. MySQL wait_timeout)
+    RECYCLE_SEC = { 'mysql': 3600, 'postgresql': 1800, 'mssql': 1800, 'oracle': 1800 }
+
+    # (namespace, connection_name, kind) -> PooledEngine, most recently used last
+    engines: OrderedDict = OrderedDict()
+    stats: dict[tuple, PoolStats] = {}
+    evictions = 0
+    lock = threading.RLock()
+
+
+    @staticmethod
+    def get(key) -> PooledEngine:
+        """ Already open engine of key, None if there's none """
+        with SQLPoolManager.lock:
+            pooled = SQLPoolManager.engines.get(key)
+            if pooled != None:
+                pooled.last_used = time.monotonic()
+                SQLPoolManager.engines.move_to_end(key)
+            return pooled
+
+
+    @staticmethod
+    def engine(key, connection_url, dbengine = None, extra = None, creator = None):
+        """
+        Engine of key, a new one replaces it when the connection URL changed (e.g. rotated password).
+        With creator the connections come from a driver pool (e.g. oracledb) and the engine doesn't pool them
+        """
+        with SQLPoolManager.lock:
+            SQLPoolManager.evict_idle()
+            pooled = SQLPoolManager.get(key)
+            if pooled != None and pooled.connection_url == connection_url:
+                pooled.extra = extra if extra != None else pooled.extra
+                return pooled.engine
+
+            if pooled != None: SQLPoolManager.remove(key)
+
+            dbengine = dbengine or str(connection_url).split(':')[0].split('+')[0]
+            stats = SQLPoolManager.stats.setdefault(key, PoolStats())
+            if creator != None:
+                engine = create_engine(f'{make_url(connection_url).drivername}://', creator=creator, poolclass=NullPool)
+            else:
+                engine = create_engine(
+                    connection_url,
+                    poolclass=SQLPoolManager.pool_class(stats),
+                    pool_size=SQLPoolManager.pool_size,
+                    max_overflow=SQLPoolManager.max_overflow,
+                    pool_timeout=SQLPoolManager.pool_timeout,
+                    pool_recycle=SQLPoolManager.RECYCLE_SEC.get(dbengine, 1800),
+                    pool_pre_ping=True,
+                )
+            SQLPoolManager.engines[key] = PooledEngine(engine, connection_url, dbengine, extra)
+
+            while len(SQLPoolManager.engines) > SQLPoolManager.max_engines:
+                SQLPoolManager.remove(next(iter(SQLPoolManager.engines)))
+                SQLPoolManager.evictions += 1
+
+            return engine
+
+
+    @staticmethod
+    def pool_class(stats: PoolStats):
+        return type('TimedQueuePool', (TimedQueuePool,), { 'stats': stats })
+
+
+    @staticmethod
+    def evict_idle():
+        now = time.monotonic()
+        with SQLPoolManager.lock:
+            idle = [key for key, pooled in SQLPoolManager.engines.items() if now - pooled.last_used > SQLPoolManager.idle_timeout]
+            for key in idle:
+                SQLPoolManager.remove(key)
+                SQLPoolManager.evictions += 1
+
+
+    @staticmethod
+    def remove(key):
+        with SQLPoolManager.lock:
+            pooled = SQLPoolManager.engines.pop(key, None)
+            SQLPoolManager.stats.pop(key, None)
+        if pooled != None:
+            # Checked out connections are closed when returned to the disposed pool
+            pooled.engine.dispose()
+
+
+    @staticmethod
+    def invalidate(namespace, connection_name = None):
+        """ Disposes the engines of a connection (all kinds), or of the whole namespace """
+        with SQLPoolManager.lock:
+            keys = [
+                key for key in SQLPoolManager.engines.keys()
+                if key[0] == namespace and (connection_name == None or key[1] == connection_name)
+            ]
+            for key in keys: SQLPoolManager.remove(key)
+
+
+    @staticmethod
+    def get_metrics():
+        with SQLPoolManager.lock:
+            now, pools = time.monotonic(), []
+            for key, pooled in SQLPoolManager.engines.items():
+                pool, stats = pooled.engine.pool, SQLPoolManager.stats.get(key) or PoolStats()
+                # Engines over a driver pool (NullPool) have their usage in that pool metrics
+                is_queue_pool = isinstance(pool, QueuePool)
+                pools.append({
+                    'namespace': key[0], 'connection_name': key[1], 'kind': key[2], 'dbengine': pooled.dbengine,
+                    'size': pool.size() if is_queue_pool else None,
+                    'checked_out': pool.checkedout() if is_queue_pool else None,
+                    'overflow': pool.overflow() if is_queue_pool else None,
+                    'checkouts': stats.checkouts,
+                    'avg_wait_ms': round(stats.total_wait / stats.checkouts * 1000, 3) if stats.checkouts else 0,
+                    'max_wait_ms': round(stats.max_wait * 1000, 3),
+                    'idle_sec': round(now - pooled.last_used, 1),
+                })
+            return {
+                'engines': len(pools), 'max_engines': SQLPoolManager.max_engines, 'evictions': SQLPoolManager.evictions,
+                'pools': pools, 'oracle_pools': SQLPoolManager.oracle_metrics(),
+            }
+
+
+    @staticmethod
+    def oracle_metrics():
+        try:
+            from utils.OracleDBUtil import OracleDBUtil
+            return OracleDBUtil.get_metrics()
+        except ImportError:
+            return []
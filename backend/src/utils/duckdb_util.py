@@ -9,6 +9,7 @@ class DuckdbUtil:
     logdbinstance = None
     mstoredbinstance = None
     workspacedb_path = None
+    ppline_schedule_migrated = False
 
     @staticmethod
     def get_tables(database = None, where = None):
@@ -119,10 +120,70 @@ class DuckdbUtil:
             namespace VARCHAR,\
             last_run TIMESTAMP,\
             schedule_settings JSON,  \
-            is_paused VARCHAR\
+            is_paused VARCHAR,\
+            next_run TIMESTAMP,\
+            priority INTEGER DEFAULT 0\
             )"
         cnx.execute(query)
 
+
+    @staticmethod
+    def migrate_ppline_schedule_table():
+        """ Adds the next_run (persistent scheduler) and priority columns to workspaces created before them """
+        if DuckdbUtil.ppline_schedule_migrated: return
+        if DuckdbUtil.workspace_table_exists('ppline_schedule') == False:
+            DuckdbUtil.create_ppline_schedule_table()
+
+        cnx = DuckdbUtil.get_workspace_db_instance()
+        cnx.execute('ALTER TABLE ppline_schedule ADD COLUMN IF NOT EXISTS next_run TIMESTAMP')
+        cnx.execute('ALTER TABLE ppline_schedule ADD COLUMN IF NOT EXISTS priority INTEGER DEFAULT 0')
+        DuckdbUtil.ppline_schedule_migrated = True
+
+    @staticmethod
+    def create_ppline_limits_table():
+        """ Per namespace (ppline_name = '*') and per pipeline run limits, see utils.pipeline.RunLimits """
+        cnx = DuckdbUtil.get_workspace_db_instance()
+        query = "CREATE TABLE IF NOT EXISTS ppline_limits (\
+            namespace VARCHAR,\
+            ppline_name VARCHAR,\
+            memory_mb INTEGER,\
+            cpu_sec INTEGER,\
+            wall_sec INTEGER,\
+            PRIMARY KEY (namespace, ppline_name))"
+        cnx.execute(query)
+
+
+    @staticmethod
+    def create_db_metadata_cache_table():
+        """ Source databases table listings, see utils.DBMetadataCache """
+        cnx = DuckdbUtil.get_workspace_db_instance()
+        query = "CREATE TABLE IF NOT EXISTS db_metadata_cache (\
+            namespace VARCHAR,\
+            connection_name VARCHAR,\
+            schema_name VARCHAR,\
+            tables JSON,\
+            fetched_at TIMESTAMP,\
+            last_access TIMESTAMP,\
+            hits INTEGER DEFAULT 0,\
+            PRIMARY KEY (namespace, connection_name, schema_name))"
+        cnx.execute(query)
+
+
+    @staticmethod
+    def create_bucket_schema_cache_table():
+        """ Inferred schemas of bucket files, see utils.BucketSchemaCache """
+        cnx = DuckdbUtil.get_workspace_db_instance()
+        query = "CREATE TABLE IF NOT EXISTS bucket_schema_cache (\
+            bucket_name VARCHAR,\
+            file_key VARCHAR,\
+            etag VARCHAR,\
+            file_schema JSON,\
+            fetched_at TIMESTAMP,\
+            last_access TIMESTAMP,\
+            PRIMARY KEY (bucket_name, file_key))"
+        cnx.execute(query)
+
+
     @staticmethod
     def create_pipeline_logs_table():
         """
@@ -10,6 +10,7 @@ class DuckDBLogStore:
         DuckdbUtil.initialize_logging_tables()
 
 
+    @staticmethod
     def _get_conn(): return DuckdbUtil.get_log_db_instance()
 
 
@@ -130,23 +131,56 @@ class DuckDBLogStore:
     def get_performance_metrics(self):
         """
         Perspective: Resource Consumption.
-        Calculates throughput (rows per second) based on extra_data.
+        Calculates throughput (rows per second) and the runs resource usage
+        (peak RSS, CPU seconds and I/O bytes sampled by ResourceMonitor) based on extra_data.
         """
         query = """
             SELECT 
                 pipeline_id,
+                count(DISTINCT execution_id) as runs,
                 avg(CAST(extra_data->>'$.duration_sec' AS FLOAT)) as avg_duration,
                 sum(CAST(extra_data->>'$.rows' AS INTEGER)) as total_rows,
                 (sum(CAST(extra_data->>'$.rows' AS INTEGER)) / 
-                 NULLIF(sum(CAST(extra_data->>'$.duration_sec' AS FLOAT)), 0)) as rows_per_sec
+                 NULLIF(sum(CASE WHEN extra_data->>'$.rows' IS NOT NULL
+                            THEN CAST(extra_data->>'$.duration_sec' AS FLOAT) END), 0)) as rows_per_sec,
+                max(CAST(extra_data->>'$.peak_rss_mb' AS FLOAT)) as max_peak_rss_mb,
+                avg(CAST(extra_data->>'$.peak_rss_mb' AS FLOAT)) as avg_peak_rss_mb,
+                sum(CAST(extra_data->>'$.cpu_sec' AS FLOAT)) as total_cpu_sec,
+                avg(CAST(extra_data->>'$.cpu_sec' AS FLOAT)) as avg_cpu_sec,
+                sum(CAST(extra_data->>'$.read_bytes' AS BIGINT)) as total_read_bytes,
+                sum(CAST(extra_data->>'$.write_bytes' AS BIGINT)) as total_write_bytes
             FROM pipeline_logs
-            WHERE extra_data->>'$.rows' IS NOT NULL
+            WHERE extra_data->>'$.rows' IS NOT NULL OR extra_data->>'$.wall_sec' IS NOT NULL
             GROUP BY 1
-            ORDER BY rows_per_sec DESC
+            ORDER BY total_cpu_sec DESC NULLS LAST
         """
         return self._get_conn().execute(query).df()
 
 
+    def get_run_resources(self, execution_id):
+        """
+        Perspective: Resource Consumption of a single run (keyed by execution_id).
+        """
+        query = """
+            SELECT 
+                timestamp,
+                namespace,
+                pipeline_id,
+                execution_id,
+                CAST(extra_data->>'$.wall_sec' AS FLOAT) as wall_sec,
+                CAST(extra_data->>'$.duration_sec' AS FLOAT) as duration_sec,
+                CAST(extra_data->>'$.peak_rss_mb' AS FLOAT) as peak_rss_mb,
+                CAST(extra_data->>'$.cpu_sec' AS FLOAT) as cpu_sec,
+                CAST(extra_data->>'$.read_bytes' AS BIGINT) as read_bytes,
+                CAST(extra_data->>'$.write_bytes' AS BIGINT) as write_bytes,
+                CAST(extra_data->>'$.rows' AS BIGINT) as rows
+            FROM pipeline_logs
+            WHERE execution_id = ? AND extra_data->>'$.wall_sec' IS NOT NULL
+            ORDER BY timestamp DESC
+        """
+        return self._get_conn().execute(query, [execution_id]).df()
+
+
     def get_execution_timeline(self, execution_id):
         """
         Perspective: Flow & Sequence.
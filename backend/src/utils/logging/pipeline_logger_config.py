@@ -8,6 +8,7 @@ import logging
 import json
 import warnings
 import os
+from utils.pipeline.RunEvents import RunEvents
     
 
 class PipelineLogger:
@@ -19,14 +20,22 @@ class PipelineLogger:
         os.environ["PYTHONWARNINGS"] = "ignore::DeprecationWarning:pkg_resources"
 
     def info(self, description, extra=None):
+        self.emit_stage(extra)
         print(f'{description} |+| {json.dumps(extra)}')
 
     def error(self, description, extra=None, exc_info=None):
+        RunEvents.emit('error', message=description, stage=(extra or {}).get('stage'))
         print(f'ERROR: {description} |+| {json.dumps(extra)}')
 
     def debug(self, description, extra=None):
+        self.emit_stage(extra)
         print(f'DEBUG: {description} |+| {json.dumps(extra)}')
 
+    def emit_stage(self, extra):
+        """ Logs flagged with a stage are also sent as run event so the application can time each stage """
+        if extra and extra.get('stage'):
+            RunEvents.emit('stage', stage=extra['stage'])
+
     def setup_dlt_logging(self):
 
         dlt_logger = logging.getLogger('dlt')
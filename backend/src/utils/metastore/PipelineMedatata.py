@@ -93,6 +93,30 @@ class PipelineMedatata:
             return err
 
 
+    @staticmethod
+    def get_pipeline_secret_names(pipeline: str, namespace: str, db_path: str = None) -> list:
+        """ Source, destination and referenced secret names used by the pipeline runs """
+        try:
+            import ast
+            con = PipelineMedatata._get_duckdb_conn(False, db_path)
+            rows = con.execute("""
+                SELECT DISTINCT source_secret_name, dest_secret_name, referenced_secrets
+                FROM pipeline_metadata WHERE pipeline = ? AND namespace = ?
+            """, [pipeline, namespace]).fetchall()
+
+            names = []
+            for source_secret, dest_secret, referenced_secrets in rows:
+                names.extend([source_secret, dest_secret])
+                # Stored as the str() of the list
+                if referenced_secrets and str(referenced_secrets).startswith('['):
+                    names.extend(ast.literal_eval(referenced_secrets))
+            return [name for name in dict.fromkeys(names) if name]
+
+        except Exception as err:
+            print(f'Error while loading the pipeline secret names: {err}')
+            return []
+
+
     @staticmethod
     def get_domain_pipelines(namespace: str = None, db_path: str = None):
         try:
@@ -2,6 +2,7 @@ from utils.db.lancedb import LanceConnectionFactory
 from utils.metastore.DataCatalog import DataCatalog
 from utils.metastore.PipelineMedatata import PipelineMedatata
 from utils.metastore.BI.DashboardConfig import DashboardConfig
+from utils.pipeline.RunEvents import RunEvents
 
 class MetaStore:
     """ Centralize the access to all metastore capabilities (e.g. DataCatalog) """
@@ -19,6 +20,7 @@ class MetaStore:
         print(load_info, flush=True) # Print pipeline completion details for main process and UI
         print('RUN_SUCCESSFULLY', flush=True) # Notify the main process about pipeline run completion
         print(f'Analyzing/Generating the data catalog for pipeline with transaction_id {getattr(pipeline._last_trace, 'transaction_id')}')
+        RunEvents.emit('stage', stage='data_catalog')
         DataCatalog.persist_catalog(table_source, dbs_path, pipeline, load_info, table_source, additionals)
 
 
@@ -37,6 +39,11 @@ class MetaStore:
         return PipelineMedatata.persist_metadata(namespace, pipeline, details, dataset_name, short_query)
 
 
+    @staticmethod
+    def get_pipeline_secret_names(namespace: str, pipeline: str):
+        return PipelineMedatata.get_pipeline_secret_names(pipeline, namespace)
+
+
     @staticmethod
     def save_analytics_chart(namespace, config_details, context, chart_name, data_source, chart_id):
         try:
@@ -0,0 +1,126 @@
+import codecs
+import os
+import selectors
+import time
+from collections import deque
+from os import getenv as env
+from utils.pipeline.RunEvents import RunEventReader
+
+
+class LogPump:
+    """
+    Non-blocking reader for the pipeline sub-process output. stdout and stderr are drained
+    together through selectors so a full stderr PIPE never blocks the child process
+    """
+
+    read_size = 64 * 1024
+
+    def __init__(self, process, on_idle = None, timeout = 0.1, on_event = None):
+        self.process = process
+        self.on_idle = on_idle
+        self.on_event = on_event
+        self.timeout = timeout
+        self.pending = deque()
+        self.stderr_lines = []
+        self.buffers, self.decoders = {}, {}
+        self.event_reader = RunEventReader()
+        self.selector = selectors.DefaultSelector()
+
+        for name, stream in (('stdout', process.stdout), ('stderr', process.stderr)):
+            if stream is None: continue
+            self.selector.register(stream.fileno(), selectors.EVENT_READ, name)
+            self.buffers[name] = ''
+            self.decoders[name] = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+        # Structured run events channel (see utils.pipeline.RunEvents)
+        events = getattr(process, 'events', None)
+        if events is not None:
+            self.selector.register(events.fileno(), selectors.EVENT_READ, 'events')
+
+
+    def lines(self):
+        """ Yields stdout lines as soon as they're available and stops at EOF """
+        while True:
+            while self.pending:
+                yield self.pending.popleft()
+
+            if not self.selector.get_map(): break
+
+            for key, _ in self.selector.select(self.timeout):
+                self._read(key)
+
+            if self.on_idle: self.on_idle()
+
+
+    def drain(self):
+        """ Reads whatever is left until EOF, returns the remaining stdout lines """
+        remaining = list(self.lines())
+        self.selector.close()
+        return remaining
+
+
+    def stderr_text(self):
+        return '\n'.join(self.stderr_lines)
+
+
+    def _read(self, key):
+        name = key.data
+        chunk = os.read(key.fd, LogPump.read_size)
+
+        if name == 'events':
+            if not chunk: self.selector.unregister(key.fd)
+            for event in self.event_reader.feed(chunk):
+                if self.on_event: self.on_event(event)
+            return
+
+        if not chunk:
+            self.selector.unregister(key.fd)
+            text = self.buffers[name] + self.decoders[name].decode(b'', final=True)
+            self.buffers[name] = ''
+            if text: self._push(name, [text])
+            return
+
+        text = self.buffers[name] + self.decoders[name].decode(chunk)
+        *lines, self.buffers[name] = text.split('\n')
+        self._push(name, lines)
+
+
+    def _push(self, name, lines):
+        if name == 'stderr':
+            self.stderr_lines.extend(lines)
+        else:
+            self.pending.extend(lines)
+
+
+class TraceBatcher:
+    """
+    Groups pipeline trace lines so the UI socket gets at most one emit per
+    interval instead of one emit per printed line
+    """
+
+    interval = int(env('PPLINE_TRACE_EMIT_INTERVAL_MS', 100)) / 1000
+    max_lines = int(env('PPLINE_TRACE_EMIT_MAX_LINES', 200))
+
+    def __init__(self, context, job = False):
+        self.context = context
+        self.job = job
+        self.lines = []
+        self.last_emit = 0
+
+
+    def add(self, line):
+        self.lines.append(line)
+        if len(self.lines) >= TraceBatcher.max_lines: self.flush()
+        else: self.tick()
+
+
+    def tick(self):
+        if self.lines and (time.monotonic() - self.last_emit) >= TraceBatcher.interval:
+            self.flush()
+
+
+    def flush(self):
+        lines, self.lines = self.lines, []
+        if not lines or not self.context: return
+        self.context.emit_ppline_trace('\n'.join(lines), job=self.job)
+        self.last_emit = time.monotonic()
@@ -43,7 +43,107 @@ def parse_aggregation(df: DataFrame, aggregation_list: list) -> DataFrame:
     return df
 
 
+def iter_arrow_batches(df, batch_size: int = None):
+    """
+    Arrow tables of the transformed LazyFrame of at most batch_size (PPLINE_TRANSFORM_BATCH_ROWS) rows,
+    produced by the streaming engine as they're yielded so that only a batch is in memory at a time.
+    PPLINE_STREAMING_TRANSFORM=false (or Polars without collect_batches) collects the whole file first
+    """
+    batch_size = int(batch_size or env('PPLINE_TRANSFORM_BATCH_ROWS', 10_000))
+    streaming = str(env('PPLINE_STREAMING_TRANSFORM', 'true')).lower() == 'true'
+
+    if streaming and hasattr(df, 'collect_batches'):
+        batches = df.collect_batches(chunk_size=batch_size, engine='streaming')
+    else:
+        batches = [df.collect(engine='streaming')]
+
+    for batch in batches:
+        # Engine chunks may be bigger than the requested size
+        for chunk in batch.iter_slices(n_rows=batch_size):
+            if len(chunk) > 0: yield chunk.to_arrow()
+
+
+def iter_files_parallel(files, read_file, concurrency: int = None, prefetch: int = None, ordered: bool = None):
+    """
+    (file, items) of each file where items is what read_file(file) yields. With concurrency threads
+    (PPLINE_FILE_CONCURRENCY) and/or prefetch (PPLINE_FILE_PREFETCH) the upcoming files are read while
+    the current one is loaded, each file items are then kept in memory until yielded. Files come in
+    the listing order, or as soon as they're read when ordered (PPLINE_FILE_ORDERED) is False
+    """
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+    concurrency = max(1, int(concurrency if concurrency != None else env('PPLINE_FILE_CONCURRENCY', 1)))
+    prefetch = max(0, int(prefetch if prefetch != None else env('PPLINE_FILE_PREFETCH', 0)))
+    ordered = ordered if ordered != None else str(env('PPLINE_FILE_ORDERED', 'true')).lower() == 'true'
+
+    if concurrency == 1 and prefetch == 0:
+        for file in files: yield file, read_file(file)
+        return
+
+    files, pending = iter(files), deque()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='ppline-file')
+
+    def submit_next():
+        file = next(files, None)
+        if file == None: return False
+        pending.append((file, executor.submit(lambda: list(read_file(file)))))
+        return True
+
+    try:
+        # Files being read plus the ones read ahead
+        while len(pending) < concurrency + prefetch and submit_next(): ...
+
+        while len(pending) > 0:
+            if ordered:
+                file, future = pending.popleft()
+            else:
+                wait([future for _, future in pending], return_when=FIRST_COMPLETED)
+                file, future = next((entry for entry in pending if entry[1].done()))
+                pending.remove((file, future))
+
+            items = future.result()
+            submit_next()
+            yield file, items
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+
+def read_file_items(file, file_type: str, chunksize: int = 10_000):
+    """
+    Rows (lists of dicts of at most chunksize rows) of a filesystem file item, through its public open()
+    like the dlt read_csv/read_jsonl/read_parquet transformers do, so that a single file can be read
+    on its own (e.g. in iter_files_parallel threads)
+    """
+    if file_type == 'csv':
+        import pandas as pd
+        with file.open() as file_obj:
+            for df in pd.read_csv(file_obj, header='infer', chunksize=chunksize):
+                yield df.to_dict(orient='records')
+
+    elif file_type in ('jsonl', 'ndjson'):
+        import json
+        from itertools import islice
+        with file.open() as file_obj:
+            while True:
+                lines = list(islice(file_obj, chunksize))
+                if not lines: break
+                rows = [json.loads(line) for line in lines if line.strip()]
+                if rows: yield rows
+
+    elif file_type == 'parquet':
+        import pyarrow.parquet as pq
+        with file.open() as file_obj:
+            for batch in pq.ParquetFile(file_obj).iter_batches(batch_size=chunksize):
+                yield batch.to_pylist()
+
+    else:
+        raise ValueError(f'Unsupported file type {file_type}, it should be csv, jsonl or parquet')
+
+
 from utils.metastore.meta_storage import MetaStore
+from utils.pipeline.RunEvents import RunEvents
 
 class PipelineHelper:
 
@@ -70,9 +170,11 @@ class PipelineHelper:
         perf_optmzd = additionals.get('perf_optmzd', False)
         
         try:
+            RunEvents.emit('loaded', **PipelineHelper.load_counts(pipeline, info))
             MetaStore.persist_catalog(catalog_table_path, src_path, pipeline, info, additionals)
 
             if perf_optmzd == 'yes':
+                RunEvents.emit('stage', stage='analytics_storage')
                 table_name = pipeline.pipeline_name.split('_at_', 1)[1]
                 con = duckdb.connect(dest.config_params['credentials'])
                 big_table = PipelineHelper.prefix_and_suffix_table(table_name)
@@ -84,9 +186,26 @@ class PipelineHelper:
                     PipelineHelper._create_analytics_storage(con, big_query, big_table, db_name, meta, tbls)
 
         finally:
+            RunEvents.emit('finished')
             sys.exit(0) # Gracefully terminates the sub-process
 
 
+    @staticmethod
+    def load_counts(pipeline=None, info=None):
+        """ Rows (normalize step) and bytes (loaded jobs) of the run for the run events """
+        counts = { 'rows': None, 'bytes': None, 'loads_ids': getattr(info, 'loads_ids', None) }
+        try:
+            row_counts = pipeline.last_trace.last_normalize_info.row_counts
+            counts['rows'] = sum(v for k, v in row_counts.items() if not k.startswith('_dlt'))
+        except Exception: ...
+        try:
+            counts['bytes'] = sum(
+                job.file_size for package in info.load_packages for job in package.jobs.get('completed_jobs', [])
+            )
+        except Exception: ...
+        return counts
+
+
     @staticmethod
     def _create_analytics_storage(con, ready_query, big_table, db_name, meta, tbls):
 
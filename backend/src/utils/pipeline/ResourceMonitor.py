@@ -0,0 +1,119 @@
+import os
+import time
+from os import getenv as env
+
+
+class ResourceMonitor:
+    """
+    /proc based resource accounting of a pipeline run, the process and its children are
+    sampled while the output is pumped (peak RSS, CPU seconds and storage I/O bytes).
+    On platforms without /proc the summary only has the wall time
+    """
+
+    interval = int(env('PPLINE_RESOURCE_SAMPLE_MS', 500)) / 1000
+    clock_ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.started_at = time.monotonic()
+        self.last_sample = 0
+        self.peak_rss_kb = 0
+        # pid -> (cpu seconds, read bytes, write bytes), counters are cumulative per process
+        self.usage = {}
+
+
+    def sample(self, force = False):
+        if not force and (time.monotonic() - self.last_sample) < ResourceMonitor.interval: return
+        self.last_sample = time.monotonic()
+
+        tree_rss_kb = 0
+        for pid in self.process_tree():
+            status = ResourceMonitor.read_status(pid)
+            if status == None: continue
+            tree_rss_kb += status.get('VmRSS', 0)
+            self.peak_rss_kb = max(self.peak_rss_kb, status.get('VmHWM', 0))
+
+            cpu, (read_bytes, write_bytes) = ResourceMonitor.read_cpu(pid), ResourceMonitor.read_io(pid)
+            prev_cpu, prev_read, prev_write = self.usage.get(pid, (0, 0, 0))
+            self.usage[pid] = (max(cpu, prev_cpu), max(read_bytes, prev_read), max(write_bytes, prev_write))
+
+        self.peak_rss_kb = max(self.peak_rss_kb, tree_rss_kb)
+
+
+    def final_sample(self):
+        """
+        Last sample once the process exited, it's not reaped (WNOWAIT) so that its /proc entry still has
+        the final CPU and I/O counters, the caller's wait() reaps it. Runs ending before the first idle
+        sample would otherwise have no resource metrics
+        """
+        try:
+            os.waitid(os.P_PID, self.pid, os.WEXITED | os.WNOWAIT)
+        except (AttributeError, OSError):
+            # Not a child of this process (e.g. warm worker fork) or no waitid on the platform
+            ...
+        self.sample(force=True)
+
+
+    def process_cpu_sec(self):
+        """ CPU seconds of the run process alone (RLIMIT_CPU is per process), None when never sampled """
+        usage = self.usage.get(self.pid)
+        return usage[0] if usage else None
+
+
+    def process_tree(self):
+        pids, pending = [], [self.pid]
+        while pending:
+            pid = pending.pop()
+            pids.append(pid)
+            try:
+                for task in os.listdir(f'/proc/{pid}/task'):
+                    with open(f'/proc/{pid}/task/{task}/children') as children:
+                        pending.extend(int(child) for child in children.read().split())
+            except OSError: ...
+        return pids
+
+
+    @staticmethod
+    def read_status(pid):
+        try:
+            with open(f'/proc/{pid}/status') as status:
+                return {
+                    line.split(':')[0]: int(line.split()[1])
+                    for line in status if line.startswith(('VmRSS:', 'VmHWM:'))
+                }
+        except (OSError, ValueError, IndexError):
+            return None
+
+
+    @staticmethod
+    def read_cpu(pid):
+        """ utime + stime in seconds, children are sampled on their own so cutime/cstime are left out """
+        try:
+            with open(f'/proc/{pid}/stat') as stat:
+                fields = stat.read().rsplit(')', 1)[1].split()
+            return sum(int(value) for value in fields[11:13]) / ResourceMonitor.clock_ticks
+        except (OSError, ValueError, IndexError):
+            return 0
+
+
+    @staticmethod
+    def read_io(pid):
+        try:
+            with open(f'/proc/{pid}/io') as io:
+                counters = dict(line.split(': ') for line in io.read().splitlines())
+            return int(counters.get('read_bytes', 0)), int(counters.get('write_bytes', 0))
+        except (OSError, ValueError):
+            return 0, 0
+
+
+    def summary(self):
+        """ Goes to the pipeline logs extra_data (see DuckDBLogStore.get_performance_metrics) """
+        usage = list(self.usage.values())
+        return {
+            'wall_sec': round(time.monotonic() - self.started_at, 3),
+            # An exited process has no memory figures in /proc, unknown when it was only sampled then
+            'peak_rss_mb': round(self.peak_rss_kb / 1024, 2) if self.peak_rss_kb else None,
+            'cpu_sec': round(sum(cpu for cpu, _, _ in usage), 3) if usage else None,
+            'read_bytes': sum(read for _, read, _ in usage) if usage else None,
+            'write_bytes': sum(write for _, _, write in usage) if usage else None,
+        }
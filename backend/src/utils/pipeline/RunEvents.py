@@ -0,0 +1,102 @@
+"""
+Structured run events between the generated pipeline (child process) and the application.
+
+Events are JSON objects written as length prefixed frames (4 bytes big endian size + payload)
+to the file descriptor passed through PPLINE_EVENT_FD, they're typed (stage, error, loaded,
+finished) so the application doesn't need to scrape the printed logs to know the run progress.
+"""
+import json
+import os
+import struct
+import time
+
+FRAME_HEADER = struct.Struct('>I')
+
+
+class RunEvents:
+    """ Child side (pipeline run), does nothing when the run has no event channel """
+
+    fd = int(os.getenv('PPLINE_EVENT_FD')) if str(os.getenv('PPLINE_EVENT_FD', '')).isdigit() else None
+
+    @staticmethod
+    def emit(event, **data):
+        if RunEvents.fd == None: return
+        try:
+            payload = json.dumps({ 'event': event, 'ts': time.time(), **data }, default=str).encode()
+            os.write(RunEvents.fd, FRAME_HEADER.pack(len(payload)) + payload)
+        except OSError:
+            # Application side is gone, keep the pipeline running without events
+            RunEvents.fd = None
+
+
+class RunEventReader:
+    """ Application side decoder of the event frames """
+
+    def __init__(self):
+        self.buffer = b''
+
+
+    def feed(self, chunk: bytes):
+        self.buffer += chunk
+        events = []
+        while len(self.buffer) >= FRAME_HEADER.size:
+            size, = FRAME_HEADER.unpack_from(self.buffer)
+            if len(self.buffer) < FRAME_HEADER.size + size: break
+            payload = self.buffer[FRAME_HEADER.size:FRAME_HEADER.size + size]
+            self.buffer = self.buffer[FRAME_HEADER.size + size:]
+            try:
+                events.append(json.loads(payload))
+            except ValueError: ...
+        return events
+
+
+class RunTimeline:
+    """
+    Consumes the run events and works out the per stage timings, a stage
+    finishes when the next one starts or when the run finishes
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.current_stage = None
+        self.stage_started_at = None
+        self.stages = {}
+        self.errors = []
+        self.rows = None
+        self.bytes = None
+        self.finished = False
+
+
+    def consume(self, event: dict):
+        name, ts = event.get('event'), event.get('ts', time.time())
+
+        if name == 'stage' and event.get('stage') != self.current_stage:
+            self._close_stage(ts)
+            self.current_stage, self.stage_started_at = event.get('stage'), ts
+
+        elif name == 'error':
+            self.errors.append(event.get('message'))
+
+        elif name == 'loaded':
+            self.rows = event.get('rows', self.rows)
+            self.bytes = event.get('bytes', self.bytes)
+
+        elif name == 'finished':
+            self._close_stage(ts)
+            self.current_stage, self.finished = None, True
+
+
+    def _close_stage(self, ts):
+        if self.current_stage == None: return
+        elapsed = ts - self.stage_started_at
+        self.stages[self.current_stage] = round(self.stages.get(self.current_stage, 0) + elapsed, 3)
+
+
+    def summary(self):
+        """ Goes to the pipeline logs extra_data (duration_sec/rows feed the performance metrics) """
+        self._close_stage(time.time())
+        self.current_stage = None
+        return {
+            'duration_sec': round(time.time() - self.started_at, 3), 'rows': self.rows,
+            'bytes': self.bytes, 'stages': self.stages, 'errors': len(self.errors),
+        }
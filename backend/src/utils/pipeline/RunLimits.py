@@ -0,0 +1,192 @@
+"""
+Per pipeline resource limits (memory, CPU time and wall clock), the .env defaults can be
+overridden per namespace and per pipeline through the ppline_limits workspace table.
+
+Only the standard library is imported at module level since the limits are also applied
+by the warm pipeline worker (utils/pipeline/pipeline_worker.py) in the forked run.
+"""
+import os
+import re
+import signal
+import time
+import uuid
+from os import getenv as env
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, the run is only bound by the wall clock timeout
+    resource = None
+
+PPLINE_FILE_SUFFIX = r'(_{1,2}(withmetadata|toschedule)_{1,2})?\.py$'
+
+
+class RunLimits:
+    """
+    Limits of a single pipeline run, 0 means no limit:
+        - memory_mb: cgroup v2 memory.max when PPLINE_CGROUP_ROOT is usable, RLIMIT_AS otherwise
+        - cpu_sec: RLIMIT_CPU (SIGXCPU once reached)
+        - wall_sec: enforced by the application while the run output is pumped
+    """
+
+    default_memory_mb = int(env('PPLINE_LIMIT_MEMORY_MB', 0))
+    default_cpu_sec = int(env('PPLINE_LIMIT_CPU_SEC', 0))
+    default_wall_sec = int(env('PPLINE_LIMIT_WALL_SEC', 0))
+    cgroup_root = env('PPLINE_CGROUP_ROOT') or None
+
+    FAILURE_MESSAGES = {
+        'memory_limit': 'Pipeline run stopped, it reached the memory limit of {memory_mb} MB',
+        'cpu_limit': 'Pipeline run stopped, it reached the CPU time limit of {cpu_sec} seconds',
+        'wall_timeout': 'Pipeline run stopped, it took longer than the timeout of {wall_sec} seconds',
+    }
+
+    def __init__(self, memory_mb = 0, cpu_sec = 0, wall_sec = 0, cgroup = None):
+        self.memory_mb = int(memory_mb or 0)
+        self.cpu_sec = int(cpu_sec or 0)
+        self.wall_sec = int(wall_sec or 0)
+        self.cgroup = cgroup
+        self.started_at = time.monotonic()
+        self.timed_out = False
+
+
+    @staticmethod
+    def for_pipeline(ppline_file):
+        """ .env defaults, then the namespace (ppline_name = '*') and the pipeline overrides """
+        limits = {
+            'memory_mb': RunLimits.default_memory_mb,
+            'cpu_sec': RunLimits.default_cpu_sec,
+            'wall_sec': RunLimits.default_wall_sec,
+        }
+        try:
+            from utils.duckdb_util import DuckdbUtil
+            from services.pipeline.DltPipeline import destinations_dir
+            file_path = os.path.relpath(ppline_file, destinations_dir)
+            namespace, ppline = os.path.dirname(file_path), re.sub(PPLINE_FILE_SUFFIX, '', os.path.basename(file_path))
+
+            DuckdbUtil.create_ppline_limits_table()
+            rows = DuckdbUtil.get_workspace_db_instance().cursor().execute(
+                "SELECT memory_mb, cpu_sec, wall_sec FROM ppline_limits\
+                 WHERE namespace = ? AND ppline_name IN ('*', ?)\
+                 ORDER BY ppline_name = '*' DESC", [namespace, ppline]
+            ).fetchall()
+
+            for row in rows:
+                limits.update({ k: v for k, v in zip(limits.keys(), row) if v != None })
+        except Exception as err:
+            # e.g. run queue worker nodes can't open the workspace DB, .env defaults apply
+            print(f'Could not read the pipeline limits of {ppline_file}: {str(err)}')
+
+        return RunLimits(**limits)
+
+
+    @staticmethod
+    def from_dict(limits: dict):
+        return RunLimits(**limits) if limits else RunLimits()
+
+
+    def to_dict(self):
+        return { 'memory_mb': self.memory_mb, 'cpu_sec': self.cpu_sec, 'wall_sec': self.wall_sec, 'cgroup': self.cgroup }
+
+
+    def is_set(self):
+        return bool(self.memory_mb or self.cpu_sec or self.wall_sec)
+
+
+    def prepare(self):
+        """ Application side, creates the run cgroup when cgroup v2 is delegated to the app """
+        self.started_at = time.monotonic()
+        if not self.memory_mb or not RunLimits.cgroup_root: return
+        try:
+            cgroup = f'{RunLimits.cgroup_root}/ppline-{uuid.uuid4().hex[:12]}'
+            os.mkdir(cgroup)
+            with open(f'{cgroup}/memory.max', 'w') as file:
+                file.write(str(self.memory_mb * 1024 * 1024))
+            if os.path.exists(f'{cgroup}/memory.swap.max'):
+                with open(f'{cgroup}/memory.swap.max', 'w') as file: file.write('0')
+            self.cgroup = cgroup
+        except OSError as err:
+            print(f'Could not create pipeline cgroup under {RunLimits.cgroup_root}, using rlimit instead: {str(err)}')
+
+
+    def apply(self):
+        """ Child side (preexec_fn or warm worker fork), right before the pipeline starts """
+        if self.cgroup:
+            with open(f'{self.cgroup}/cgroup.procs', 'w') as file:
+                file.write(str(os.getpid()))
+        elif self.memory_mb and resource:
+            memory = self.memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+
+        if self.cpu_sec and resource:
+            # SIGXCPU at the soft limit, the kernel kills the run at the hard one if it's ignored
+            resource.setrlimit(resource.RLIMIT_CPU, (self.cpu_sec, self.cpu_sec + 5))
+
+
+    def check_wall(self, process):
+        """ Called while pumping the run output, kills the run once the timeout is reached """
+        if not self.wall_sec or self.timed_out: return
+        if time.monotonic() - self.started_at < self.wall_sec: return
+        self.timed_out = True
+        self.kill(process)
+
+
+    def kill(self, process):
+        if self.cgroup and os.path.exists(f'{self.cgroup}/cgroup.kill'):
+            try:
+                with open(f'{self.cgroup}/cgroup.kill', 'w') as file: file.write('1')
+                return
+            except OSError: ...
+        process.kill()
+
+
+    def failure_reason(self, process, stderr_text = '', cpu_used = None):
+        """
+        Distinct failure reason when the run was stopped by one of the limits, None otherwise. cpu_used
+        is the CPU seconds of the run process (see ResourceMonitor.process_cpu_sec), a SIGKILL is only
+        the CPU limit (hard RLIMIT_CPU) when the run had used it up, it's also how OOM kills end
+        """
+        if self.timed_out:
+            return 'wall_timeout'
+
+        returncode = process.returncode
+        if returncode == None or returncode == 0: return None
+
+        if self.cpu_sec and hasattr(signal, 'SIGXCPU'):
+            if returncode == -signal.SIGXCPU:
+                return 'cpu_limit'
+            if returncode == -signal.SIGKILL and cpu_used != None and cpu_used >= self.cpu_sec:
+                return 'cpu_limit'
+
+        if self.memory_mb:
+            if self.cgroup and self.oom_killed():
+                return 'memory_limit'
+            if 'MemoryError' in stderr_text or 'std::bad_alloc' in stderr_text\
+                or 'Cannot allocate memory' in stderr_text:
+                return 'memory_limit'
+        return None
+
+
+    def failure_message(self, reason):
+        return RunLimits.FAILURE_MESSAGES[reason].format(**self.to_dict())
+
+
+    def oom_killed(self):
+        try:
+            with open(f'{self.cgroup}/memory.events') as events:
+                return any(line.startswith('oom_kill ') and int(line.split()[1]) > 0 for line in events)
+        except (OSError, ValueError):
+            return False
+
+
+    def release(self):
+        """ Removes the run cgroup (it's only possible once the run processes are gone) """
+        if not self.cgroup: return
+        for _ in range(10):
+            try:
+                os.rmdir(self.cgroup)
+                return
+            except FileNotFoundError:
+                return
+            except OSError:
+                time.sleep(0.1)
+        print(f'Could not remove pipeline cgroup {self.cgroup}')
@@ -0,0 +1,144 @@
+import json
+import os
+import threading
+import traceback
+from os import getenv as env
+
+
+class SecretBundle:
+    """
+    Secrets of a pipeline run resolved by the application before the run starts, so the pipeline
+    process does not log into Vault again. They're handed over once through an inherited file
+    descriptor (memfd, or a pipe where memfd is not available) which the pipeline process reads and
+    closes on the first secret access. Each secret is Fernet encrypted with a per run key given in
+    the process env, and stays encrypted in memory until read. Secrets missing from the bundle are
+    read from Vault as before (see SecretManager.read_secret)
+    """
+
+    enabled = str(env('PPLINE_SECRET_BUNDLE', 'true')).lower() == 'true'
+
+    FD_VAR, KEY_VAR = 'PPLINE_SECRET_FD', 'PPLINE_SECRET_KEY'
+
+    # Pipeline process side, loaded once from the inherited descriptor (per process, warm workers fork)
+    loaded_pid = None
+    namespace = None
+    secrets: dict[str, str] = {}
+    fernet = None
+    lock = threading.Lock()
+
+
+    def __init__(self, namespace, payload: bytes, key: str):
+        self.namespace = namespace
+        self.payload = payload
+        self.key = key
+
+
+    @staticmethod
+    def create(namespace, secret_names: list):
+        """ Bundle of the secret names (application side), None when nothing could be resolved """
+        if not SecretBundle.enabled: return None
+        try:
+            from cryptography.fernet import Fernet
+        except ImportError:
+            return None
+
+        try:
+            secrets = SecretBundle.resolve(namespace, secret_names)
+            if len(secrets) == 0: return None
+
+            key = Fernet.generate_key()
+            fernet = Fernet(key)
+            payload = json.dumps({
+                'namespace': namespace,
+                'secrets': { path: fernet.encrypt(json.dumps(data).encode()).decode() for path, data in secrets.items() }
+            }).encode()
+            return SecretBundle(namespace, payload, key.decode())
+
+        except Exception as err:
+            print(f'Pipeline secrets could not be resolved, the run will read them from Vault: {str(err)}')
+            traceback.print_exc()
+            return None
+
+
+    @staticmethod
+    def resolve(namespace, secret_names: list) -> dict:
+        """ { vault path: data } of the names, database/S3 ones are under main/db and API ones under main/api """
+        from hvac.exceptions import InvalidPath
+        from services.workspace.SecretManager import SecretManager
+
+        names = [name for name in dict.fromkeys(secret_names) if name and str(name).strip()]
+        if len(names) == 0: return {}
+
+        paths = []
+        for folder in ('main/db/', 'main/api/'):
+            try:
+                existing = SecretManager.list_secrets_by_path(namespace, folder)
+            except InvalidPath:
+                continue
+            paths.extend(f'{folder}{name}' for name in names if name in existing)
+
+        secrets = SecretManager.read_secrets(namespace, paths)
+        return { path: data for path, data in secrets.items() if data }
+
+
+    def open_fd(self) -> int:
+        """ Readable descriptor with the payload, the caller closes it once the child process has it """
+        if hasattr(os, 'memfd_create'):
+            fd = os.memfd_create('ppline-secrets', 0)
+            os.write(fd, self.payload)
+            os.lseek(fd, 0, os.SEEK_SET)
+            return fd
+
+        read_fd, write_fd = os.pipe()
+
+        def write():
+            try:
+                with os.fdopen(write_fd, 'wb') as pipe: pipe.write(self.payload)
+            except OSError: ...
+
+        # A payload bigger than the pipe buffer is written while the child reads it
+        threading.Thread(target=write, daemon=True).start()
+        return read_fd
+
+
+    def env_vars(self, fd) -> dict:
+        return { SecretBundle.FD_VAR: str(fd), SecretBundle.KEY_VAR: self.key }
+
+
+    @staticmethod
+    def get(namespace, path):
+        """ Secret data from the bundle (pipeline process side), None when the run has no such secret """
+        SecretBundle.load()
+        token = SecretBundle.secrets.get(path) if namespace == SecretBundle.namespace else None
+        if token == None: return None
+        return json.loads(SecretBundle.fernet.decrypt(token.encode()))
+
+
+    @staticmethod
+    def load():
+        with SecretBundle.lock:
+            if SecretBundle.loaded_pid == os.getpid(): return
+            SecretBundle.loaded_pid = os.getpid()
+            SecretBundle.namespace, SecretBundle.secrets = None, {}
+
+            # Removed from the env so that processes started by the pipeline don't inherit them
+            fd, key = os.environ.pop(SecretBundle.FD_VAR, None), os.environ.pop(SecretBundle.KEY_VAR, None)
+            if fd == None or key == None: return
+
+            try:
+                chunks = []
+                while True:
+                    chunk = os.read(int(fd), 65536)
+                    if not chunk: break
+                    chunks.append(chunk)
+
+                from cryptography.fernet import Fernet
+                payload = json.loads(b''.join(chunks))
+                SecretBundle.fernet = Fernet(key.encode())
+                SecretBundle.namespace, SecretBundle.secrets = payload['namespace'], payload['secrets']
+            except Exception as err:
+                print(f'RUNTIME_WARNING:Pipeline secrets bundle could not be read, using Vault: {str(err)}', flush=True)
+            finally:
+                try:
+                    os.close(int(fd))
+                except OSError: ...
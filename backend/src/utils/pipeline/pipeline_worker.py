@@ -0,0 +1,147 @@
+"""
+Warm pipeline worker (fork server) used by services.pipeline.WorkerPool.
+
+The heavy pipeline stack is imported once when the worker starts, each run request
+received over the unix socket (pipeline file, env, cwd plus the stdout/stderr pipes)
+is executed in a forked child within a fresh __main__ namespace, so the parent reads
+the exact same stdout protocol as when running `python <pipeline file>`.
+"""
+import atexit
+import importlib
+import json
+import os
+import runpy
+import selectors
+import socket
+import sys
+import traceback
+# Sibling module (this file's folder is sys.path[0] at this point), stdlib only
+from RunLimits import RunLimits
+
+MAX_MESSAGE_SIZE = 1024 * 1024
+DEFAULT_PRELOAD = 'dlt,dlt.sources.sql_database,dlt.destinations,sqlalchemy,duckdb,pyarrow,hvac'
+
+
+def preload():
+    for module in (os.getenv('PPLINE_WORKER_PRELOAD') or DEFAULT_PRELOAD).split(','):
+        if module.strip() == '': continue
+        try:
+            importlib.import_module(module.strip())
+        except Exception as err:
+            print(f'Pipeline worker could not preload {module}: {str(err)}', file=sys.stderr, flush=True)
+
+
+def run_child(job, fds, inherited_sockets):
+    """ Runs in the forked process, it never returns """
+    code = 0
+    try:
+        for sock in inherited_sockets: sock.close()
+        os.dup2(fds[0], 1)
+        os.dup2(fds[1], 2)
+        for fd in fds[:2]: os.close(fd)
+
+        if job.get('limits'):
+            RunLimits.from_dict(job['limits']).apply()
+
+        os.environ.clear()
+        os.environ.update(job['env'])
+        # Structured run events channel (see utils.pipeline.RunEvents)
+        if len(fds) > 2: os.environ['PPLINE_EVENT_FD'] = str(fds[2])
+        # Run secrets bundle (see utils.pipeline.SecretBundle), its key already came in the env
+        if len(fds) > 3: os.environ['PPLINE_SECRET_FD'] = str(fds[3])
+        os.chdir(job['cwd'])
+
+        ppline_file = job['file']
+        sys.argv = [ppline_file]
+        sys.path.insert(0, os.path.dirname(os.path.abspath(ppline_file)))
+        runpy.run_path(ppline_file, run_name='__main__')
+
+    except SystemExit as err:
+        if isinstance(err.code, int) or err.code is None:
+            code = err.code or 0
+        else:
+            print(err.code, file=sys.stderr)
+            code = 1
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        try:
+            atexit._run_exitfuncs()
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+def send(conn, message):
+    """ The application side might have given up on the run (e.g. killed), that must not stop the worker """
+    try:
+        conn.send(json.dumps(message).encode())
+    except OSError: ...
+
+
+def serve(socket_path):
+    preload()
+    parent_pid = os.getppid()
+
+    # Bind to a temporary name so the pool only sees the socket once it's listening
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    server.bind(f'{socket_path}.tmp')
+    server.listen()
+    os.rename(f'{socket_path}.tmp', socket_path)
+
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ, 'server')
+    children, retiring = {}, False
+
+    while not (retiring and not children):
+        for key, _ in selector.select(0.05):
+            if key.data == 'server':
+                conn, _ = server.accept()
+                selector.register(conn, selectors.EVENT_READ, 'conn')
+                continue
+
+            conn = key.fileobj
+            selector.unregister(conn)
+            msg, fds, _, _ = socket.recv_fds(conn, MAX_MESSAGE_SIZE, 4)
+
+            if not msg:
+                conn.close()
+                continue
+
+            job = json.loads(msg)
+            if job.get('action') == 'retire':
+                retiring = True
+                conn.close()
+                continue
+
+            pid = os.fork()
+            if pid == 0:
+                run_child(job, fds, [server, conn, *children.values()])
+
+            for fd in fds: os.close(fd)
+            children[pid] = conn
+            send(conn, { 'pid': pid })
+
+        while children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0: break
+            conn = children.pop(pid, None)
+            if conn:
+                send(conn, { 'exit': os.waitstatus_to_exitcode(status) })
+                conn.close()
+
+        # Retire when the application process is gone or asked to
+        if os.getppid() != parent_pid: retiring = True
+        if retiring and server.fileno() != -1:
+            selector.unregister(server)
+            server.close()
+            if os.path.exists(socket_path): os.remove(socket_path)
+
+
+if __name__ == '__main__':
+    # Do not leak this file's folder (utils/pipeline) into the pipeline imports
+    if sys.path and os.path.abspath(sys.path[0]) == os.path.dirname(os.path.abspath(__file__)):
+        sys.path.pop(0)
+    serve(sys.argv[1])
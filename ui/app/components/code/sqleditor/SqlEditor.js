@@ -1,4 +1,5 @@
 import { ViewComponent } from "../../../../@still/component/super/ViewComponent.js";
+import { AppTemplate } from "../../../../config/app-template.js";
 import { ListState, State } from "../../../../@still/component/type/ComponentType.js";
 import { UUIDUtil } from "../../../../@still/util/UUIDUtil.js";
 import { AIResponseLinterUtil } from "../../agent/AIResponseLinterUtil.js";
@@ -184,7 +185,7 @@ export class SqlEditor extends ViewComponent {
 		const newQuery = this.editor.getValue();
 		this.queryOutput.stAfterInit(null, true);
 
-		const { result, fields, error, db_engine } = await PipelineService.runSQLQuery(
+		const { result, fields, error, db_engine, truncated } = await PipelineService.runSQLQuery(
 			newQuery, 
 			this.database, 
 			PipelineService.sqlEditorDestSecretName || this.connectionName, 
@@ -193,6 +194,9 @@ export class SqlEditor extends ViewComponent {
 		
 		// Store db_engine for future queries
 		if (db_engine) this.dbEngine = db_engine;
+
+		if (truncated)
+			AppTemplate.toast.warn(`The query returned more than ${result.length} rows, only the first ${result.length} are shown`);
 		
 		const parsedFields = (fields || '').replaceAll('\n', '')?.split(',')?.map(field => field.trim());		
 		this.queryOutput.setGridData(parsedFields, result).stAfterInit(error);
@@ -16,6 +16,8 @@ export class PipelineService extends BaseService {
     static pipelineReferencedSecrets = null;
     static pipelineDestinationConfig = null;
     static pipelineDestinationDB = null;
+    // Rows the SQL editor reads through the result pages, the server cursor is closed above it
+    static sqlEditorMaxRows = 50000;
 
     async createOrUpdatePipeline(content = null, update = false, actionType = '') {
 
@@ -82,30 +84,57 @@ export class PipelineService extends BaseService {
 
     /** @returns { { result, error } | undefined } */
     static async runSQLQuery(query, database, connectionName = null, destType = 'duckdb') {
+        const namespace = await UserService.getNamespace();
         const payload = { 
             query, 
             database,
-            namespace: await UserService.getNamespace(),
+            namespace,
             connection_name: connectionName,
             dest_type: destType,
             referencedSecrets: PipelineService.pipelineReferencedSecrets,
             destinationConfig: PipelineService.pipelineDestinationConfig,
             destinationDB: PipelineService.pipelineDestinationDB,
         };
-        const url = '/workcpace/sql_query';
-        const response = await $still.HTTPClient.post(url, JSON.stringify(payload), {
+
+        const result = await PipelineService.postSQLQuery(payload);
+        if (result.error) return PipelineService.sqlQueryError(result);
+
+        // Next pages (continuation token) until the end of the result or the editor rows cap
+        const rows = [...(result.result || [])];
+        let nextToken = result.next_token;
+        while (nextToken && rows.length < PipelineService.sqlEditorMaxRows) {
+            const page = await PipelineService.postSQLQuery({ namespace, continuationToken: nextToken });
+            if (page.error) return PipelineService.sqlQueryError(page);
+            rows.push(...(page.result || []));
+            nextToken = page.next_token;
+        }
+
+        // Rows left unread, the server side cursor (and its DB connection) is released
+        if (nextToken) PipelineService.closeSQLQuery(namespace, nextToken);
+
+        return { ...result, result: rows, next_token: null, truncated: Boolean(nextToken), error: null };
+    }
+
+    static async postSQLQuery(payload) {
+        const response = await $still.HTTPClient.post('/workcpace/sql_query', JSON.stringify(payload), {
             headers: { 'content-type': 'Application/json' }
         });
+        return await response.json();
+    }
 
-        const result = await response.json();
-
-        if (result.error){
-            if(result.code === 'err')
-                AppTemplate.toast.error('Error while querying the DB: ' + result.result, 10000);
-            AppTemplate.toast.warn('Exception while querying the DB: ' + result.result);
-            return { error: result.result };
+    static async closeSQLQuery(namespace, token) {
+        try {
+            await $still.HTTPClient.delete('/workcpace/sql_query/' + namespace + '/' + token);
+        } catch (error) {
+            console.error('Error while closing the query result: ', error);
         }
-        return { ...result, error: null };
+    }
+
+    static sqlQueryError(result) {
+        if(result.code === 'err')
+            AppTemplate.toast.error('Error while querying the DB: ' + result.result, 10000);
+        AppTemplate.toast.warn('Exception while querying the DB: ' + result.result);
+        return { error: result.result };
     }
 
 }
\ No newline at end of file